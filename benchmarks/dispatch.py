@@ -0,0 +1,251 @@
+"""
+Measure dispatch throughput and press-to-listener latency.
+
+Devices are driven through bt_button.testing fake backends, so events go
+through the same reactor, framing and dispatch code as real devices.
+Results are written as JSON.
+
+    $ python -m benchmarks.dispatch --rates 1000 10000 --devices 1 10
+"""
+import argparse
+import itertools
+import json
+import platform
+import resource
+import sys
+import threading
+import time
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    BTselfie, BtSelfieButton, BtSelfieButtonEvent, \
+    SmartPalette, SmartPaletteButton
+from bt_button.buttons._event_device_manager import EventDeviceManager
+from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
+from bt_button.buttons._input_backend import EvdevBackend
+from bt_button.buttons.smart_palette import _button_to_data
+from bt_button.testing import FakeInputBackend, FakeGattBackend, \
+    inject_at_rate
+
+DEFAULT_RATES = [1000, 5000, 20000]
+DEFAULT_DEVICES = [1, 10, 50]
+DEFAULT_DURATION = 1.0
+# Seconds to wait for events still queued after injection finished
+DRAIN_TIMEOUT = 5.0
+THREAD_SAMPLE_INTERVAL = 0.01
+
+# name -> (class, device name, button, event)
+EVENT_DEVICES = {
+    "ab_shutter": (AbShutter, "AB Shutter3",
+                   AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED),
+    "bt_selfie": (BTselfie, "BTselfie E Keyboard",
+                  BtSelfieButton.CENTER, BtSelfieButtonEvent.PUSHED),
+}
+
+
+def _mac(i):
+    return "00:00:00:00:{:02X}:{:02X}".format(i >> 8, i & 0xff)
+
+
+def _percentile(values, q):
+    if len(values) == 0:
+        return None
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+class _Counter:
+    """
+    Latencies of received events. Listeners append from their
+    dispatch thread, main thread waits until all events arrived.
+    """
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.last = None
+        self.done = threading.Event()
+
+    def add(self, latency):
+        self.latencies.append(latency)
+        if len(self.latencies) >= self.expected:
+            self.last = time.perf_counter()
+            self.done.set()
+
+
+def _measure(inject, rate, count, counter):
+    """
+    Run inject at rate until count calls and wait for counter.
+    Returns dict of throughput, latency and resource usage.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+
+    injector = inject_at_rate(inject, rate, count)
+    max_threads = threading.active_count()
+    deadline = None
+    while not counter.done.wait(THREAD_SAMPLE_INTERVAL):
+        max_threads = max(max_threads, threading.active_count())
+        if deadline is None and not injector.thread.is_alive():
+            deadline = time.perf_counter() + DRAIN_TIMEOUT
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+
+    injector.stop()
+    end = counter.last if counter.done.is_set() else time.perf_counter()
+    elapsed = end - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_user = after.ru_utime - usage.ru_utime
+    cpu_system = after.ru_stime - usage.ru_stime
+
+    latencies = sorted(counter.latencies)
+    received = len(latencies)
+
+    def us(value):
+        return None if value is None else round(value * 1e6, 1)
+
+    return {
+        "rate": rate,
+        "sent": injector.sent,
+        "received": received,
+        "elapsed_s": round(elapsed, 4),
+        "events_per_sec": round(received / elapsed, 1),
+        "latency_p50_us": us(_percentile(latencies, 0.5)),
+        "latency_p99_us": us(_percentile(latencies, 0.99)),
+        "latency_max_us": us(latencies[-1] if received > 0 else None),
+        "cpu_user_s": round(cpu_user, 4),
+        "cpu_system_s": round(cpu_system, 4),
+        "cpu_percent": round((cpu_user + cpu_system) / elapsed * 100, 1),
+        "max_threads": max_threads,
+    }
+
+
+def bench_event_device(kind, rate, devices, duration):
+    """
+    Drive devices of kind through FakeInputBackend.
+    Latency is from kernel timestamp of event to listener call.
+    """
+    cls, name, button, event = EVENT_DEVICES[kind]
+    count = int(rate * duration)
+    counter = _Counter(count)
+
+    def pushed(e):
+        counter.add(time.time() - e.timestamp)
+
+    backend = FakeInputBackend()
+    EventDeviceManager.set_backend(backend)
+    targets = []
+    try:
+        paths = []
+        for i in range(devices):
+            paths.append(backend.add_device(name, _mac(i)))
+            device = cls(_mac(i))
+            device.attach_button_event_listener(button, event, pushed)
+            device.start_monitor()
+            targets.append(device)
+
+        next_path = itertools.cycle(paths).__next__
+
+        def inject():
+            backend.key(next_path(), button.value, event.value)
+
+        result = _measure(inject, rate, count, counter)
+    finally:
+        for device in targets:
+            device.stop_monitor()
+        EventDeviceManager.set_backend(EvdevBackend())
+
+    result.update({"device": kind, "devices": devices})
+    return result
+
+
+def bench_smart_palette(rate, devices, duration):
+    """
+    Drive SmartPalettes through FakeGattBackend.
+    Latency is from notification arrival to listener call.
+    """
+    count = int(rate * duration)
+    counter = _Counter(count)
+    data = _button_to_data(SmartPaletteButton.RED)
+
+    backend = FakeGattBackend()
+    GattAdapterPool.set_backend_factory(backend.adapter)
+    targets = []
+    try:
+        fakes = []
+        for i in range(devices):
+            fake = backend.add_device(_mac(i))
+            palette = SmartPalette(_mac(i))
+            sent_at = [0.0]
+            palette.attach_pushed_listener(
+                SmartPaletteButton.RED,
+                lambda e, sent_at=sent_at: counter.add(
+                    time.perf_counter() - sent_at[0]))
+            palette.connect()
+            targets.append(palette)
+            fakes.append((fake, sent_at))
+
+        next_fake = itertools.cycle(fakes).__next__
+
+        def inject():
+            fake, sent_at = next_fake()
+            sent_at[0] = time.perf_counter()
+            fake.notify(data)
+
+        result = _measure(inject, rate, count, counter)
+    finally:
+        for palette in targets:
+            palette.close()
+        GattAdapterPool.set_backend_factory(None)
+
+    result.update({"device": "smart_palette", "devices": devices})
+    return result
+
+
+def run(kinds, rates, device_counts, duration):
+    """
+    Returns results of every combination of kinds, device counts and rates.
+    """
+    results = []
+    for kind in kinds:
+        for devices in device_counts:
+            for rate in rates:
+                if kind == "smart_palette":
+                    result = bench_smart_palette(rate, devices, duration)
+                else:
+                    result = bench_event_device(
+                        kind, rate, devices, duration)
+                results.append(result)
+    return results
+
+
+def main(argv=None):
+    kinds = list(EVENT_DEVICES) + ["smart_palette"]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices-kind", nargs="+", choices=kinds,
+                        default=kinds, dest="kinds")
+    parser.add_argument("--rates", nargs="+", type=int,
+                        default=DEFAULT_RATES, help="total events per second")
+    parser.add_argument("--devices", nargs="+", type=int,
+                        default=DEFAULT_DEVICES, help="numbers of devices")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="seconds of injection per case")
+    parser.add_argument("--output", help="JSON file, stdout if omitted")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "duration": args.duration,
+        "results": run(args.kinds, args.rates, args.devices, args.duration),
+    }
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
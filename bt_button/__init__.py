@@ -1,13 +1,60 @@
+import importlib
+
 from .error import Error, DeviceNotFoundError
-from .buttons.ab_shutter import AbShutter, AbShutterButton, \
-    AbShutterButtonEvent
-from .buttons.bt_selfie import BTselfie, BtSelfieButton, \
-    BtSelfieButtonEvent
-from .buttons.smart_palette import SmartPalette, SmartPaletteButton
+
+# Device modules import their backend (evdev or pygatt),
+# so they are imported on first access of their names.
+_LAZY_NAMES = {
+    "AbShutter": ".buttons.ab_shutter",
+    "AbShutterButton": ".buttons.ab_shutter",
+    "AbShutterButtonEvent": ".buttons.ab_shutter",
+    "BTselfie": ".buttons.bt_selfie",
+    "BtSelfieButton": ".buttons.bt_selfie",
+    "BtSelfieButtonEvent": ".buttons.bt_selfie",
+    "SmartPalette": ".buttons.smart_palette",
+    "SmartPaletteButton": ".buttons.smart_palette",
+    "SmartPaletteButtonEvent": ".buttons.smart_palette",
+    "connect_all": ".buttons.smart_palette",
+    "ButtonEvent": ".event",
+    "set_free_list_size": ".event",
+    "DeviceSupervisor": ".supervisor",
+    "DispatchExecutor": ".executor",
+    "OverflowPolicy": ".executor",
+    "Gesture": ".gesture",
+    "GestureEvent": ".gesture",
+    "GestureRecognizer": ".gesture",
+    "Recorder": ".recorder",
+    "LogReader": ".recorder",
+    "replay": ".recorder",
+    "ShardCoordinator": ".sharding",
+    "MetricsRegistry": ".metrics",
+    "MetricsExporter": ".metrics",
+    "ListenerProfiler": ".profiler",
+}
 
 __all__ = [
     "AbShutter", "AbShutterButton", "AbShutterButtonEvent",
     "BTselfie", "BtSelfieButton", "BtSelfieButtonEvent",
-    "SmartPalette", "SmartPaletteButton",
+    "SmartPalette", "SmartPaletteButton", "SmartPaletteButtonEvent",
+    "connect_all", "ButtonEvent", "set_free_list_size",
+    "DeviceSupervisor", "DispatchExecutor", "OverflowPolicy",
+    "Gesture", "GestureEvent", "GestureRecognizer",
+    "Recorder", "LogReader", "replay", "ShardCoordinator",
+    "MetricsRegistry", "MetricsExporter", "ListenerProfiler",
     "Error", "DeviceNotFoundError"
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_NAMES.get(name)
+    if module_name is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
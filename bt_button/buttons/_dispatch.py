@@ -0,0 +1,51 @@
+import logging
+import time
+
+from .. import profiler as _profiler
+
+log = logging.getLogger(__name__)
+
+
+def call_listeners(device, funcs, e, read_at=None):
+    """
+    Call listeners of device with e, on executor of device if it is set.
+    Exception of a listener is logged and doesn't stop other listeners.
+    Time of listeners called on this thread is added to device metrics
+    and to active ListenerProfiler if the dispatch is sampled.
+    Listeners on executor are measured by the executor.
+
+    Parameters
+    ----------
+    read_at : float
+        time.time() when the event was read, for latency of event devices
+    """
+    now = time.time()
+    latency = device.metrics.latency
+    if read_at is not None:
+        latency.read.observe(read_at - e.timestamp)
+        latency.decode.observe(now - read_at)
+
+    executor = device.executor
+    if executor is not None:
+        # Latency and listener time are measured by executor
+        for func in funcs:
+            executor.submit(func, e)
+        return
+
+    latency.total.observe(now - e.timestamp)
+
+    profiler = _profiler.active
+    if profiler is not None and not profiler._sample():
+        profiler = None
+
+    observe = device.metrics.listener_seconds.observe
+    for func in funcs:
+        start = time.perf_counter()
+        try:
+            func(e)
+        except Exception:
+            log.exception("listener {} failed".format(func))
+        elapsed = time.perf_counter() - start
+        observe(elapsed)
+        if profiler is not None:
+            profiler._record(func, e, elapsed)
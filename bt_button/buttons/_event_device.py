@@ -1,17 +1,63 @@
 import logging
 import threading
+import time
 import evdev
 
+from ..event import _make as _make_event, _recycle as _recycle_event
+from ..metrics import MetricsRegistry
+from ._dispatch import call_listeners
 from ._event_device_manager import EventDeviceManager
+from ._event_reactor import EventReactor
+from ._event_stream import EventStream
 
 
 class EventDevice:
+    # Enum of buttons. Only their key codes are read from device.
+    button_enum = None
+    # Enum of key event values
+    event_enum = None
+    # (code, value) -> (button, event), compiled once per class
+    key_table = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        if cls.button_enum is not None and cls.event_enum is not None:
+            cls.key_table = {
+                (button.value, event.value): (button, event)
+                for button in cls.button_enum for event in cls.event_enum
+            }
+
     def __init__(self, mac_addr, name):
         self.mac_addr = mac_addr
         self.device = None
+        self.loop = None
+
+        # Key events of SYN_REPORT frame being read
+        self.frame = []
+        self.dropped = False
 
         self.name = name
 
+        self.event_stream = EventStream()
+
+        self.disconnected_func = None
+
+        self.button_event_funcs = {}
+        for button, event in self.key_table.values():
+            self.button_event_funcs.setdefault(button, {})[event] = ()
+
+        # (code, value) -> tuple of functions, looked up for every key event.
+        # Tuples are replaced, never modified, so dispatch needs no lock.
+        self.key_funcs = {key: () for key in self.key_table}
+        self.listener_lock = threading.Lock()
+
+        self.executor = None
+        # bt_button.Recorder which records read events
+        self.recorder = None
+
+        self.metrics = MetricsRegistry.register(self)
+
     def is_connected(self):
         """
         Deprecated function.
@@ -45,29 +91,230 @@ class EventDevice:
         logging.warning("Please use start_monitor() instead of connect().")
         self.start_monitor()
 
-    def start_monitor(self):
+    def start_monitor(self, loop=None):
         """
         Start monitoring event device
+
+        Parameters
+        ----------
+        loop : asyncio.AbstractEventLoop
+            If given, device is read by this event loop
+            instead of shared monitoring thread.
+        """
+        start = time.monotonic()
+        device = EventDeviceManager.open_device(self.name, self.mac_addr)
+        self.metrics.connect_seconds.observe(time.monotonic() - start)
+
+        self._start_monitor(device, loop)
+
+    def _start_monitor(self, device, loop=None):
+        """
+        Start monitoring device opened by EventDeviceManager.
+        Device is closed if monitoring couldn't be set up.
         """
-        self.device = EventDeviceManager.open_device(self.name, self.mac_addr)
+        self.device = device
+        self.frame = []
+        self.dropped = False
+        self.loop = loop
+
+        try:
+            if self.button_enum is not None:
+                EventDeviceManager.backend.set_event_mask(
+                    device, [b.value for b in self.button_enum])
+
+            if loop is None:
+                EventReactor.register(device, self._run)
+            else:
+                loop.add_reader(device.fd, self._run)
+        except Exception:
+            self.device = None
+            self.loop = None
+            EventDeviceManager.close_device(device)
+            raise
+
+        self.metrics.connects += 1
         logging.info("{}: connected".format(self.name))
 
-        self.thread = threading.Thread(target=self._run)
-        self.thread.setDaemon(True)
-        self.thread.start()
+    def stop_monitor(self):
+        """
+        Stop monitoring event device and close it
+        """
+        if not self.is_monitoring():
+            return
 
-    def _finish_monitor(self):
-        EventDeviceManager.remove_device(self.device.path)
+        self._close_device()
+        logging.info("{}: stopped".format(self.name))
+
+    def _close_device(self):
+        if self.loop is None:
+            EventReactor.unregister(self.device)
+        else:
+            self.loop.remove_reader(self.device.fd)
+            self.loop = None
+        EventDeviceManager.close_device(self.device)
         self.device = None
+
+    def _finish_monitor(self):
+        self._close_device()
+        self.metrics.disconnects += 1
         logging.info("{}: disconnected".format(self.name))
 
+        if self.disconnected_func is not None:
+            self.disconnected_func()
+
+    def set_dispatch_executor(self, executor):
+        """
+        Run listeners on executor instead of monitoring thread.
+        If executor uses OverflowPolicy.BLOCK, a full queue stalls
+        events of every device sharing the monitoring thread.
+
+        Parameters
+        ----------
+        executor : bt_button.DispatchExecutor
+            Executor to run listeners, or None to run them directly.
+        """
+        self.executor = executor
+
+    def attach_disconnected_listener(self, func):
+        """
+        Attach function that be called when monitored device disappeared.
+
+        Parameters
+        ----------
+        func : function()
+            This function will be called when device disappeared.
+        """
+        self.disconnected_func = func
+
+    def detach_disconnected_listener(self):
+        """
+        Detach function that be called when monitored device disappeared.
+        """
+        self.disconnected_func = None
+
     def _run(self):
+        """
+        Called when device is readable.
+        Reads all pending events without blocking.
+        """
         try:
-            for e in self.device.read_loop():
+            events = list(self.device.read())
+        except BlockingIOError:
+            return
+        except OSError:
+            self._finish_monitor()
+            return
+        read_at = time.time()
+
+        self.metrics.events_received += len(events)
+
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_events(self, events)
+
+        self._process_events(events, read_at)
+
+    def _process_events(self, events, read_at=None):
+        """
+        Group events into SYN_REPORT frames and dispatch key events
+        of each complete frame. Frames broken by SYN_DROPPED are discarded.
+        read_at is time.time() when events were read, for latency.
+        """
+        debug = logging.root.isEnabledFor(logging.DEBUG)
+
+        for e in events:
+            if debug:
                 logging.debug(e)
 
-                if e.type == evdev.events.EV_KEY:
-                    self._key_event(e)
+            if e.type == evdev.ecodes.EV_SYN:
+                if e.code == evdev.ecodes.SYN_REPORT:
+                    # Frame is swapped out first so that a failing
+                    # dispatch can't leave it to the next SYN_REPORT
+                    frame, self.frame = self.frame, []
+                    dropped, self.dropped = self.dropped, False
+                    if not dropped:
+                        self._dispatch_frame(frame, read_at)
+                elif e.code == evdev.ecodes.SYN_DROPPED:
+                    self.frame = []
+                    self.dropped = True
+                    self.metrics.syn_dropped += 1
 
-        except OSError:
-            self._finish_monitor()
+            elif e.type == evdev.ecodes.EV_KEY and not self.dropped:
+                self.frame.append(e)
+
+    def _add_listener(self, button, event, func):
+        with self.listener_lock:
+            funcs = self.button_event_funcs[button][event] + (func, )
+            self._set_listeners(button, event, funcs)
+
+    def _remove_listener(self, button, event, func=None):
+        with self.listener_lock:
+            funcs = ()
+            if func is not None:
+                funcs = tuple(f for f in self.button_event_funcs[button][event]
+                              if f != func)
+            self._set_listeners(button, event, funcs)
+
+    def _set_listeners(self, button, event, funcs):
+        self.button_event_funcs[button][event] = funcs
+        self.key_funcs[(button.value, event.value)] = funcs
+
+    def _key_event(self, e, read_at=None):
+        key = (e.code, e.value)
+        funcs = self.key_funcs.get(key)
+        if funcs is None:
+            self.metrics.unknown_codes += 1
+            return
+        self.metrics.events_dispatched += 1
+
+        if logging.root.isEnabledFor(logging.INFO):
+            button, event = self.key_table[key]
+            logging.info("[{}] {}: {}".format(self.name, button, event))
+
+        # ButtonEvent is built only when someone listens
+        stream = self.event_stream
+        if len(funcs) == 0 and len(stream.subscribers) == 0:
+            return
+
+        button, event = self.key_table[key]
+        button_event = _make_event(
+            self, button, event, e.sec + e.usec / 1000000)
+        if len(funcs) > 0:
+            call_listeners(self, funcs, button_event, read_at)
+        stream.publish(button_event)
+        _recycle_event(button_event)
+
+    def _dispatch_frame(self, frame, read_at=None):
+        for e in frame:
+            self._key_event(e, read_at)
+
+    def events(self):
+        """
+        Async iterator which yields bt_button.ButtonEvent
+        of every button event, same as listeners get.
+
+        .. code-block:: python
+
+           async for e in device.events():
+               print(e)
+        """
+        return self.event_stream.events()
+
+    async def wait_for(self, button, event):
+        """
+        Wait until target event happened.
+
+        Parameters
+        ----------
+        button : Enum
+            Enum to identify target button
+        event : Enum
+            Enum to identify target event
+
+        Returns
+        -------
+        bt_button.ButtonEvent
+            Event which matched.
+        """
+        return await self.event_stream.wait_for(
+            lambda e: e.button == button and e.event == event)
@@ -1,37 +1,221 @@
-import evdev
+import threading
 from .. import DeviceNotFoundError
+from ._input_backend import EvdevBackend
 
 
 class __EventDeviceManager:
     def __init__(self):
         self.connected_paths = []
 
-    def _search_device(self, name, mac_addr):
-        devs = evdev.util.list_devices()
-        for dev_path in devs:
-            if dev_path in self.connected_paths:
+        # path -> (name, uniq) of every known input node
+        self.device_index = {}
+        # (name, uniq) -> [path, ...]
+        self.device_paths = {}
+        # path -> InputBackend.node_id() when indexed
+        self.node_ids = {}
+
+        self.backend = EvdevBackend()
+
+        # Number of devices opened by this manager and not closed
+        self.open_fds = 0
+
+        self.lock = threading.RLock()
+
+    def set_backend(self, backend):
+        """
+        Use backend to access input nodes instead of evdev.
+
+        Parameters
+        ----------
+        backend : InputBackend
+            Backend such as bt_button.testing.FakeInputBackend
+        """
+        with self.lock:
+            self.reset()
+            self.backend = backend
+
+    def _open(self, path):
+        dev = self.backend.open(path)
+        self.open_fds += 1
+        return dev
+
+    def _close(self, dev):
+        self.open_fds -= 1
+        dev.close()
+
+    def _index(self, path, key, node_id=None):
+        self.device_index[path] = key
+        self.device_paths.setdefault(key, []).append(path)
+        self.node_ids[path] = node_id
+
+    def _unindex(self, path):
+        self.node_ids.pop(path, None)
+        key = self.device_index.pop(path)
+        paths = self.device_paths[key]
+        paths.remove(path)
+        if len(paths) == 0:
+            del self.device_paths[key]
+
+    def _probe(self, path):
+        """
+        Returns ((name, uniq), device) of the node.
+        device is None if the node was identified without opening it.
+        """
+        key = self.backend.identify(path)
+        if key is not None:
+            return key, None
+
+        dev = self._open(path)
+        return (dev.name, dev.uniq), dev
+
+    def _update_index(self):
+        """
+        Follow appeared, disappeared and recreated input nodes.
+
+        Only new nodes and free nodes whose node_id() changed,
+        as kernel reused them for another device, are probed
+        to read name and uniq.
+        Returns dict of path -> device opened while probing.
+        """
+        paths = self.backend.list_devices()
+
+        for path in set(self.device_index) - set(paths):
+            self._unindex(path)
+
+        probed = {}
+        for path in paths:
+            if path in self.connected_paths:
+                continue
+
+            node_id = self.backend.node_id(path)
+            if path in self.device_index:
+                if self.node_ids[path] == node_id:
+                    continue
+                self._unindex(path)
+
+            try:
+                key, dev = self._probe(path)
+            except OSError:
+                continue
+
+            self._index(path, key, node_id)
+            if dev is not None:
+                probed[path] = dev
+
+        return probed
+
+    def _open_indexed(self, key, probed):
+        """
+        Open first free node indexed as key.
+        Devices in probed are used instead of reopening their node.
+        """
+        for path in list(self.device_paths.get(key, [])):
+            if path in self.connected_paths:
+                continue
+
+            if path in probed:
+                return probed.pop(path)
+
+            try:
+                dev = self._open(path)
+            except OSError:
+                self._unindex(path)
                 continue
 
-            dev = evdev.InputDevice(dev_path)
-            if dev.name == name and dev.uniq == mac_addr:
+            if (dev.name, dev.uniq) == key:
                 return dev
 
+            # Node was reused by another device since indexed.
+            # Kept in probed so that it may be found by another key.
+            node_id = self.node_ids.get(path)
+            self._unindex(path)
+            self._index(path, (dev.name, dev.uniq), node_id)
+            probed[path] = dev
+
         return None
 
+    def _search_devices(self, keys):
+        """
+        Search all (name, uniq) in keys with one pass over input nodes.
+        Returns dict of (name, uniq) -> opened device for found keys.
+        """
+        probed = self._update_index()
+
+        found = {}
+        for key in set(keys):
+            dev = self._open_indexed(key, probed)
+            if dev is not None:
+                found[key] = dev
+
+        for dev in probed.values():
+            self._close(dev)
+
+        return found
+
+    def _search_device(self, name, mac_addr):
+        key = (name, mac_addr)
+        return self._search_devices([key]).get(key)
+
     def open_device(self, name, mac_addr):
-        device = self._search_device(name, mac_addr.lower())
-        if device is None:
-            raise DeviceNotFoundError("Device not found:", name, mac_addr)
+        with self.lock:
+            device = self._search_device(name, mac_addr.lower())
+            if device is None:
+                raise DeviceNotFoundError(
+                    "Device not found:", name, mac_addr)
 
-        self.connected_paths.append(device.path)
+            self.connected_paths.append(device.path)
 
         return device
 
+    def open_devices(self, targets):
+        """
+        Open every found device in targets with one discovery pass.
+
+        Parameters
+        ----------
+        targets : list of (name, mac_addr)
+            Devices to open
+
+        Returns
+        -------
+        dict
+            (name, mac_addr) in targets -> evdev.InputDevice.
+            Devices not found are not included.
+        """
+        with self.lock:
+            found = self._search_devices(
+                [(name, mac_addr.lower()) for name, mac_addr in targets])
+
+            devices = {}
+            for name, mac_addr in targets:
+                device = found.pop((name, mac_addr.lower()), None)
+                if device is None:
+                    continue
+
+                self.connected_paths.append(device.path)
+                devices[(name, mac_addr)] = device
+
+        return devices
+
     def remove_device(self, path):
-        self.connected_paths.remove(path)
+        with self.lock:
+            self.connected_paths.remove(path)
+
+    def close_device(self, device):
+        """
+        Close device returned by open_device() or open_devices()
+        and make its node available again.
+        """
+        with self.lock:
+            self.connected_paths.remove(device.path)
+            self._close(device)
 
     def reset(self):
         self.connected_paths.clear()
+        self.open_fds = 0
+        self.device_index.clear()
+        self.device_paths.clear()
+        self.node_ids.clear()
 
 
 EventDeviceManager = __EventDeviceManager()
@@ -0,0 +1,75 @@
+import logging
+import selectors
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class __EventReactor:
+    """
+    Single thread which waits on every monitored file descriptor
+    with one selector and calls the registered callback when readable.
+    """
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.RLock()
+        self.thread = None
+
+    def register(self, fileobj, callback):
+        """
+        Start watching fileobj and call callback() whenever it is readable.
+        """
+        with self.lock:
+            self.selector.register(fileobj, selectors.EVENT_READ, callback)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def unregister(self, fileobj):
+        """
+        Stop watching fileobj. Unknown objects are ignored.
+        """
+        with self.lock:
+            try:
+                self.selector.unregister(fileobj)
+            except (KeyError, ValueError):
+                pass
+
+    def is_registered(self, fileobj):
+        """
+        Returns True if fileobj is watched
+        """
+        return self._get_key(fileobj) is not None
+
+    def _get_key(self, fileobj):
+        with self.lock:
+            try:
+                return self.selector.get_key(fileobj)
+            except (KeyError, ValueError):
+                return None
+
+    def _run(self):
+        while True:
+            self._poll()
+
+    def _poll(self, timeout=1.0):
+        try:
+            ready = self.selector.select(timeout)
+        except OSError as e:
+            log.warning("selector failed: {}".format(e))
+            return
+
+        for key, _ in ready:
+            # The callback may have been unregistered (and its fd reused)
+            # by a previous callback in the same round.
+            if self._get_key(key.fileobj) is not key:
+                continue
+
+            try:
+                key.data()
+            except Exception:
+                log.exception("callback for {} failed".format(key.fileobj))
+
+
+EventReactor = __EventReactor()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+
+class EventStream:
+    """
+    Deliver published items to every asyncio subscriber.
+
+    publish() can be called from any thread. Items are handed to each
+    subscriber's event loop directly when called on the loop's thread,
+    otherwise through call_soon_threadsafe().
+    """
+    def __init__(self):
+        self.subscribers = ()
+        self.lock = threading.Lock()
+
+    def publish(self, item):
+        for subscriber in self.subscribers:
+            thread_id, loop, queue = subscriber
+
+            if thread_id == threading.get_ident():
+                queue.put_nowait(item)
+                continue
+
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Event loop of this subscriber is already closed
+                self._unsubscribe(subscriber)
+
+    async def events(self):
+        """
+        Async iterator which yields published items.
+        """
+        subscriber = (threading.get_ident(), asyncio.get_event_loop(),
+                      asyncio.Queue())
+        with self.lock:
+            self.subscribers = self.subscribers + (subscriber, )
+
+        try:
+            while True:
+                yield await subscriber[2].get()
+        finally:
+            self._unsubscribe(subscriber)
+
+    async def wait_for(self, match):
+        """
+        Wait for the first published item which match(item) returns True.
+        """
+        events = self.events()
+        try:
+            async for item in events:
+                if match(item):
+                    return item
+        finally:
+            await events.aclose()
+
+    def _unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers = tuple(
+                s for s in self.subscribers if s is not subscriber)
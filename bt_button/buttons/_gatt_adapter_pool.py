@@ -0,0 +1,179 @@
+import threading
+import pygatt
+
+DEFAULT_HCI_DEVICE = "hci0"
+# Connection attempts run at once on an HCI interface.
+# BlueZ queues LE connect requests of separate gatttool processes.
+DEFAULT_MAX_CONNECTING = 4
+
+
+def _multiple_connections(adapter):
+    """
+    Returns True if adapter can hold connections to several devices.
+    pygatt.GATTToolBackend drives one gatttool process which holds
+    only one connection, so it must not be shared.
+    """
+    return getattr(adapter, "multiple_connections", False) is True
+
+
+class __GattAdapterPool:
+    """
+    Start GATT backends for devices.
+
+    Backends which can hold several connections (multiple_connections
+    attribute is True) are shared among devices on the same HCI
+    interface. Other backends such as pygatt.GATTToolBackend are
+    started for each device.
+    """
+    def __init__(self):
+        self.adapters = {}
+        self.refcounts = {}
+        self.connect_slots = {}
+        self.max_connecting = DEFAULT_MAX_CONNECTING
+        # hci_device -> max_connecting set by set_max_connecting()
+        self.max_connecting_by_device = {}
+        # Called with hci_device= to create backend.
+        # pygatt.GATTToolBackend is used if None.
+        self.backend_factory = None
+        # hci_device -> threading.Event set when first GATTToolBackend
+        # of the interface, which resets it, was started
+        self.resets = {}
+        self.lock = threading.Lock()
+
+    def set_backend_factory(self, factory):
+        """
+        Create backends by factory instead of pygatt.GATTToolBackend.
+
+        Parameters
+        ----------
+        factory : function(hci_device)
+            Returns backend which provides start(), stop() and
+            connect(address, address_type, timeout),
+            or None to use pygatt.GATTToolBackend.
+            Backend is shared if its multiple_connections is True.
+        """
+        self.reset()
+        with self.lock:
+            self.backend_factory = factory
+
+    def acquire(self, hci_device=DEFAULT_HCI_DEVICE):
+        """
+        Returns started backend of hci_device.
+        Shared backend is started by first acquire(),
+        other backends by every acquire().
+
+        GATTToolBackend resets the interface and restarts BlueZ on start,
+        which drops every connection on it. Only the first one started
+        on each interface does so, and others wait until it started.
+
+        Backends are started without holding the pool lock,
+        so a slow start doesn't hold up other devices.
+        """
+        with self.lock:
+            adapter = self.adapters.get(hci_device)
+            if adapter is not None:
+                self.refcounts[hci_device] += 1
+                return adapter
+
+            factory = self.backend_factory
+            reset = False
+            if factory is None:
+                reset_done = self.resets.get(hci_device)
+                if reset_done is None:
+                    reset = True
+                    reset_done = threading.Event()
+                    self.resets[hci_device] = reset_done
+
+        if factory is None:
+            if not reset:
+                reset_done.wait()
+            adapter = pygatt.GATTToolBackend(hci_device=hci_device)
+            try:
+                adapter.start(reset_on_start=reset)
+            finally:
+                if reset:
+                    reset_done.set()
+        else:
+            adapter = factory(hci_device=hci_device)
+            adapter.start()
+
+        if not _multiple_connections(adapter):
+            return adapter
+
+        with self.lock:
+            shared = self.adapters.get(hci_device)
+            if shared is None:
+                self.adapters[hci_device] = adapter
+                self.refcounts[hci_device] = 1
+                return adapter
+
+            self.refcounts[hci_device] += 1
+
+        # Another device started shared backend meanwhile
+        adapter.stop()
+        return shared
+
+    def release(self, adapter, hci_device=DEFAULT_HCI_DEVICE):
+        """
+        Release backend got by acquire().
+        Shared backend is stopped when last user released it.
+        """
+        with self.lock:
+            if self.adapters.get(hci_device) is adapter:
+                self.refcounts[hci_device] -= 1
+                if self.refcounts[hci_device] > 0:
+                    return
+
+                del self.adapters[hci_device]
+                del self.refcounts[hci_device]
+
+        adapter.stop()
+
+    def set_max_connecting(self, count, hci_device=None):
+        """
+        Limit simultaneous connection attempts.
+
+        Parameters
+        ----------
+        count : int
+            Number of connection attempts run at once
+        hci_device : str
+            HCI interface to limit. Default of every interface
+            which has no own limit is changed if None.
+        """
+        with self.lock:
+            if hci_device is None:
+                self.max_connecting = count
+                for device in list(self.connect_slots):
+                    if device not in self.max_connecting_by_device:
+                        del self.connect_slots[device]
+            else:
+                self.max_connecting_by_device[hci_device] = count
+                self.connect_slots.pop(hci_device, None)
+
+    def connect_slot(self, hci_device=DEFAULT_HCI_DEVICE):
+        """
+        Returns semaphore which limits simultaneous connection attempts
+        on hci_device to max_connecting.
+        """
+        with self.lock:
+            slot = self.connect_slots.get(hci_device)
+            if slot is None:
+                slot = threading.BoundedSemaphore(
+                    self.max_connecting_by_device.get(
+                        hci_device, self.max_connecting))
+                self.connect_slots[hci_device] = slot
+
+            return slot
+
+    def reset(self):
+        with self.lock:
+            self.adapters.clear()
+            self.refcounts.clear()
+            self.connect_slots.clear()
+            self.resets.clear()
+            self.max_connecting = DEFAULT_MAX_CONNECTING
+            self.max_connecting_by_device.clear()
+
+
+GattAdapterPool = __GattAdapterPool()
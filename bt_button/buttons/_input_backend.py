@@ -0,0 +1,130 @@
+import ctypes
+import fcntl
+import logging
+import os
+import struct
+import evdev
+
+SYSFS_INPUT_ROOT = "/sys/class/input"
+
+# _IOW('E', 0x93, struct input_mask)
+EVIOCSMASK = 0x40104593
+_INPUT_MASK = struct.Struct("IIQ")
+
+log = logging.getLogger(__name__)
+
+
+def _set_event_mask(device, key_codes):
+    """
+    Ask kernel to deliver only EV_KEY events of key_codes
+    (and EV_SYN, which can't be masked) to this client.
+
+    Returns False if kernel doesn't support EVIOCSMASK
+    or device couldn't be queried.
+    """
+    key_bits = bytearray(max(key_codes) // 8 + 1)
+    for code in key_codes:
+        key_bits[code // 8] |= 1 << (code % 8)
+
+    try:
+        masks = {t: b"" for t in device.capabilities()
+                 if t not in (evdev.ecodes.EV_SYN, evdev.ecodes.EV_KEY)}
+        masks[evdev.ecodes.EV_KEY] = bytes(key_bits)
+
+        for event_type, bits in masks.items():
+            buf = ctypes.create_string_buffer(bits, max(len(bits), 1))
+            fcntl.ioctl(device.fd, EVIOCSMASK, _INPUT_MASK.pack(
+                event_type, len(bits), ctypes.addressof(buf)))
+    except OSError as e:
+        log.debug("event mask not supported: {}".format(e))
+        return False
+
+    return True
+
+
+class InputBackend:
+    """
+    Access to input event nodes used by EventDeviceManager.
+
+    Devices returned by open() must provide name, uniq, path, fileno(),
+    read() which yields all pending events and raises BlockingIOError
+    if there is none, and close(). Events must provide sec, usec,
+    type, code and value like evdev.events.InputEvent.
+    """
+    def list_devices(self):
+        """
+        Returns list of node paths
+        """
+        raise NotImplementedError
+
+    def open(self, path):
+        """
+        Returns opened device of path
+        """
+        raise NotImplementedError
+
+    def identify(self, path):
+        """
+        Returns (name, uniq) of path without opening it,
+        or None if it can't be known without opening.
+        """
+        return None
+
+    def node_id(self, path):
+        """
+        Returns value which changes when node of path is created again,
+        or None if it can't be known.
+        """
+        return None
+
+    def set_event_mask(self, device, key_codes):
+        """
+        Restrict events delivered to device to key_codes.
+        Returns False if not supported.
+        """
+        return False
+
+
+class EvdevBackend(InputBackend):
+    """
+    Input nodes of this host accessed through evdev.
+
+    Nodes are identified from sysfs attributes when use_sysfs is True.
+    """
+    def __init__(self):
+        self.use_sysfs = True
+        self.sysfs_root = SYSFS_INPUT_ROOT
+
+    def list_devices(self):
+        return evdev.util.list_devices()
+
+    def open(self, path):
+        return evdev.InputDevice(path)
+
+    def identify(self, path):
+        if not self.use_sysfs:
+            return None
+
+        dev_dir = os.path.join(
+            self.sysfs_root, os.path.basename(path), "device")
+
+        try:
+            with open(os.path.join(dev_dir, "name")) as f:
+                name = f.read().rstrip("\n")
+            with open(os.path.join(dev_dir, "uniq")) as f:
+                uniq = f.read().rstrip("\n")
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        return name, uniq
+
+    def node_id(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        # Node created again has new inode
+        return st.st_ino, st.st_ctime_ns
+
+    def set_event_mask(self, device, key_codes):
+        return _set_event_mask(device, key_codes)
@@ -0,0 +1,80 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+
+INPUT_DEV_DIR = "/dev/input"
+
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    return _libc
+
+
+class InputNodeWatcher:
+    """
+    Watch creation, permission change and deletion of event nodes
+    in /dev/input with inotify.
+
+    Raises OSError if inotify is not available.
+    """
+    def __init__(self, path=INPUT_DEV_DIR):
+        try:
+            libc = _get_libc()
+            init = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify is not available: {}".format(e))
+
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        mask = IN_CREATE | IN_ATTRIB | IN_MOVED_TO | IN_DELETE
+        if add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), path)
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        """
+        Returns list of (mask, name) of pending changes
+        for event nodes without blocking.
+        """
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return []
+
+        changes = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+
+            name = data[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+
+            if name.startswith("event"):
+                changes.append((mask, name))
+
+        return changes
+
+    def close(self):
+        os.close(self.fd)
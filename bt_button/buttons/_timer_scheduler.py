@@ -0,0 +1,84 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Timer:
+    def __init__(self, deadline, func, args):
+        self.deadline = deadline
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """
+    Run delayed calls of every device on one thread ordered by a heap,
+    instead of a threading.Timer thread per call.
+    """
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def schedule(self, delay, func, *args):
+        """
+        Call func(*args) after delay seconds.
+        Returns Timer which can be cancelled.
+        """
+        timer = Timer(time.monotonic() + delay, func, args)
+
+        with self.cond:
+            heapq.heappush(
+                self.heap, (timer.deadline, next(self.counter), timer))
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+            self.cond.notify()
+
+        return timer
+
+    def _pop_expired(self, now):
+        expired = []
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            timer = heapq.heappop(self.heap)[2]
+            if not timer.cancelled:
+                expired.append(timer)
+        return expired
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    # Drop cancelled timers so they don't decide wait time
+                    while len(self.heap) > 0 and self.heap[0][2].cancelled:
+                        heapq.heappop(self.heap)
+
+                    now = time.monotonic()
+                    expired = self._pop_expired(now)
+                    if len(expired) > 0:
+                        break
+
+                    timeout = None
+                    if len(self.heap) > 0:
+                        timeout = self.heap[0][0] - now
+                    self.cond.wait(timeout)
+
+            for timer in expired:
+                try:
+                    timer.func(*timer.args)
+                except Exception:
+                    log.exception("timer {} failed".format(timer.func))
+
+
+SharedScheduler = TimerScheduler()
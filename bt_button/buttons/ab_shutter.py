@@ -26,21 +26,18 @@ class AbShutter(EventDevice):
     mac_addr
         AbShutter's MAC Address
     """
+    button_enum = AbShutterButton
+    event_enum = AbShutterButtonEvent
+
     def __init__(self, mac_addr):
         super().__init__(mac_addr, "AB Shutter3")
 
-        self.button_event_funcs = {}
-        for button in list(AbShutterButton):
-            self.button_event_funcs[button] = {}
-
-            for event in list(AbShutterButtonEvent):
-                self.button_event_funcs[button][event] = None
-
         log.info("{}: initialized".format(self.name))
 
     def attach_button_event_listener(self, button, event, func):
         """
         Attach function that be called when button pushed.
+        Any number of functions can be attached to one event.
 
         Parameters
         ----------
@@ -49,12 +46,12 @@ class AbShutter(EventDevice):
         event : AbShutterButtonEvent
             Enum to identify target event
         func : function(e)
-            This function will be called with evdev.events.InputEvent
+            This function will be called with bt_button.ButtonEvent
             when target event happened.
         """
-        self.button_event_funcs[button][event] = func
+        self._add_listener(button, event, func)
 
-    def detach_button_event_listener(self, button, event):
+    def detach_button_event_listener(self, button, event, func=None):
         """
         Detach function that be called when button event happened.
 
@@ -64,14 +61,8 @@ class AbShutter(EventDevice):
             Enum to identify target button
         event : AbShutterButtonEvent
             Enum to identify target event
+        func : function(e)
+            Function to detach. All functions of target event
+            are detached if omitted.
         """
-        self.button_event_funcs[button][event] = None
-
-    def _key_event(self, e):
-        button = AbShutterButton(e.code)
-        event = AbShutterButtonEvent(e.value)
-
-        log.info("[{}] {}: {}".format(self.name, button, event))
-
-        if self.button_event_funcs[button][event] is not None:
-            self.button_event_funcs[button][event](e)
+        self._remove_listener(button, event, func)
@@ -24,21 +24,18 @@ class BTselfie(EventDevice):
     mac_addr
         BTselfie's MAC Address
     """
+    button_enum = BtSelfieButton
+    event_enum = BtSelfieButtonEvent
+
     def __init__(self, mac_addr):
         super().__init__(mac_addr, "BTselfie E Keyboard")
 
-        self.button_event_funcs = {}
-        for button in list(BtSelfieButton):
-            self.button_event_funcs[button] = {}
-
-            for event in list(BtSelfieButtonEvent):
-                self.button_event_funcs[button][event] = None
-
         logging.info("{}: initialized".format(self.name))
 
     def attach_button_event_listener(self, button, event, func):
         """
         Attach function that be called when button clicked.
+        Any number of functions can be attached to one event.
 
         Parameters
         ----------
@@ -47,12 +44,12 @@ class BTselfie(EventDevice):
         event : BtSelfieButtonEvent
             Enum to identify target event.
         func : function(e)
-            This function will be called with evdev.events.InputEvent
+            This function will be called with bt_button.ButtonEvent
             when button be clicked.
         """
-        self.button_event_funcs[button][event] = func
+        self._add_listener(button, event, func)
 
-    def detach_button_event_listener(self, button, event):
+    def detach_button_event_listener(self, button, event, func=None):
         """
         Detach function that be called when button clicked.
 
@@ -62,13 +59,8 @@ class BTselfie(EventDevice):
             Enum to identify target button.
         event : BtSelfieButtonEvent
             Enum to identify target event.
+        func : function(e)
+            Function to detach. All functions of target event
+            are detached if omitted.
         """
-        self.button_event_funcs[button][event] = None
-
-    def _key_event(self, e):
-        button = BtSelfieButton(e.code)
-        event = BtSelfieButtonEvent(e.value)
-
-        logging.info("{}: clicked.".format(self.name))
-        if self.button_event_funcs[button][event] is not None:
-            self.button_event_funcs[button][event](e)
+        self._remove_listener(button, event, func)
@@ -1,16 +1,30 @@
 import logging
 import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
 import pygatt
 
 from .. import DeviceNotFoundError
+from ..event import _make as _make_event, _recycle as _recycle_event
+from ..metrics import MetricsRegistry
+from ._dispatch import call_listeners
+from ._event_stream import EventStream
+from ._gatt_adapter_pool import GattAdapterPool, DEFAULT_HCI_DEVICE
 
 DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONCURRENCY = 4
 
 logging.getLogger("pygatt").setLevel(logging.CRITICAL)
 log = logging.getLogger(__name__)
 
 
+class SmartPaletteButtonEvent(Enum):
+    # SmartPalette reports only pushes
+    PUSHED = 1
+
+
 class SmartPaletteButton(Enum):
     BEIGE = 3
     YELLOW = 4
@@ -33,42 +47,84 @@ class SmartPaletteButton(Enum):
     BIG_BUTTON = 12
 
 
-def _data_to_button(data):
-    decoded_data = struct.unpack('5sb', data)[0].decode()
-    button_number = int(decoded_data.replace("PIN", ""))
-    return SmartPaletteButton(button_number)
+NOTIFICATION_SIZE = 6
 
 
-def _button_to_data(button):
+def _encode_button(button):
     data_str = "PIN{:02}".format(button.value)
     return struct.pack("5s", data_str.encode('utf-8')) + b'\x00'
 
 
+# Notification is "PINxx" and one more byte which is not used
+_BUTTON_TO_DATA = {b: _encode_button(b) for b in SmartPaletteButton}
+_PIN_TO_BUTTON = {d[:5]: b for b, d in _BUTTON_TO_DATA.items()}
+
+
+def _data_to_button(data):
+    """
+    Returns SmartPaletteButton of notification,
+    or None if data is not a known notification.
+    """
+    if len(data) != NOTIFICATION_SIZE:
+        return None
+    return _PIN_TO_BUTTON.get(bytes(data[:5]))
+
+
+def _button_to_data(button):
+    return _BUTTON_TO_DATA[button]
+
+
 class SmartPalette:
-    def __init__(self, mac_addr):
+    button_enum = SmartPaletteButton
+
+    def __init__(self, mac_addr, hci_device=DEFAULT_HCI_DEVICE):
         """
         Create instance of SmartPalette.
 
+        GATTTool backend of SmartPalette is started by first connect()
+        and kept across reconnects until close(). gatttool holds only
+        one connection, so each SmartPalette runs its own process.
+
         Parameters
         -------
         mac_addr
             SmartPalette's MAC Address
+        hci_device : str
+            HCI interface to connect through
         """
         self.mac_addr = mac_addr
+        self.hci_device = hci_device
         self.device = None
 
         self.name = "SmartPalette"
 
         self.pushed_funcs = {}
         for button in list(SmartPaletteButton):
-            self.pushed_funcs[button] = None
+            self.pushed_funcs[button] = ()
+        self.listener_lock = threading.Lock()
+
+        self.event_stream = EventStream()
+
+        self.disconnected_func = None
 
-        self.adapter = pygatt.GATTToolBackend()
+        self.executor = None
+        # bt_button.Recorder which records notifications
+        self.recorder = None
 
-        self.adapter.start()
+        self.metrics = MetricsRegistry.register(self)
+
+        # Backend is started by first connect()
+        self.adapter = None
 
         log.info("{}: initialized".format(self.name))
 
+    @property
+    def unknown_notifications(self):
+        """
+        Number of notifications which didn't match any button
+        """
+        return self.metrics.unknown_codes
+
     def is_connected(self):
         """
         Returns True if device is connected
@@ -82,20 +138,40 @@ class SmartPalette:
         Parameters
         -------
         timeout : integer
-            Wait time for connection
+            Wait time for connection, including time waiting for
+            other connection attempts on the interface
+            (GattAdapterPool.set_max_connecting()).
+            Time starting the backend by first connect() is not included.
         """
+        if self.adapter is None:
+            self.adapter = GattAdapterPool.acquire(self.hci_device)
+        deadline = time.monotonic() + timeout
+
+        slot = GattAdapterPool.connect_slot(self.hci_device)
+        if not slot.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise DeviceNotFoundError(
+                "Timed out waiting to connect:", self.name, self.mac_addr)
+
         try:
+            start = time.monotonic()
             self.device = self.adapter.connect(
                 self.mac_addr,
                 address_type=pygatt.BLEAddressType.random,
-                timeout=timeout
+                timeout=max(deadline - start, 0)
             )
+            self.metrics.connect_seconds.observe(time.monotonic() - start)
         except pygatt.exceptions.NotConnectedError:
             raise DeviceNotFoundError(
                 "Device not found:", self.name, self.mac_addr)
+        finally:
+            slot.release()
+
+        self.metrics.connects += 1
 
         log.info("{}: connected".format(self.name))
 
+        self.device.register_disconnect_callback(self._disconnected)
+
         # self.device.char_write_handle(12, bytearray([0x01, 0x00]))
         self.device.subscribe("6e400003-b5a3-f393-e0a9-e50e24dcca9e",
                               callback=self._event)
@@ -107,25 +183,83 @@ class SmartPalette:
         if not self.is_connected():
             return
 
-        self.device.disconnect()
+        device = self.device
         self.device = None
-        self.adapter.stop()
+        device.disconnect()
         log.info("{}: disconnected".format(self.name))
 
+    def close(self):
+        """
+        Disconnect and stop backend.
+        Shared backend is stopped when all devices on the interface closed.
+        """
+        self.disconnect()
+
+        if self.adapter is None:
+            return
+
+        adapter = self.adapter
+        self.adapter = None
+        GattAdapterPool.release(adapter, self.hci_device)
+
+    def _disconnected(self, event=None):
+        if not self.is_connected():
+            return
+
+        self.device = None
+        self.metrics.disconnects += 1
+        log.info("{}: connection lost".format(self.name))
+
+        if self.disconnected_func is not None:
+            self.disconnected_func()
+
+    def set_dispatch_executor(self, executor):
+        """
+        Run listeners on executor instead of notification thread.
+        If executor uses OverflowPolicy.BLOCK, a full queue stalls
+        events of every device sharing the notification thread.
+
+        Parameters
+        ----------
+        executor : bt_button.DispatchExecutor
+            Executor to run listeners, or None to run them directly.
+        """
+        self.executor = executor
+
+    def attach_disconnected_listener(self, func):
+        """
+        Attach function that be called when connection lost.
+
+        Parameters
+        ----------
+        func : function()
+            This function will be called when connection lost.
+        """
+        self.disconnected_func = func
+
+    def detach_disconnected_listener(self):
+        """
+        Detach function that be called when connection lost.
+        """
+        self.disconnected_func = None
+
     def attach_pushed_listener(self, button, func):
         """
         Attach function that be called when button clicked.
+        Any number of functions can be attached to one button.
 
         Parameters
         ----------
         button : SmartPaletteButton
             Enum to identify target button.
-        func : function()
-            This function will be called when button be clicked.
+        func : function(e)
+            This function will be called with bt_button.ButtonEvent
+            when button be clicked.
         """
-        self.pushed_funcs[button] = func
+        with self.listener_lock:
+            self.pushed_funcs[button] = self.pushed_funcs[button] + (func, )
 
-    def detach_pushed_listener(self, button):
+    def detach_pushed_listener(self, button, func=None):
         """
         Detach function that be called when button clicked.
 
@@ -133,12 +267,123 @@ class SmartPalette:
         ----------
         button : SmartPaletteButton
             Enum to identify target button.
+        func : function(e)
+            Function to detach. All functions of target button
+            are detached if omitted.
+        """
+        with self.listener_lock:
+            funcs = ()
+            if func is not None:
+                funcs = tuple(
+                    f for f in self.pushed_funcs[button] if f != func)
+            self.pushed_funcs[button] = funcs
+
+    def events(self):
+        """
+        Async iterator which yields bt_button.ButtonEvent
+        of every pushed button, same as listeners get.
+
+        .. code-block:: python
+
+           async for e in smart_palette.events():
+               print(e.button)
+        """
+        return self.event_stream.events()
+
+    async def wait_for(self, button):
+        """
+        Wait until target button pushed.
+
+        Parameters
+        ----------
+        button : SmartPaletteButton
+            Enum to identify target button.
+
+        Returns
+        -------
+        bt_button.ButtonEvent
+            Event which matched.
         """
-        self.pushed_funcs[button] = None
+        return await self.event_stream.wait_for(lambda e: e.button == button)
 
     def _event(self, _, data):
+        arrived_at = time.time()
+        self.metrics.events_received += 1
+
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_notification(self, data)
+
         button = _data_to_button(data)
+        if button is None:
+            self.metrics.unknown_codes += 1
+            log.debug("{}: unknown notification {}".format(self.name, data))
+            return
+
+        self._dispatch(button, arrived_at)
+
+    def _dispatch(self, button, timestamp=None):
+        self.metrics.events_dispatched += 1
+        if log.isEnabledFor(logging.INFO):
+            log.info("{} : pushed.".format(button))
+
+        # ButtonEvent is built only when someone listens
+        funcs = self.pushed_funcs[button]
+        stream = self.event_stream
+        if len(funcs) == 0 and len(stream.subscribers) == 0:
+            return
+
+        if timestamp is None:
+            timestamp = time.time()
+        e = _make_event(
+            self, button, SmartPaletteButtonEvent.PUSHED, timestamp)
+        if len(funcs) > 0:
+            call_listeners(self, funcs, e)
+        stream.publish(e)
+        _recycle_event(e)
+
+
+def connect_all(palettes, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                timeout=DEFAULT_CONNECT_TIMEOUT, on_result=None):
+    """
+    Connect SmartPalettes concurrently and wait until all attempts
+    finished.
+
+    Attempts on the same HCI interface are limited by
+    GattAdapterPool.set_max_connecting(). Time waiting for the limit
+    counts against timeout.
+
+    Parameters
+    ----------
+    palettes : list of SmartPalette
+        Devices to connect. Already connected ones are skipped.
+    max_concurrency : int
+        Number of connection attempts run at once
+    timeout : float
+        Wait time for each connection
+    on_result : function(palette, exception)
+        Called on the calling thread as each attempt finished,
+        with None as exception on success.
+
+    Returns
+    -------
+    list of (SmartPalette, Exception)
+        Each device and None on success or the raised exception,
+        in order of completion.
+    """
+    targets = [p for p in palettes if not p.is_connected()]
+    if len(targets) == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = {executor.submit(p.connect, timeout=timeout): p
+                   for p in targets}
+
+        results = []
+        for future in as_completed(futures):
+            result = (futures[future], future.exception())
+            results.append(result)
+            if on_result is not None:
+                on_result(*result)
 
-        log.info("{} : pushed.".format(button))
-        if self.pushed_funcs[button] is not None:
-            self.pushed_funcs[button]()
+        return results
@@ -0,0 +1,117 @@
+import sys
+
+DEFAULT_FREE_LIST_SIZE = 256
+
+# Recycled ButtonEvents. Disabled while _free_list_size is 0.
+_free_list = []
+_free_list_size = 0
+
+_new = object.__new__
+_set = object.__setattr__
+
+
+class ButtonEvent:
+    """
+    Button event passed to every listener of every device.
+
+    Attributes are read only.
+
+    Attributes
+    ----------
+    device : AbShutter, BTselfie or SmartPalette
+        Device which reported the event
+    button : Enum
+        Button such as AbShutterButton.LARGE
+    event : Enum
+        Event such as AbShutterButtonEvent.PUSHED
+    timestamp : float
+        Seconds since epoch. Kernel timestamp for event devices,
+        arrival time of notification for SmartPalette.
+    """
+    __slots__ = ("device", "button", "event", "timestamp")
+
+    def __init__(self, device, button, event, timestamp):
+        _set(self, "device", device)
+        _set(self, "button", button)
+        _set(self, "event", event)
+        _set(self, "timestamp", timestamp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ButtonEvent is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("ButtonEvent is read only")
+
+    def __eq__(self, other):
+        if not isinstance(other, ButtonEvent):
+            return NotImplemented
+        return (self.device is other.device and
+                self.button == other.button and
+                self.event == other.event and
+                self.timestamp == other.timestamp)
+
+    def __hash__(self):
+        return hash((id(self.device), self.button, self.event,
+                     self.timestamp))
+
+    def __repr__(self):
+        return "ButtonEvent({}, {}, {}, {:.6f})".format(
+            getattr(self.device, "name", self.device),
+            self.button, self.event, self.timestamp)
+
+
+def set_free_list_size(size=DEFAULT_FREE_LIST_SIZE):
+    """
+    Recycle up to size ButtonEvents instead of allocating one per event.
+    Recycling is disabled if size is 0.
+
+    An event is recycled only when no listener, executor or
+    other object still refers to it after dispatch.
+    """
+    global _free_list_size
+
+    _free_list_size = size
+    del _free_list[size:]
+
+
+def _make(device, button, event, timestamp):
+    """
+    Returns ButtonEvent, recycled one if available
+    """
+    if _free_list:
+        try:
+            e = _free_list.pop()
+        except IndexError:
+            e = _new(ButtonEvent)
+    else:
+        e = _new(ButtonEvent)
+
+    _set(e, "device", device)
+    _set(e, "button", button)
+    _set(e, "event", event)
+    _set(e, "timestamp", timestamp)
+    return e
+
+
+def _refcount(e):
+    return sys.getrefcount(e)
+
+
+def _calibrate():
+    e = _new(ButtonEvent)
+    return _refcount(e)
+
+
+# References of an event held only by the dispatching function
+_SOLE_OWNER = _calibrate()
+
+
+def _recycle(e):
+    """
+    Called by dispatcher which holds e in a local variable
+    after all listeners were called.
+    """
+    if len(_free_list) < _free_list_size and \
+            sys.getrefcount(e) == _SOLE_OWNER:
+        _set(e, "device", None)
+        _free_list.append(e)
@@ -0,0 +1,201 @@
+import collections
+import logging
+import threading
+import time
+from enum import Enum
+
+from . import profiler as _profiler
+from .event import ButtonEvent
+
+DEFAULT_MAX_WORKERS = 1
+DEFAULT_MAX_QUEUE = 64
+
+log = logging.getLogger(__name__)
+
+
+class OverflowPolicy(Enum):
+    # Wait until queue has room
+    BLOCK = "block"
+    # Discard oldest queued call
+    DROP_OLDEST = "drop_oldest"
+    # Discard new call
+    DROP_NEWEST = "drop_newest"
+    # Replace queued call of same function with new one.
+    # Calls with ButtonEvent are replaced only by the same
+    # button event of the same device.
+    COALESCE = "coalesce"
+
+
+def _coalesce_key(func, args):
+    if len(args) > 0 and isinstance(args[0], ButtonEvent):
+        e = args[0]
+        return func, id(e.device), e.button, e.event
+    return func,
+
+
+class DispatchExecutor:
+    """
+    Run listeners on worker threads through a bounded queue,
+    so slow listeners don't stall device reading.
+
+    An executor can be shared by many devices.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of worker threads
+    max_queue : int
+        Number of calls which can wait in queue
+    overflow : OverflowPolicy
+        What to do when queue is full. COALESCE falls back to
+        DROP_OLDEST if no matching call is queued.
+        BLOCK stalls reading of every device dispatching to
+        this executor until a worker takes a call.
+    """
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS,
+                 max_queue=DEFAULT_MAX_QUEUE,
+                 overflow=OverflowPolicy.DROP_OLDEST):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+
+        self.queue = collections.deque()
+        self.cond = threading.Condition()
+        self.threads = []
+        self.running = True
+
+        self.submitted = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        """
+        Number of calls waiting in queue
+        """
+        return len(self.queue)
+
+    def submit(self, func, *args):
+        """
+        Queue func(*args).
+
+        Returns False if the call was dropped.
+        """
+        with self.cond:
+            if not self.running:
+                return False
+
+            if len(self.queue) >= self.max_queue:
+                if not self._make_room(func, args):
+                    return False
+
+            self.queue.append([func, args, time.time()])
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, len(self.queue))
+
+            if len(self.threads) < self.max_workers:
+                self._start_worker()
+
+            self.cond.notify_all()
+
+        return True
+
+    def _make_room(self, func, args):
+        """
+        Called with full queue. Returns False if call shall not be queued.
+        """
+        if self.overflow == OverflowPolicy.BLOCK:
+            while len(self.queue) >= self.max_queue and self.running:
+                self.cond.wait()
+            return self.running
+
+        if self.overflow == OverflowPolicy.DROP_NEWEST:
+            self.dropped += 1
+            return False
+
+        if self.overflow == OverflowPolicy.COALESCE:
+            key = _coalesce_key(func, args)
+            for task in reversed(self.queue):
+                if _coalesce_key(task[0], task[1]) == key:
+                    task[1] = args
+                    self.coalesced += 1
+                    return False
+
+        self.queue.popleft()
+        self.dropped += 1
+        return True
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._work, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while len(self.queue) == 0 and self.running:
+                    self.cond.wait()
+
+                if len(self.queue) == 0:
+                    return
+
+                func, args, queued_at = self.queue.popleft()
+                self.cond.notify_all()
+
+            metrics = None
+            if len(args) > 0 and isinstance(args[0], ButtonEvent):
+                metrics = getattr(args[0].device, "metrics", None)
+            if metrics is not None:
+                self._observe_latency(metrics, args[0], queued_at)
+
+            profiler = _profiler.active
+            if profiler is not None and not profiler._sample():
+                profiler = None
+
+            start = time.perf_counter()
+            try:
+                func(*args)
+            except Exception:
+                log.exception("listener {} failed".format(func))
+            elapsed = time.perf_counter() - start
+
+            if metrics is not None:
+                metrics.listener_seconds.observe(elapsed)
+            if profiler is not None:
+                profiler._record(func, args[0] if args else None, elapsed)
+
+    def _observe_latency(self, metrics, e, queued_at):
+        now = time.time()
+        metrics.latency.queue.observe(now - queued_at)
+        metrics.latency.total.observe(now - e.timestamp)
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting calls. Queued calls are still run.
+
+        Parameters
+        ----------
+        wait : bool
+            Wait until queued calls finished
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def stats(self):
+        """
+        Returns dict of queue depth and counters
+        """
+        with self.cond:
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+            }
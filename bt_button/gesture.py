@@ -0,0 +1,378 @@
+import logging
+import threading
+import time
+from enum import Enum
+
+from .buttons._timer_scheduler import SharedScheduler
+
+DEFAULT_DOUBLE_PRESS_INTERVAL = 0.4
+DEFAULT_LONG_PRESS_TIME = 1.0
+DEFAULT_CHORD_WINDOW = 0.15
+
+log = logging.getLogger(__name__)
+
+
+class Gesture(Enum):
+    DOUBLE_PRESS = "double_press"
+    LONG_PRESS = "long_press"
+    CHORD = "chord"
+
+
+class GestureEvent:
+    """
+    Recognized gesture.
+
+    Attributes
+    ----------
+    gesture : Gesture
+        Kind of gesture
+    buttons : tuple of (device, button)
+        Buttons which made the gesture
+    duration : float
+        Seconds between two presses for DOUBLE_PRESS,
+        seconds between first and last press for CHORD.
+        LONG_PRESS fires while the button is still held, so its duration
+        is the time held until then, about long_press_time.
+    """
+    def __init__(self, gesture, buttons, duration):
+        self.gesture = gesture
+        self.buttons = buttons
+        self.duration = duration
+
+    def __repr__(self):
+        return "GestureEvent({}, {}, {:.3f})".format(
+            self.gesture, [b for _, b in self.buttons], self.duration)
+
+
+class _ButtonState:
+    def __init__(self, double_press_interval, long_press_time, releasable):
+        self.double_press_interval = double_press_interval
+        self.long_press_time = long_press_time
+        # SmartPalette reports only pushes, so it can't make LONG_PRESS
+        self.releasable = releasable
+
+        self.last_press = None
+        self.recent_press = None
+        self.pressed_at = None
+        self.long_press_token = None
+        # Timer of pending LONG_PRESS
+        self.long_press_timer = None
+
+    def cancel_long_press(self):
+        self.long_press_token = None
+        if self.long_press_timer is not None:
+            self.long_press_timer.cancel()
+            self.long_press_timer = None
+
+
+class GestureRecognizer:
+    """
+    Recognize double presses, long presses and chords
+    from button events of watched devices.
+
+    Intervals of double presses and chords are measured with
+    timestamps of button events, so delays of dispatch don't change them.
+    Long presses are timed by one scheduler thread shared by
+    every recognizer, not by a timer thread per press.
+
+    Parameters
+    ----------
+    double_press_interval : float
+        Longest seconds between presses of a DOUBLE_PRESS
+    long_press_time : float
+        Seconds a button must be held to make LONG_PRESS.
+        LONG_PRESS fires when this time passed, before release.
+    chord_window : float
+        Longest seconds between first and last press of a CHORD
+    """
+    def __init__(self, double_press_interval=DEFAULT_DOUBLE_PRESS_INTERVAL,
+                 long_press_time=DEFAULT_LONG_PRESS_TIME,
+                 chord_window=DEFAULT_CHORD_WINDOW, scheduler=None):
+        self.double_press_interval = double_press_interval
+        self.long_press_time = long_press_time
+        self.chord_window = chord_window
+        self.scheduler = SharedScheduler if scheduler is None else scheduler
+
+        # (device, button) -> _ButtonState
+        self.states = {}
+        # device -> [(button, event, func), ...] attached to device
+        self.watched = {}
+        # ((device, button), gesture) -> tuple of functions
+        self.gesture_funcs = {}
+        # frozenset of (device, button) -> tuple of functions
+        self.chord_funcs = {}
+
+        self.lock = threading.RLock()
+
+    def watch(self, device):
+        """
+        Start recognizing gestures of device.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        """
+        with self.lock:
+            if device in self.watched:
+                return
+
+            listeners = []
+            # Event devices report pushes and releases of button_enum
+            # with event_enum, SmartPalette reports only pushes.
+            if getattr(device, "event_enum", None) is not None:
+                for button in device.button_enum:
+                    key = (device, button)
+                    listeners.append((
+                        button, device.event_enum.PUSHED,
+                        lambda e, key=key: self._pressed(key, e.timestamp)))
+                    listeners.append((
+                        button, device.event_enum.RELEASED,
+                        lambda e, key=key: self._released(key)))
+                    self._add_state(key, True)
+
+                for button, event, func in listeners:
+                    device.attach_button_event_listener(button, event, func)
+            else:
+                for button in device.button_enum:
+                    key = (device, button)
+                    listeners.append((
+                        button, None,
+                        lambda e, key=key: self._pressed(key, e.timestamp)))
+                    self._add_state(key, False)
+
+                for button, _, func in listeners:
+                    device.attach_pushed_listener(button, func)
+
+            self.watched[device] = listeners
+
+    def unwatch(self, device):
+        """
+        Stop recognizing gestures of device.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        """
+        with self.lock:
+            listeners = self.watched.pop(device, [])
+            for button, event, func in listeners:
+                if event is None:
+                    device.detach_pushed_listener(button, func)
+                else:
+                    device.detach_button_event_listener(button, event, func)
+
+                state = self.states.pop((device, button), None)
+                if state is not None:
+                    state.cancel_long_press()
+
+    def configure(self, device, button, double_press_interval=None,
+                  long_press_time=None):
+        """
+        Change recognition parameters of one watched button.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        button : Enum
+            Enum to identify target button
+        double_press_interval : float
+            Longest seconds between presses of a DOUBLE_PRESS
+        long_press_time : float
+            Seconds the button must be held to make LONG_PRESS
+        """
+        with self.lock:
+            state = self.states[(device, button)]
+            if double_press_interval is not None:
+                state.double_press_interval = double_press_interval
+            if long_press_time is not None:
+                state.long_press_time = long_press_time
+
+    def attach_gesture_listener(self, device, button, gesture, func):
+        """
+        Attach function that be called when gesture recognized.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        button : Enum
+            Enum to identify target button
+        gesture : Gesture
+            Gesture.DOUBLE_PRESS or Gesture.LONG_PRESS
+        func : function(e)
+            This function will be called with GestureEvent.
+        """
+        if gesture == Gesture.CHORD:
+            raise ValueError("Use attach_chord_listener() for chords")
+
+        slot = ((device, button), gesture)
+        with self.lock:
+            self.gesture_funcs[slot] = \
+                self.gesture_funcs.get(slot, ()) + (func, )
+
+    def detach_gesture_listener(self, device, button, gesture, func=None):
+        """
+        Detach function that be called when gesture recognized.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        button : Enum
+            Enum to identify target button
+        gesture : Gesture
+            Gesture.DOUBLE_PRESS or Gesture.LONG_PRESS
+        func : function(e)
+            Function to detach. All functions are detached if omitted.
+        """
+        slot = ((device, button), gesture)
+        with self.lock:
+            self.gesture_funcs[slot] = self._without(
+                self.gesture_funcs.get(slot, ()), func)
+
+    def attach_chord_listener(self, buttons, func):
+        """
+        Attach function that be called when all buttons pressed together.
+
+        Parameters
+        ----------
+        buttons : list of (device, button)
+            Buttons of chord. They can belong to different devices.
+        func : function(e)
+            This function will be called with GestureEvent.
+        """
+        chord = frozenset(buttons)
+        with self.lock:
+            self.chord_funcs[chord] = \
+                self.chord_funcs.get(chord, ()) + (func, )
+
+    def detach_chord_listener(self, buttons, func=None):
+        """
+        Detach function that be called when all buttons pressed together.
+
+        Parameters
+        ----------
+        buttons : list of (device, button)
+            Buttons of chord
+        func : function(e)
+            Function to detach. All functions are detached if omitted.
+        """
+        chord = frozenset(buttons)
+        with self.lock:
+            funcs = self._without(self.chord_funcs.get(chord, ()), func)
+            if len(funcs) == 0:
+                self.chord_funcs.pop(chord, None)
+            else:
+                self.chord_funcs[chord] = funcs
+
+    def _without(self, funcs, func):
+        if func is None:
+            return ()
+        return tuple(f for f in funcs if f != func)
+
+    def _add_state(self, key, releasable):
+        self.states[key] = _ButtonState(
+            self.double_press_interval, self.long_press_time, releasable)
+
+    def _pressed(self, key, timestamp, now=None):
+        """
+        Called with timestamp of button event.
+        now is time.monotonic() to time LONG_PRESS with scheduler.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        emits = []
+        with self.lock:
+            state = self.states.get(key)
+            if state is None:
+                return
+
+            if state.last_press is not None and 0 <= \
+                    timestamp - state.last_press <= \
+                    state.double_press_interval:
+                emits.append(self._gesture(
+                    key, Gesture.DOUBLE_PRESS, timestamp - state.last_press))
+                state.last_press = None
+            else:
+                state.last_press = timestamp
+
+            if state.releasable:
+                state.cancel_long_press()
+                token = object()
+                state.pressed_at = now
+                state.long_press_token = token
+                state.long_press_timer = self.scheduler.schedule(
+                    state.long_press_time, self._long_pressed, key, token)
+
+            state.recent_press = timestamp
+            emits.extend(self._chords(key))
+
+        self._emit(emits)
+
+    def _released(self, key):
+        with self.lock:
+            state = self.states.get(key)
+            if state is None:
+                return
+
+            state.pressed_at = None
+            state.cancel_long_press()
+
+    def _long_pressed(self, key, token, now=None):
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            state = self.states.get(key)
+            if state is None or state.long_press_token is not token:
+                return
+
+            state.long_press_token = None
+            state.long_press_timer = None
+            # Holding the button is not a part of double press
+            state.last_press = None
+            emits = [self._gesture(
+                key, Gesture.LONG_PRESS, now - state.pressed_at)]
+
+        self._emit(emits)
+
+    def _chords(self, key):
+        emits = []
+        for chord, funcs in self.chord_funcs.items():
+            if key not in chord:
+                continue
+
+            presses = [self.states[k].recent_press for k in chord
+                       if k in self.states]
+            if len(presses) != len(chord) or None in presses:
+                continue
+
+            # Events of different devices may arrive out of order
+            duration = max(presses) - min(presses)
+            if duration > self.chord_window:
+                continue
+
+            for k in chord:
+                self.states[k].recent_press = None
+            e = GestureEvent(Gesture.CHORD, tuple(chord), duration)
+            emits.append((funcs, e))
+
+        return emits
+
+    def _gesture(self, key, gesture, duration):
+        funcs = self.gesture_funcs.get((key, gesture), ())
+        return funcs, GestureEvent(gesture, (key, ), duration)
+
+    def _emit(self, emits):
+        for funcs, e in emits:
+            if log.isEnabledFor(logging.INFO):
+                log.info("{}".format(e))
+            for func in funcs:
+                try:
+                    func(e)
+                except Exception:
+                    log.exception("gesture listener {} failed".format(func))
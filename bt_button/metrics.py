@@ -0,0 +1,405 @@
+import bisect
+import collections
+import logging
+import os
+import threading
+import weakref
+
+# Upper bounds of histogram buckets in seconds
+DEFAULT_LISTENER_BUCKETS = (
+    0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+DEFAULT_CONNECT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+# Number of recent events kept for latency percentiles
+DEFAULT_LATENCY_WINDOW = 1024
+DEFAULT_EXPORTER_HOST = "127.0.0.1"
+DEFAULT_EXPORTER_PORT = 9464
+
+log = logging.getLogger(__name__)
+
+
+class Histogram:
+    """
+    Counts of observed values by bucket.
+
+    Like counters of DeviceMetrics, it takes no lock.
+    Values are observed by the thread which reads the device,
+    so a snapshot may miss an observation being made.
+    """
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        # Last one counts values larger than every bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        Returns dict of cumulative bucket counts, sum and count
+        """
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"), ),
+                                list(self.counts)):
+            total += count
+            buckets[bound] = total
+        return {"buckets": buckets, "sum": self.sum, "count": total}
+
+
+def _percentile(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+class LatencyWindow:
+    """
+    Latencies of recent events in seconds.
+    Old values are discarded when window is full,
+    sum and number of every observed value are kept.
+    """
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        self.values = collections.deque(maxlen=window)
+        self.sum = 0.0
+        self.observed = 0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.sum += value
+        self.observed += 1
+
+    def snapshot(self):
+        """
+        Returns dict of count, p50, p99 and max of values in window,
+        and sum and number of every observed value.
+        Percentiles are None while window is empty.
+        """
+        values = sorted(self.values)
+        snapshot = {"sum": self.sum, "observed": self.observed}
+        if len(values) == 0:
+            snapshot.update(count=0, p50=None, p99=None, max=None)
+        else:
+            snapshot.update(
+                count=len(values), p50=_percentile(values, 0.5),
+                p99=_percentile(values, 0.99), max=values[-1])
+        return snapshot
+
+
+class LatencyTracker:
+    """
+    Press-to-dispatch latency of one device by stage.
+
+    Only events which have listeners are measured.
+    Replayed events keep their recorded timestamps,
+    so read and total stages are meaningless while replaying.
+
+    Attributes
+    ----------
+    read : LatencyWindow
+        Kernel timestamp of event to read() returning it.
+        Event devices only.
+    decode : LatencyWindow
+        read() returning to dispatch of the button event.
+        Event devices only.
+    queue : LatencyWindow
+        Submission to DispatchExecutor to listener start.
+        Measured for each listener call, only with executor.
+    total : LatencyWindow
+        Kernel timestamp, or arrival of notification for SmartPalette,
+        to listener start. Measured for each listener call with executor.
+    """
+    STAGES = ("read", "decode", "queue", "total")
+
+    def __init__(self, window=DEFAULT_LATENCY_WINDOW):
+        self.read = LatencyWindow(window)
+        self.decode = LatencyWindow(window)
+        self.queue = LatencyWindow(window)
+        self.total = LatencyWindow(window)
+
+    def snapshot(self):
+        """
+        Returns dict of stage name to LatencyWindow.snapshot()
+        """
+        return {stage: getattr(self, stage).snapshot()
+                for stage in self.STAGES}
+
+
+class DeviceMetrics:
+    """
+    Counters of one device.
+
+    Attributes
+    ----------
+    events_received : int
+        Input events read, or notifications received for SmartPalette
+    events_dispatched : int
+        Button events passed to dispatch
+    unknown_codes : int
+        Events of keys or notifications which aren't buttons
+    syn_dropped : int
+        SYN_DROPPED reported by kernel
+    connects : int
+        Monitoring started or connected
+    disconnects : int
+        Device disappeared or connection lost
+    connect_seconds : Histogram
+        Time to open device or connect
+    listener_seconds : Histogram
+        Time of each listener call, inline or on executor
+    latency : LatencyTracker
+        Press-to-dispatch latency of recent events
+    """
+    def __init__(self, listener_buckets=DEFAULT_LISTENER_BUCKETS,
+                 connect_buckets=DEFAULT_CONNECT_BUCKETS):
+        self.events_received = 0
+        self.events_dispatched = 0
+        self.unknown_codes = 0
+        self.syn_dropped = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.connect_seconds = Histogram(connect_buckets)
+        self.listener_seconds = Histogram(listener_buckets)
+        self.latency = LatencyTracker()
+
+    @property
+    def reconnects(self):
+        return max(self.connects - 1, 0)
+
+    def snapshot(self):
+        return {
+            "events_received": self.events_received,
+            "events_dispatched": self.events_dispatched,
+            "unknown_codes": self.unknown_codes,
+            "syn_dropped": self.syn_dropped,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "connect_seconds": self.connect_seconds.snapshot(),
+            "listener_seconds": self.listener_seconds.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+
+
+# (name, type, help) of exported values
+_COUNTERS = [
+    ("events_received", "counter",
+     "Input events read or notifications received"),
+    ("events_dispatched", "counter", "Button events dispatched"),
+    ("unknown_codes", "counter", "Events which are not buttons"),
+    ("syn_dropped", "counter", "SYN_DROPPED reported by kernel"),
+    ("connects", "counter", "Times monitoring started or connected"),
+    ("reconnects", "counter", "Connects after the first one"),
+    ("disconnects", "counter", "Times device disappeared"),
+]
+_HISTOGRAMS = [
+    ("connect_seconds", "Time to open or connect device"),
+    ("listener_seconds", "Time of listener calls"),
+]
+# Exported as quantile label of bt_button_latency_seconds
+_QUANTILES = [("p50", "0.5"), ("p99", "0.99")]
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n")
+
+
+def _format_bound(bound):
+    if bound == float("inf"):
+        return "+Inf"
+    return repr(float(bound))
+
+
+class __MetricsRegistry:
+    """
+    Metrics of every AbShutter, BTselfie and SmartPalette.
+    Devices are registered when created and forgotten when collected.
+    """
+    def __init__(self):
+        self.devices = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def register(self, device):
+        """
+        Returns DeviceMetrics of device
+        """
+        metrics = DeviceMetrics()
+        with self.lock:
+            self.devices[device] = metrics
+        return metrics
+
+    def snapshot(self):
+        """
+        Returns list of dict of every device.
+        Each dict has name, mac_addr and values of DeviceMetrics.
+        """
+        with self.lock:
+            items = list(self.devices.items())
+
+        snapshots = []
+        for device, metrics in items:
+            snapshot = {"name": device.name, "mac_addr": device.mac_addr}
+            snapshot.update(metrics.snapshot())
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        """
+        Returns metrics in Prometheus text format
+        """
+        snapshots = self.snapshot()
+        lines = []
+
+        def labels(s, extra=""):
+            return '{{device="{}",mac_addr="{}"{}}}'.format(
+                _escape(s["name"]), _escape(s["mac_addr"]), extra)
+
+        for key, kind, text in _COUNTERS:
+            name = "bt_button_{}_total".format(key)
+            lines.append("# HELP {} {}".format(name, text))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for s in snapshots:
+                lines.append("{}{} {}".format(name, labels(s), s[key]))
+
+        for key, text in _HISTOGRAMS:
+            name = "bt_button_{}".format(key)
+            lines.append("# HELP {} {}".format(name, text))
+            lines.append("# TYPE {} histogram".format(name))
+            for s in snapshots:
+                h = s[key]
+                for bound, count in h["buckets"].items():
+                    extra = ',le="{}"'.format(_format_bound(bound))
+                    lines.append("{}_bucket{} {}".format(
+                        name, labels(s, extra), count))
+                lines.append("{}_sum{} {}".format(name, labels(s), h["sum"]))
+                lines.append("{}_count{} {}".format(
+                    name, labels(s), h["count"]))
+
+        # Quantiles are of recent events, sum and count of every event
+        name = "bt_button_latency_seconds"
+        lines.append("# HELP {} {}".format(
+            name, "Press-to-dispatch latency by stage"))
+        lines.append("# TYPE {} summary".format(name))
+        for s in snapshots:
+            for stage in LatencyTracker.STAGES:
+                window = s["latency"][stage]
+                if window["count"] == 0:
+                    continue
+                for key, quantile in _QUANTILES:
+                    extra = ',stage="{}",quantile="{}"'.format(stage, quantile)
+                    lines.append("{}{} {}".format(
+                        name, labels(s, extra), window[key]))
+                extra = ',stage="{}"'.format(stage)
+                lines.append("{}_sum{} {}".format(
+                    name, labels(s, extra), window["sum"]))
+                lines.append("{}_count{} {}".format(
+                    name, labels(s, extra), window["observed"]))
+
+        name = "bt_button_latency_max_seconds"
+        lines.append("# HELP {} {}".format(
+            name, "Max press-to-dispatch latency of recent events by stage"))
+        lines.append("# TYPE {} gauge".format(name))
+        for s in snapshots:
+            for stage in LatencyTracker.STAGES:
+                window = s["latency"][stage]
+                if window["count"] == 0:
+                    continue
+                extra = ',stage="{}"'.format(stage)
+                lines.append("{}{} {}".format(
+                    name, labels(s, extra), window["max"]))
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.devices = weakref.WeakKeyDictionary()
+
+
+MetricsRegistry = __MetricsRegistry()
+
+
+class MetricsExporter:
+    """
+    Serve MetricsRegistry in Prometheus text format over HTTP
+    on a local TCP port or a Unix socket.
+
+    Parameters
+    ----------
+    port : int
+        TCP port. 0 chooses a free port.
+    host : str
+        Address to listen on
+    unix_path : str
+        Unix socket path. Used instead of TCP if given.
+    """
+    def __init__(self, port=DEFAULT_EXPORTER_PORT, host=DEFAULT_EXPORTER_HOST,
+                 unix_path=None):
+        self.port = port
+        self.host = host
+        self.unix_path = unix_path
+        self.server = None
+        self.thread = None
+
+    @property
+    def address(self):
+        """
+        Address being served, (host, port) or Unix socket path
+        """
+        return None if self.server is None else self.server.server_address
+
+    def start(self):
+        if self.server is not None:
+            return
+
+        import http.server
+        import socketserver
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = MetricsRegistry.render().encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def address_string(self):
+                # Unix socket clients have no address
+                return str(self.client_address or "local")
+
+            def log_message(self, format, *args):
+                log.debug(format % args)
+
+        if self.unix_path is None:
+            server = http.server.ThreadingHTTPServer(
+                (self.host, self.port), Handler)
+        else:
+            class UnixServer(socketserver.ThreadingMixIn,
+                             socketserver.UnixStreamServer):
+                daemon_threads = True
+
+            server = UnixServer(self.unix_path, Handler)
+
+        self.server = server
+        self.thread = threading.Thread(
+            target=server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is None:
+            return
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.server = None
+        self.thread = None
+
+        if self.unix_path is not None:
+            try:
+                os.remove(self.unix_path)
+            except FileNotFoundError:
+                pass
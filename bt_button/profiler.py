@@ -0,0 +1,162 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+DEFAULT_BUDGET = 0.05
+DEFAULT_SLOWEST = 10
+DEFAULT_SAMPLE_RATE = 1.0
+
+# ListenerProfiler started by start(), read on every dispatch
+active = None
+
+log = logging.getLogger(__name__)
+
+
+class SlowCall:
+    """
+    One profiled listener call.
+
+    Attributes
+    ----------
+    listener : str
+        Qualified name of listener
+    device : str
+        Name and MAC address of device
+    button : Enum
+        Button of the event
+    event : Enum
+        Event of the event
+    seconds : float
+        Wall time of the call
+    time : float
+        Seconds since epoch when the call finished
+    """
+    __slots__ = ("listener", "device", "button", "event", "seconds", "time")
+
+    def __init__(self, listener, device, button, event, seconds, time):
+        self.listener = listener
+        self.device = device
+        self.button = button
+        self.event = event
+        self.seconds = seconds
+        self.time = time
+
+    def __repr__(self):
+        return "SlowCall({}, {}, {}, {}, {:.3f} ms)".format(
+            self.listener, self.device, self.button, self.event,
+            self.seconds * 1000)
+
+
+def _listener_name(func):
+    name = getattr(func, "__qualname__", None)
+    if name is None:
+        return repr(func)
+    module = getattr(func, "__module__", None)
+    return name if module is None else "{}.{}".format(module, name)
+
+
+class ListenerProfiler:
+    """
+    Measure wall time of listeners attached to devices,
+    keep the slowest calls and warn about calls over budget.
+
+    Listeners run on DispatchExecutor are profiled too.
+    Only one profiler is active at a time.
+
+    Parameters
+    ----------
+    budget : float
+        Seconds a listener may take before a warning is logged
+    slowest : int
+        Number of slowest calls kept
+    sample_rate : float
+        Ratio of dispatches profiled, between 0 and 1.
+        Dispatches which are not sampled cost one counter decrement.
+    """
+    def __init__(self, budget=DEFAULT_BUDGET, slowest=DEFAULT_SLOWEST,
+                 sample_rate=DEFAULT_SAMPLE_RATE):
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+
+        self.budget = budget
+        self.max_slowest = slowest
+        self.interval = max(1, round(1 / sample_rate))
+        self.countdown = self.interval
+
+        # Min heap of (seconds, order, SlowCall)
+        self.heap = []
+        self.counter = itertools.count()
+        self.sampled = 0
+        self.over_budget = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Start profiling dispatches of every device
+        """
+        global active
+        active = self
+
+    def stop(self):
+        """
+        Stop profiling
+        """
+        global active
+        if active is self:
+            active = None
+
+    def slowest(self):
+        """
+        Returns list of SlowCall, slowest first
+        """
+        with self.lock:
+            return [c for _, _, c in sorted(self.heap, reverse=True)]
+
+    def reset(self):
+        with self.lock:
+            self.heap = []
+            self.sampled = 0
+            self.over_budget = 0
+
+    def _sample(self):
+        """
+        Returns True if this dispatch shall be profiled.
+        Races between threads only shift which dispatch is sampled.
+        """
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        self.countdown = self.interval
+        return True
+
+    def _record(self, func, e, seconds):
+        """
+        Called with listener, bt_button.ButtonEvent passed to it
+        and its wall time.
+        """
+        device = getattr(e, "device", None)
+        call = SlowCall(
+            _listener_name(func),
+            None if device is None else "{} {}".format(
+                device.name, device.mac_addr),
+            getattr(e, "button", None), getattr(e, "event", None),
+            seconds, time.time())
+
+        with self.lock:
+            self.sampled += 1
+            over = seconds > self.budget
+            if over:
+                self.over_budget += 1
+
+            item = (seconds, next(self.counter), call)
+            if len(self.heap) < self.max_slowest:
+                heapq.heappush(self.heap, item)
+            elif seconds > self.heap[0][0]:
+                heapq.heapreplace(self.heap, item)
+
+        if over:
+            log.warning("listener {} took {:.1f} ms for {} {} of {}".format(
+                call.listener, seconds * 1000, call.button, call.event,
+                call.device))
@@ -0,0 +1,298 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+# Bytes left free after device table for devices attached later
+DEFAULT_TABLE_RESERVE = 4096
+# Handle of SmartPalette button notifications
+NOTIFICATION_HANDLE = 0xb
+
+MAGIC = b"BTBREC01"
+# magic, length of JSON device table which follows
+_HEADER = struct.Struct("<8sI")
+# microseconds since epoch, device id, type, code, value
+_RECORD = struct.Struct("<qHHHi")
+# Notification payload is stored in code and value fields
+_PAYLOAD = struct.Struct("<Hi")
+# Type of notification records, ORed with payload length.
+# Input event types are smaller than 0x20.
+_NOTIFICATION = 0x8000
+
+
+class Recorder:
+    """
+    Record events read from devices to fixed-width binary log.
+
+    Files are rotated like logging.handlers.RotatingFileHandler:
+    path is renamed to path.1, path.1 to path.2 and so on.
+    Each file starts with the table of recorded devices.
+    The table is padded with spaces, so devices attached while recording
+    are added to the table of the current file in place.
+
+    Parameters
+    ----------
+    path : str
+        Log file
+    max_bytes : int
+        File is rotated before exceeding this size.
+        Never rotated if None.
+    backup_count : int
+        Number of rotated files kept
+    table_reserve : int
+        Bytes reserved for devices attached after the file was started.
+        File is rotated if the table outgrows it.
+    """
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES,
+                 backup_count=DEFAULT_BACKUP_COUNT,
+                 table_reserve=DEFAULT_TABLE_RESERVE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.table_reserve = table_reserve
+
+        # device -> id of records
+        self.ids = {}
+        # Device table written at head of files
+        self.devices = []
+
+        self.file = None
+        # Bytes of device table including padding in current file
+        self.table_size = 0
+        self.size = 0
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def attach(self, device):
+        """
+        Start recording events of device.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        """
+        with self.lock:
+            if device not in self.ids:
+                self.ids[device] = len(self.devices)
+                self.devices.append({
+                    "kind": type(device).__name__,
+                    "name": device.name,
+                    "mac_addr": device.mac_addr.lower(),
+                })
+                if self.file is not None and not self._update_table():
+                    self._rotate()
+
+        device.recorder = self
+
+    def detach(self, device):
+        """
+        Stop recording events of device.
+        """
+        device.recorder = None
+
+    def record_events(self, device, events):
+        """
+        Called by EventDevice with events read at once.
+        """
+        device_id = self.ids[device]
+        data = b"".join(
+            _RECORD.pack(e.sec * 1000000 + e.usec, device_id,
+                         e.type, e.code, e.value)
+            for e in events)
+        self._write(data, len(events))
+
+    def record_notification(self, device, data):
+        """
+        Called by SmartPalette with notification data.
+        Payloads longer than 6 bytes are truncated.
+        """
+        payload = bytes(data[:_PAYLOAD.size])
+        code, value = _PAYLOAD.unpack(payload.ljust(_PAYLOAD.size, b"\0"))
+        self._write(_RECORD.pack(
+            int(time.time() * 1000000), self.ids[device],
+            _NOTIFICATION | len(payload), code, value), 1)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, data, count):
+        with self.lock:
+            if self.file is None:
+                self._open()
+            elif self.max_bytes is not None and \
+                    self.size + len(data) > self.max_bytes:
+                self._rotate()
+
+            self.file.write(data)
+            self.size += len(data)
+            self.records += count
+
+    def _open(self):
+        if os.path.exists(self.path):
+            self._shift()
+
+        table = self._table()
+        self.table_size = len(table) + self.table_reserve
+        self.file = open(self.path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, self.table_size) +
+                        table.ljust(self.table_size))
+        self.size = self.file.tell()
+
+    def _table(self):
+        return json.dumps({"devices": self.devices}).encode()
+
+    def _update_table(self):
+        """
+        Rewrite device table of current file.
+        Returns False if it doesn't fit in the reserved space.
+        """
+        table = self._table()
+        if len(table) > self.table_size:
+            return False
+
+        self.file.seek(_HEADER.size)
+        self.file.write(table.ljust(self.table_size))
+        self.file.seek(0, os.SEEK_END)
+        return True
+
+    def _rotate(self):
+        self.file.close()
+        self._open()
+
+    def _shift(self):
+        if self.backup_count == 0:
+            os.remove(self.path)
+            return
+
+        for i in range(self.backup_count - 1, 0, -1):
+            src = "{}.{}".format(self.path, i)
+            if os.path.exists(src):
+                os.replace(src, "{}.{}".format(self.path, i + 1))
+        os.replace(self.path, self.path + ".1")
+
+
+class LogReader:
+    """
+    Read log written by Recorder through memory mapping,
+    so large logs are not loaded into memory.
+
+    Attributes
+    ----------
+    devices : list of dict
+        Recorded devices. Index is device id of records.
+    count : int
+        Number of records
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, table_size = _HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            self.mmap.close()
+            raise ValueError("Not a bt_button log: {}".format(path))
+
+        table = self.mmap[_HEADER.size:_HEADER.size + table_size]
+        self.devices = json.loads(table.decode())["devices"]
+
+        self.offset = _HEADER.size + table_size
+        # Record cut by crash while writing is ignored
+        self.count = (len(self.mmap) - self.offset) // _RECORD.size
+
+    def __iter__(self):
+        """
+        Yields (microseconds, device id, type, code, value) of records
+        """
+        end = self.offset + self.count * _RECORD.size
+        for offset in range(self.offset, end, _RECORD.size):
+            yield _RECORD.unpack_from(self.mmap, offset)
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def rotated_paths(path):
+    """
+    Returns existing files of log path, oldest first
+    """
+    paths = [path]
+    i = 1
+    while os.path.exists("{}.{}".format(path, i)):
+        paths.insert(0, "{}.{}".format(path, i))
+        i += 1
+    return [p for p in paths if os.path.exists(p)]
+
+
+def replay(paths, devices, speed=1.0):
+    """
+    Feed recorded events to devices through their normal dispatch path.
+    Devices don't need to be connected.
+
+    Parameters
+    ----------
+    paths : str or list of str
+        Log files, oldest first. See rotated_paths().
+    devices : list of AbShutter, BTselfie or SmartPalette
+        Devices to feed. Matched with recorded ones by name and MAC address.
+        Records of other devices are skipped.
+    speed : float
+        Replay speed. 1.0 for recorded speed, None for max speed.
+
+    Returns
+    -------
+    int
+        Number of replayed records
+    """
+    from evdev.events import InputEvent
+
+    if isinstance(paths, str):
+        paths = [paths]
+    targets = {(d.name, d.mac_addr.lower()): d for d in devices}
+
+    replayed = 0
+    first = None
+    for path in paths:
+        with LogReader(path) as reader:
+            table = [targets.get((d["name"], d["mac_addr"]))
+                     for d in reader.devices]
+
+            for timestamp, device_id, type_, code, value in reader:
+                device = table[device_id]
+                if device is None:
+                    continue
+
+                if speed is not None:
+                    if first is None:
+                        first = timestamp
+                        start = time.monotonic()
+                    delay = (timestamp - first) / 1000000 / speed - \
+                        (time.monotonic() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if type_ & _NOTIFICATION:
+                    payload = _PAYLOAD.pack(code, value)
+                    device._event(NOTIFICATION_HANDLE, bytearray(
+                        payload[:type_ & ~_NOTIFICATION]))
+                else:
+                    sec, usec = divmod(timestamp, 1000000)
+                    device._process_events(
+                        [InputEvent(sec, usec, type_, code, value)])
+
+                replayed += 1
+
+    return replayed
@@ -0,0 +1,315 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import struct
+import threading
+
+DEFAULT_WORKERS = 2
+# Records each worker can publish before parent reads them
+DEFAULT_RING_CAPACITY = 4096
+DEFAULT_STOP_TIMEOUT = 5.0
+
+# head (next record parent reads), tail (next record worker writes),
+# number of records dropped because ring was full.
+# Indexes only grow and are written by one side each with aligned
+# 8 byte stores, so the ring needs no lock.
+_RING_HEADER = struct.Struct("<QQQ")
+_RING_HEADER_SIZE = 64
+# microseconds of event, device index, button code, event value
+_RING_RECORD = struct.Struct("<qHHi")
+
+log = logging.getLogger(__name__)
+
+
+class EventRing:
+    """
+    Single producer single consumer ring of fixed-size button event
+    records in shared memory.
+
+    put() takes no lock. Producers on several threads must serialize
+    their calls, see _publisher().
+
+    Parameters
+    ----------
+    capacity : int
+        Number of records
+    buffer : multiprocessing.RawArray
+        Shared memory of existing ring. New one is allocated if None.
+    """
+    def __init__(self, capacity=DEFAULT_RING_CAPACITY, buffer=None):
+        self.capacity = capacity
+        if buffer is None:
+            buffer = multiprocessing.RawArray(
+                "B", _RING_HEADER_SIZE + capacity * _RING_RECORD.size)
+        self.buffer = buffer
+        self.view = memoryview(buffer).cast("B")
+
+    def _header(self):
+        return _RING_HEADER.unpack_from(self.view)
+
+    @property
+    def dropped(self):
+        return self._header()[2]
+
+    def put(self, device, code, value, usec):
+        """
+        Append record. Called by worker.
+        Returns False if ring is full and record was dropped.
+        """
+        head, tail, dropped = self._header()
+        if tail - head >= self.capacity:
+            struct.pack_into("<Q", self.view, 16, dropped + 1)
+            return False
+
+        _RING_RECORD.pack_into(
+            self.view,
+            _RING_HEADER_SIZE + (tail % self.capacity) * _RING_RECORD.size,
+            usec, device, code, value)
+        # Publish record after it was written
+        struct.pack_into("<Q", self.view, 8, tail + 1)
+        return True
+
+    def get_all(self):
+        """
+        Remove and returns all records as list of
+        (usec, device, code, value). Called by parent.
+        """
+        head, tail, _ = self._header()
+        records = []
+        for i in range(head, tail):
+            records.append(_RING_RECORD.unpack_from(
+                self.view,
+                _RING_HEADER_SIZE + (i % self.capacity) * _RING_RECORD.size))
+        struct.pack_into("<Q", self.view, 0, tail)
+        return records
+
+
+def _ring_doorbell(fd):
+    try:
+        os.write(fd, b"\0")
+    except BlockingIOError:
+        # Pipe is full, so parent will wake up anyway
+        pass
+
+
+def _publisher(ring, fd):
+    """
+    Returns function which puts a record to ring and rings doorbell fd.
+    Listeners of event devices run on the reactor thread and those of
+    SmartPalettes on notification threads of pygatt, so puts of a
+    worker are serialized by a lock.
+    """
+    lock = threading.Lock()
+
+    def publish(index, code, value, usec):
+        with lock:
+            ring.put(index, code, value, usec)
+        _ring_doorbell(fd)
+
+    return publish
+
+
+def _worker(specs, buffer, capacity, doorbell, stop, initializer, initargs):
+    """
+    Run devices of one shard and publish their button events to ring.
+    """
+    import bt_button
+    from .supervisor import DeviceSupervisor
+
+    if initializer is not None:
+        initializer(*initargs)
+
+    ring = EventRing(capacity, buffer)
+    fd = doorbell.fileno()
+    os.set_blocking(fd, False)
+
+    publish = _publisher(ring, fd)
+
+    devices = []
+    for kind, mac_addr, kwargs, index in specs:
+        device = getattr(bt_button, kind)(mac_addr, **kwargs)
+
+        if getattr(device, "event_enum", None) is not None:
+            for button, event in device.key_table.values():
+                device.attach_button_event_listener(
+                    button, event,
+                    lambda e, index=index: publish(
+                        index, e.button.value, e.event.value,
+                        int(e.timestamp * 1000000)))
+        else:
+            for button in device.button_enum:
+                device.attach_pushed_listener(
+                    button,
+                    lambda e, index=index: publish(
+                        index, e.button.value, e.event.value,
+                        int(e.timestamp * 1000000)))
+
+        devices.append(device)
+
+    supervisor = DeviceSupervisor(devices)
+    supervisor.start()
+    try:
+        stop.wait()
+    finally:
+        supervisor.stop()
+        for device in devices:
+            if hasattr(device, "close"):
+                device.close()
+            else:
+                device.stop_monitor()
+
+
+class ShardCoordinator:
+    """
+    Run devices in worker processes, so hundreds of devices are not
+    limited by one interpreter lock.
+
+    Devices given to the coordinator are only used to hold listeners.
+    Each worker creates its own instances of assigned devices, keeps
+    them connected with DeviceSupervisor and writes their button events
+    to a shared memory ring. A thread of this process reads the rings
+    and calls listeners of the given devices, without pickling events.
+
+    Only button events are forwarded. Listeners get ButtonEvent
+    with timestamp of the worker as usual.
+
+    Parameters
+    ----------
+    devices : list of AbShutter, BTselfie or SmartPalette
+        Devices to run. They must not be monitored or connected
+        in this process.
+    workers : int
+        Number of worker processes. Devices are assigned round robin.
+    ring_capacity : int
+        Records each worker can publish before this process reads them.
+        Records are dropped while the ring is full.
+    mp_context : multiprocessing context
+        Context to start workers. Spawn is used by default,
+        because forked workers would inherit threads state
+        of this process.
+    initializer : function
+        Called with initargs in each worker before devices start.
+    """
+    def __init__(self, devices, workers=DEFAULT_WORKERS,
+                 ring_capacity=DEFAULT_RING_CAPACITY, mp_context=None,
+                 initializer=None, initargs=()):
+        self.devices = list(devices)
+        self.workers = workers
+        self.ring_capacity = ring_capacity
+        self.mp_context = mp_context
+        self.initializer = initializer
+        self.initargs = initargs
+
+        # list of (process, ring, doorbell reader)
+        self.shards = []
+        self.stop_event = None
+        self.thread = None
+        self.wakeup = None
+        self._input_event = None
+        self._ev_key = None
+
+    def start(self):
+        """
+        Start worker processes and dispatch thread
+        """
+        if self.thread is not None:
+            return
+
+        ctx = self.mp_context
+        if ctx is None:
+            ctx = multiprocessing.get_context("spawn")
+
+        self.stop_event = ctx.Event()
+        for shard in range(self.workers):
+            specs = []
+            for index in range(shard, len(self.devices), self.workers):
+                device = self.devices[index]
+                kwargs = {}
+                if hasattr(device, "hci_device"):
+                    kwargs["hci_device"] = device.hci_device
+                specs.append((type(device).__name__, device.mac_addr,
+                              kwargs, index))
+
+            ring = EventRing(self.ring_capacity)
+            reader, writer = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_worker, daemon=True,
+                args=(specs, ring.buffer, ring.capacity, writer,
+                      self.stop_event, self.initializer, self.initargs))
+            process.start()
+            writer.close()
+            os.set_blocking(reader.fileno(), False)
+
+            self.shards.append((process, ring, reader))
+
+        self.wakeup = os.pipe()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=DEFAULT_STOP_TIMEOUT):
+        """
+        Stop worker processes and dispatch thread
+        """
+        if self.thread is None:
+            return
+
+        self.stop_event.set()
+        for process, _, _ in self.shards:
+            process.join(timeout)
+            if process.is_alive():
+                log.warning("worker {} didn't stop".format(process.pid))
+                process.terminate()
+
+        os.write(self.wakeup[1], b"\0")
+        self.thread.join()
+        self.thread = None
+
+        for _, _, reader in self.shards:
+            reader.close()
+        for fd in self.wakeup:
+            os.close(fd)
+        self.shards = []
+
+    def dropped(self):
+        """
+        Returns number of events dropped because a ring was full
+        """
+        return sum(ring.dropped for _, ring, _ in self.shards)
+
+    def _dispatch(self, records):
+        for usec, index, code, value in records:
+            device = self.devices[index]
+            try:
+                if getattr(device, "event_enum", None) is not None:
+                    sec, usec = divmod(usec, 1000000)
+                    device._dispatch_frame([self._input_event(
+                        sec, usec, self._ev_key, code, value)])
+                else:
+                    device._dispatch(device.button_enum(code), usec / 1000000)
+            except Exception:
+                log.exception("dispatch to {} failed".format(device.name))
+
+    def _run(self):
+        from evdev import ecodes
+        from evdev.events import InputEvent
+        self._input_event = InputEvent
+        self._ev_key = ecodes.EV_KEY
+
+        doorbells = {reader.fileno(): ring for _, ring, reader in self.shards}
+        waits = [reader for _, _, reader in self.shards] + [self.wakeup[0]]
+
+        while True:
+            for ready in multiprocessing.connection.wait(waits):
+                if ready == self.wakeup[0]:
+                    return
+
+                try:
+                    data = os.read(ready.fileno(), 4096)
+                except BlockingIOError:
+                    continue
+                if len(data) == 0:
+                    # Worker exited
+                    waits.remove(ready)
+
+                self._dispatch(doorbells[ready.fileno()].get_all())
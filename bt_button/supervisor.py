@@ -0,0 +1,253 @@
+import logging
+import threading
+import time
+
+from .buttons._event_reactor import EventReactor
+from .buttons._input_node_watcher import InputNodeWatcher, \
+    IN_CREATE, IN_ATTRIB, IN_MOVED_TO
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MIN_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+DEFAULT_RESCAN_INTERVAL = 1.0
+
+log = logging.getLogger(__name__)
+
+
+class _RetryState:
+    def __init__(self, backoff):
+        self.backoff = backoff
+        self.next_attempt = 0.0
+
+
+class DeviceSupervisor:
+    """
+    Keep devices monitored and connected.
+
+    Event devices (AbShutter, BTselfie) start monitoring as soon as
+    their node appears in /dev/input. If inotify is not available,
+    nodes are rescanned every rescan_interval seconds instead.
+    SmartPalettes are reconnected with exponential backoff.
+
+    The supervisor owns connection state of supervised devices.
+    It attaches their disconnected listener, so use on_disconnected
+    instead, and don't connect or start monitoring them yourself.
+    Call remove_device() to take a device back.
+
+    Parameters
+    ----------
+    devices : list
+        Devices to supervise.
+    on_connected : function(device)
+        This function will be called when device started monitoring
+        or connected.
+    on_disconnected : function(device)
+        This function will be called when device disappeared
+        or connection lost.
+    connect_timeout : float
+        Wait time for each SmartPalette connection attempt
+    min_backoff : float
+        First wait time before retrying SmartPalette connection
+    max_backoff : float
+        Upper limit of wait time before retrying SmartPalette connection
+    rescan_interval : float
+        Interval to search event devices when inotify is not available
+    """
+    def __init__(self, devices=(), on_connected=None, on_disconnected=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 min_backoff=DEFAULT_MIN_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL):
+        self.on_connected = on_connected
+        self.on_disconnected = on_disconnected
+        self.connect_timeout = connect_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.rescan_interval = rescan_interval
+
+        self.event_devices = []
+        self.palettes = {}
+
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.watcher = None
+        self.thread = None
+        self.running = False
+
+        for device in devices:
+            self.add_device(device)
+
+    def add_device(self, device):
+        """
+        Add device to supervise.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        """
+        with self.lock:
+            if hasattr(device, "start_monitor"):
+                self.event_devices.append(device)
+                device.attach_disconnected_listener(
+                    lambda: self._notify(self.on_disconnected, device))
+            else:
+                self.palettes[device] = _RetryState(self.min_backoff)
+                device.attach_disconnected_listener(
+                    lambda: self._palette_lost(device))
+
+        if self.running:
+            self._attach_event_devices()
+            self.wakeup.set()
+
+    def remove_device(self, device):
+        """
+        Stop supervising device.
+        Its disconnected listener is detached, and it is left
+        monitored or connected as it is.
+
+        Parameters
+        ----------
+        device : AbShutter, BTselfie or SmartPalette
+            Target device
+        """
+        with self.lock:
+            if device in self.event_devices:
+                self.event_devices.remove(device)
+            elif self.palettes.pop(device, None) is None:
+                return
+            device.detach_disconnected_listener()
+
+    def start(self):
+        """
+        Start supervising devices
+        """
+        self.running = True
+
+        try:
+            self.watcher = InputNodeWatcher()
+            EventReactor.register(self.watcher, self._node_changed)
+        except OSError as e:
+            log.warning("Rescan devices periodically: {}".format(e))
+            self.watcher = None
+
+        self._attach_event_devices()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop supervising devices.
+        Monitored or connected devices are left as they are.
+        """
+        self.running = False
+        self.wakeup.set()
+
+        if self.watcher is not None:
+            EventReactor.unregister(self.watcher)
+            self.watcher.close()
+            self.watcher = None
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _notify(self, func, device):
+        if func is None:
+            return
+
+        try:
+            func(device)
+        except Exception:
+            log.exception("callback for {} failed".format(device.name))
+
+    def _node_changed(self):
+        watcher = self.watcher
+        if watcher is None:
+            return
+
+        mask = IN_CREATE | IN_ATTRIB | IN_MOVED_TO
+        if any(m & mask for m, _ in watcher.read()):
+            self._attach_event_devices()
+
+    def _attach_event_devices(self):
+        with self.lock:
+            targets = {}
+            for device in self.event_devices:
+                if not device.is_monitoring():
+                    targets[(device.name, device.mac_addr)] = device
+
+            if len(targets) == 0:
+                return
+
+            # evdev is imported only when event devices are supervised
+            from .buttons._event_device_manager import EventDeviceManager
+
+            opened = EventDeviceManager.open_devices(list(targets))
+            for key, input_device in opened.items():
+                device = targets[key]
+                try:
+                    device._start_monitor(input_device)
+                except OSError as e:
+                    # Device was closed, so it is searched again later
+                    log.warning("{}: can't monitor: {}".format(
+                        device.name, e))
+                    continue
+
+                self._notify(self.on_connected, device)
+
+    def _palette_lost(self, palette):
+        with self.lock:
+            state = self.palettes.get(palette)
+            if state is None:
+                # Removed while connection was lost
+                return
+            state.backoff = self.min_backoff
+            state.next_attempt = 0.0
+
+        self._notify(self.on_disconnected, palette)
+        self.wakeup.set()
+
+    def _connect_palettes(self):
+        """
+        Try to connect palettes whose retry time came.
+        Returns seconds until next attempt, or None if nothing to retry.
+        """
+        with self.lock:
+            palettes = list(self.palettes.items())
+
+        wait = None
+        for palette, state in palettes:
+            if palette not in self.palettes or palette.is_connected():
+                continue
+
+            now = time.monotonic()
+            if now >= state.next_attempt:
+                try:
+                    palette.connect(timeout=self.connect_timeout)
+                except Exception as e:
+                    log.debug("{}: {}".format(palette.name, e))
+                    state.next_attempt = time.monotonic() + state.backoff
+                    state.backoff = min(state.backoff * 2, self.max_backoff)
+                else:
+                    state.backoff = self.min_backoff
+                    self._notify(self.on_connected, palette)
+                    continue
+
+            remain = max(state.next_attempt - time.monotonic(), 0.0)
+            wait = remain if wait is None else min(wait, remain)
+
+        return wait
+
+    def _run(self):
+        while self.running:
+            self.wakeup.clear()
+
+            timeout = self._connect_palettes()
+            if self.watcher is None:
+                self._attach_event_devices()
+                if timeout is None or timeout > self.rescan_interval:
+                    timeout = self.rescan_interval
+
+            self.wakeup.wait(timeout)
@@ -0,0 +1,377 @@
+"""
+In-memory backends to drive devices without Bluetooth hardware.
+
+Events go through the same reactor, framing and dispatch code as
+real devices, so these backends can be used for load testing.
+
+    backend = FakeInputBackend()
+    EventDeviceManager.set_backend(backend)
+    path = backend.add_device("AB Shutter3", "00:00:00:00:00:00")
+    ...
+    backend.key(path, AbShutterButton.LARGE.value, 1)
+"""
+import errno
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+import evdev
+
+from .buttons._input_backend import InputBackend
+
+# struct input_event of 64 bit kernel
+_INPUT_EVENT = struct.Struct("llHHi")
+# Events read at once by FakeInputDevice.read()
+_READ_EVENTS = 64
+
+log = logging.getLogger(__name__)
+
+
+class FakeInputDevice:
+    """
+    Opened fake input node. Events are passed through a pipe,
+    so it can be selected like evdev.InputDevice.
+    """
+    def __init__(self, backend, path, name, uniq):
+        self.backend = backend
+        self.path = path
+        self.name = name
+        self.uniq = uniq
+        # Key codes delivered to this client, or None for all
+        self.key_mask = None
+
+        self.fd, self.write_fd = os.pipe()
+        self.write_lock = threading.Lock()
+        flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self.fd
+
+    def capabilities(self):
+        return {evdev.ecodes.EV_SYN: [], evdev.ecodes.EV_KEY: []}
+
+    def read(self):
+        """
+        Returns pending events.
+        Raises BlockingIOError if there is none,
+        and OSError(ENODEV) if node was removed.
+        """
+        data = os.read(self.fd, _INPUT_EVENT.size * _READ_EVENTS)
+        if len(data) == 0:
+            raise OSError(errno.ENODEV, "No such device", self.path)
+
+        events = []
+        for sec, usec, type_, code, value in \
+                _INPUT_EVENT.iter_unpack(data):
+            if type_ == evdev.ecodes.EV_KEY and self.key_mask is not None \
+                    and code not in self.key_mask:
+                continue
+            events.append(evdev.events.InputEvent(
+                sec, usec, type_, code, value))
+        return events
+
+    def close(self):
+        if self.fd is None:
+            return
+
+        self.backend._detach(self)
+        # Closing read end first wakes up writer blocked on full pipe
+        os.close(self.fd)
+        self.fd = None
+        self._close_writer()
+
+    def _write(self, data):
+        with self.write_lock:
+            if self.write_fd is None:
+                return
+            try:
+                os.write(self.write_fd, data)
+            except BrokenPipeError:
+                pass
+
+    def _close_writer(self):
+        with self.write_lock:
+            if self.write_fd is not None:
+                os.close(self.write_fd)
+                self.write_fd = None
+
+
+class FakeInputBackend(InputBackend):
+    """
+    Input nodes which exist only in this process.
+    Pass to EventDeviceManager.set_backend() to use.
+    """
+    def __init__(self):
+        # path -> (name, uniq)
+        self.nodes = {}
+        # path -> list of opened FakeInputDevice
+        self.clients = {}
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def add_device(self, name, uniq):
+        """
+        Add input node.
+
+        Parameters
+        ----------
+        name : str
+            Device name such as "AB Shutter3"
+        uniq : str
+            MAC address of device
+
+        Returns
+        -------
+        str
+            Path of added node
+        """
+        with self.lock:
+            path = "/dev/input/event{}".format(self.counter)
+            self.counter += 1
+            # Kernel reports MAC address in lower case
+            self.nodes[path] = (name, uniq.lower())
+            self.clients[path] = []
+        return path
+
+    def remove_device(self, path):
+        """
+        Remove input node. Readers of the node get ENODEV
+        like a disconnected Bluetooth device.
+        """
+        with self.lock:
+            del self.nodes[path]
+            clients = self.clients.pop(path)
+
+        for dev in clients:
+            dev._close_writer()
+
+    def write(self, path, events):
+        """
+        Write events to all clients of node.
+        Blocks while a client has not read previous events.
+
+        Parameters
+        ----------
+        path : str
+            Path of node
+        events : list of (type, code, value)
+            Events to write
+        """
+        now = time.time()
+        sec = int(now)
+        usec = int((now - sec) * 1000000)
+        data = b"".join(_INPUT_EVENT.pack(sec, usec, type_, code, value)
+                        for type_, code, value in events)
+
+        with self.lock:
+            clients = list(self.clients[path])
+
+        for dev in clients:
+            dev._write(data)
+
+    def key(self, path, code, value):
+        """
+        Write one key event followed by SYN_REPORT.
+        """
+        self.write(path, [
+            (evdev.ecodes.EV_KEY, code, value),
+            (evdev.ecodes.EV_SYN, evdev.ecodes.SYN_REPORT, 0),
+        ])
+
+    def list_devices(self):
+        with self.lock:
+            return list(self.nodes)
+
+    def identify(self, path):
+        with self.lock:
+            return self.nodes.get(path)
+
+    def open(self, path):
+        with self.lock:
+            if path not in self.nodes:
+                raise FileNotFoundError(
+                    errno.ENOENT, "No such file or directory", path)
+
+            name, uniq = self.nodes[path]
+            dev = FakeInputDevice(self, path, name, uniq)
+            self.clients[path].append(dev)
+        return dev
+
+    def set_event_mask(self, device, key_codes):
+        device.key_mask = frozenset(key_codes)
+        return True
+
+    def _detach(self, dev):
+        with self.lock:
+            clients = self.clients.get(dev.path, [])
+            if dev in clients:
+                clients.remove(dev)
+
+
+class FakeGattDevice:
+    """
+    Fake BLE peripheral returned by FakeGattBackend adapters.
+    """
+    def __init__(self, mac_addr):
+        self.mac_addr = mac_addr
+        self.connected = False
+        self.callbacks = []
+        self.disconnect_callbacks = []
+
+    def subscribe(self, uuid, callback=None, indication=False):
+        self.callbacks.append(callback)
+
+    def register_disconnect_callback(self, callback):
+        self.disconnect_callbacks.append(callback)
+
+    def disconnect(self):
+        self.connected = False
+        self.callbacks = []
+        self.disconnect_callbacks = []
+
+    def notify(self, data, handle=0xb):
+        """
+        Call subscribed callbacks with notification data
+        on calling thread.
+        """
+        data = bytearray(data)
+        for callback in self.callbacks:
+            callback(handle, data)
+
+    def drop(self):
+        """
+        Lose connection like the device went out of range.
+        """
+        callbacks = self.disconnect_callbacks
+        self.disconnect()
+        for callback in callbacks:
+            callback(None)
+
+
+class _FakeGattAdapter:
+    def __init__(self, backend, hci_device):
+        self.backend = backend
+        self.hci_device = hci_device
+        self.multiple_connections = backend.multiple_connections
+        self.started = False
+        # Connected FakeGattDevice while not multiple_connections
+        self.device = None
+
+    def start(self):
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def connect(self, address, address_type=None, timeout=None):
+        import pygatt
+
+        device = self.backend.devices.get(address)
+        if not self.started or device is None or device.connected:
+            raise pygatt.exceptions.NotConnectedError(
+                "Device not found: {}".format(address))
+
+        if not self.multiple_connections:
+            # gatttool holds only one connection
+            if self.device is not None and self.device.connected:
+                raise pygatt.exceptions.BLEError(
+                    "Already connected to {}".format(self.device.mac_addr))
+            self.device = device
+
+        device.connected = True
+        return device
+
+
+class FakeGattBackend:
+    """
+    BLE peripherals which exist only in this process.
+    Pass adapter to GattAdapterPool.set_backend_factory() to use.
+
+    Parameters
+    ----------
+    multiple_connections : bool
+        If False, each adapter holds one connection like
+        pygatt.GATTToolBackend and isn't shared among devices.
+    """
+    def __init__(self, multiple_connections=False):
+        self.multiple_connections = multiple_connections
+        # MAC address -> FakeGattDevice
+        self.devices = {}
+
+    def add_device(self, mac_addr):
+        """
+        Returns FakeGattDevice which can be connected by mac_addr
+        """
+        device = FakeGattDevice(mac_addr)
+        self.devices[mac_addr] = device
+        return device
+
+    def adapter(self, hci_device):
+        return _FakeGattAdapter(self, hci_device)
+
+
+class EventInjector:
+    """
+    Call func at fixed rate on a thread.
+    Calls are paced by absolute deadlines, so they are made up in
+    batches when the thread is late instead of lowering the rate.
+
+    Parameters
+    ----------
+    func : function()
+        Function which injects one event
+    rate : float
+        Calls per second
+    count : int
+        Number of calls, or None to call until stop()
+    """
+    def __init__(self, func, rate, count=None):
+        self.func = func
+        self.rate = rate
+        self.count = count
+        self.sent = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        start = time.monotonic()
+
+        while not self.stopped.is_set():
+            due = int((time.monotonic() - start) / interval) + 1
+            if self.count is not None:
+                due = min(due, self.count)
+
+            try:
+                while self.sent < due:
+                    self.func()
+                    self.sent += 1
+            except Exception:
+                log.exception("injector {} failed".format(self.func))
+                return
+
+            if self.count is not None and self.sent >= self.count:
+                return
+
+            self.stopped.wait(start + self.sent * interval - time.monotonic())
+
+
+def inject_at_rate(func, rate, count=None):
+    """
+    Start EventInjector and returns it.
+    """
+    return EventInjector(func, rate, count).start()
@@ -53,29 +53,24 @@ def main():
     smart_palette.attach_pushed_listener(
         bt_button.SmartPaletteButton.RED, pushed)
 
-    while True:
-        logging.debug("search ab_shutter")
-        if not ab_shutter.is_monitoring():
-            try:
-                ab_shutter.start_monitor()
-            except bt_button.error.DeviceNotFoundError as e:
-                logging.debug(e)
-
-        if not bt_selfie.is_monitoring():
-            try:
-                bt_selfie.start_monitor()
-            except bt_button.error.DeviceNotFoundError as e:
-                logging.debug(e)
-
-        if not smart_palette.is_connected():
-            try:
-                smart_palette.connect(timeout=1)
-            except bt_button.error.DeviceNotFoundError as e:
-                logging.debug(e)
+    supervisor = bt_button.DeviceSupervisor(
+        [ab_shutter, bt_selfie, smart_palette],
+        on_connected=connected, on_disconnected=disconnected,
+        connect_timeout=1)
+    supervisor.start()
 
+    while True:
         time.sleep(1)
 
 
+def connected(device):
+    print("{}: connected".format(device.name))
+
+
+def disconnected(device):
+    print("{}: disconnected".format(device.name))
+
+
 def pushed(event=None):
     print("Pushed!")
 
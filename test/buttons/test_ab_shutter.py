@@ -1,5 +1,7 @@
+import asyncio
 import pytest
-from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    ButtonEvent
 
 
 @pytest.fixture
@@ -13,18 +15,18 @@ def test_attach_button_event_listener_0(mocker, ab_shutter, button, event):
     func = mocker.Mock()
 
     ab_shutter.attach_button_event_listener(button, event, func)
-    assert ab_shutter.button_event_funcs[button][event] == func
+    assert ab_shutter.button_event_funcs[button][event] == (func, )
 
     for b in list(AbShutterButton):
         for e in list(AbShutterButtonEvent):
             if not (b == button and e == event):
-                assert ab_shutter.button_event_funcs[b][e] is None
+                assert ab_shutter.button_event_funcs[b][e] == ()
 
 
 def test_attach_button_event_listener_1(mocker, ab_shutter):
     for button in list(AbShutterButton):
         for event in list(AbShutterButtonEvent):
-            assert ab_shutter.button_event_funcs[button][event] is None
+            assert ab_shutter.button_event_funcs[button][event] == ()
 
 
 @pytest.mark.parametrize("button", list(AbShutterButton))
@@ -37,12 +39,12 @@ def test_detach_button_event_listener_0(mocker, ab_shutter, button, event):
             ab_shutter.attach_button_event_listener(b, e, func)
 
     ab_shutter.detach_button_event_listener(button, event)
-    assert ab_shutter.button_event_funcs[button][event] is None
+    assert ab_shutter.button_event_funcs[button][event] == ()
 
     for b in list(AbShutterButton):
         for e in list(AbShutterButtonEvent):
             if not (b == button and e == event):
-                assert ab_shutter.button_event_funcs[b][e] == func
+                assert ab_shutter.button_event_funcs[b][e] == (func, )
 
 
 @pytest.mark.parametrize("button", list(AbShutterButton))
@@ -59,12 +61,15 @@ def test_key_event_call_only_target_func(mocker, ab_shutter, button, event):
                 ab_shutter.attach_button_event_listener(b, e, mistake_func)
 
     bt_event = type("hoge", (object,), {
-        "code": button,
-        "value": event,
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
     })
     ab_shutter._key_event(bt_event)
 
-    correct_func.assert_called_once_with(bt_event)
+    correct_func.assert_called_once_with(
+        ButtonEvent(ab_shutter, button, event, 1.5))
     mistake_func.assert_not_called()
 
 
@@ -73,7 +78,146 @@ def test_key_event_call_only_target_func(mocker, ab_shutter, button, event):
 def test_key_event_with_any_func(ab_shutter, button, event):
 
     event = type("hoge", (object,), {
-        "code": button,
-        "value": event,
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
     })
     ab_shutter._key_event(event)
+
+
+def test_key_event_unknown_code(mocker, ab_shutter):
+    func = mocker.Mock()
+    for key in ab_shutter.key_funcs:
+        ab_shutter.key_funcs[key] = (func, )
+
+    event = type("hoge", (object,), {
+        "code": 0,
+        "value": 1,
+        "sec": 1,
+        "usec": 500000,
+    })
+    ab_shutter._key_event(event)
+
+    func.assert_not_called()
+
+
+def test_key_event_listener_raise(mocker, ab_shutter):
+    fail = mocker.Mock(side_effect=RuntimeError)
+    func = mocker.Mock()
+    ab_shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, fail)
+    ab_shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, func)
+
+    event = type("hoge", (object,), {
+        "code": AbShutterButton.LARGE.value,
+        "value": AbShutterButtonEvent.PUSHED.value,
+        "sec": 1,
+        "usec": 500000,
+    })
+    ab_shutter._key_event(event)
+
+    fail.assert_called_once()
+    func.assert_called_once()
+
+
+def test_key_event_with_executor(mocker, ab_shutter):
+    func = mocker.Mock()
+    executor = mocker.Mock()
+    ab_shutter.set_dispatch_executor(executor)
+    ab_shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, func)
+
+    event = type("hoge", (object,), {
+        "code": AbShutterButton.LARGE.value,
+        "value": AbShutterButtonEvent.PUSHED.value,
+        "sec": 1,
+        "usec": 500000,
+    })
+    ab_shutter._key_event(event)
+
+    func.assert_not_called()
+    executor.submit.assert_called_once_with(func, ButtonEvent(
+        ab_shutter, AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, 1.5))
+
+
+def test_multiple_listeners(mocker, ab_shutter):
+    button = AbShutterButton.LARGE
+    event = AbShutterButtonEvent.PUSHED
+    first = mocker.Mock()
+    second = mocker.Mock()
+    ab_shutter.attach_button_event_listener(button, event, first)
+    ab_shutter.attach_button_event_listener(button, event, second)
+
+    bt_event = type("hoge", (object,), {
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
+    })
+    ab_shutter._key_event(bt_event)
+
+    e = ButtonEvent(ab_shutter, button, event, 1.5)
+    first.assert_called_once_with(e)
+    second.assert_called_once_with(e)
+
+    ab_shutter.detach_button_event_listener(button, event, first)
+    assert ab_shutter.button_event_funcs[button][event] == (second, )
+
+    ab_shutter._key_event(bt_event)
+    assert first.call_count == 1
+    assert second.call_count == 2
+
+
+def test_detach_listener_while_dispatching(mocker, ab_shutter):
+    button = AbShutterButton.LARGE
+    event = AbShutterButtonEvent.PUSHED
+    second = mocker.Mock()
+
+    def first(e):
+        ab_shutter.detach_button_event_listener(button, event, second)
+
+    ab_shutter.attach_button_event_listener(button, event, first)
+    ab_shutter.attach_button_event_listener(button, event, second)
+
+    bt_event = type("hoge", (object,), {
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
+    })
+    ab_shutter._key_event(bt_event)
+
+    # Snapshot taken at dispatch is used to the end
+    second.assert_called_once_with(
+        ButtonEvent(ab_shutter, button, event, 1.5))
+    assert ab_shutter.button_event_funcs[button][event] == (first, )
+
+
+def test_events_yield_button_event(mocker, ab_shutter):
+    func = mocker.Mock()
+    ab_shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, func)
+
+    def key_event(code, value):
+        return type("hoge", (object,), {
+            "code": code, "value": value, "sec": 1, "usec": 500000})
+
+    async def main():
+        events = ab_shutter.events()
+        receiver = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+
+        # Unknown codes are not published
+        ab_shutter._key_event(key_event(1, 1))
+        ab_shutter._key_event(key_event(
+            AbShutterButton.LARGE.value, AbShutterButtonEvent.PUSHED.value))
+        e = await receiver
+        await events.aclose()
+        return e
+
+    e = asyncio.run(main())
+    assert e == ButtonEvent(
+        ab_shutter, AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, 1.5)
+    func.assert_called_once_with(e)
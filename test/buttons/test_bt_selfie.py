@@ -1,6 +1,7 @@
 import pytest
 
-from bt_button import BTselfie, BtSelfieButton, BtSelfieButtonEvent
+from bt_button import BTselfie, BtSelfieButton, BtSelfieButtonEvent, \
+    ButtonEvent
 
 
 @pytest.fixture
@@ -16,13 +17,14 @@ def test_attach_clicked_listener_0(mocker, bt_selfie, button, event):
         for e in list(BtSelfieButtonEvent):
             bt_selfie.attach_button_event_listener(button, event, func)
 
-    assert bt_selfie.button_event_funcs[button][event] == func
+    count = len(list(BtSelfieButton)) * len(list(BtSelfieButtonEvent))
+    assert bt_selfie.button_event_funcs[button][event] == (func, ) * count
 
 
 def test_attach_button_event_listener_1(mocker, bt_selfie):
     for b in list(BtSelfieButton):
         for e in list(BtSelfieButtonEvent):
-            assert bt_selfie.button_event_funcs[b][e] is None
+            assert bt_selfie.button_event_funcs[b][e] == ()
 
 
 @pytest.mark.parametrize("button", list(BtSelfieButton))
@@ -35,12 +37,12 @@ def test_detach_button_event_listener_0(mocker, bt_selfie, button, event):
             bt_selfie.attach_button_event_listener(b, e, func)
 
     bt_selfie.detach_button_event_listener(button, event)
-    assert bt_selfie.button_event_funcs[button][event] is None
+    assert bt_selfie.button_event_funcs[button][event] == ()
 
     for b in list(BtSelfieButton):
         for e in list(BtSelfieButtonEvent):
             if not (b == button and e == event):
-                assert bt_selfie.button_event_funcs[b][e] == func
+                assert bt_selfie.button_event_funcs[b][e] == (func, )
 
 
 @pytest.mark.parametrize("button", list(BtSelfieButton))
@@ -57,12 +59,15 @@ def test_key_event_call_only_target_func(mocker, bt_selfie, button, event):
                 bt_selfie.attach_button_event_listener(b, e, mistake_func)
 
     bt_event = type("hoge", (object,), {
-        "code": button,
-        "value": event,
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
     })
     bt_selfie._key_event(bt_event)
 
-    correct_func.assert_called_once_with(bt_event)
+    correct_func.assert_called_once_with(
+        ButtonEvent(bt_selfie, button, event, 1.5))
     mistake_func.assert_not_called()
 
 
@@ -71,7 +76,25 @@ def test_key_event_call_only_target_func(mocker, bt_selfie, button, event):
 def test_key_event_with_any_func(bt_selfie, button, event):
 
     event = type("hoge", (object,), {
-        "code": button,
-        "value": event,
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 500000,
     })
     bt_selfie._key_event(event)
+
+
+def test_key_event_unknown_code(mocker, bt_selfie):
+    func = mocker.Mock()
+    for key in bt_selfie.key_funcs:
+        bt_selfie.key_funcs[key] = (func, )
+
+    event = type("hoge", (object,), {
+        "code": 0,
+        "value": 1,
+        "sec": 1,
+        "usec": 500000,
+    })
+    bt_selfie._key_event(event)
+
+    func.assert_not_called()
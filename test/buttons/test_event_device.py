@@ -1,6 +1,9 @@
+import asyncio
+import enum
 import pytest
 import evdev
 
+from bt_button import ButtonEvent
 from bt_button.buttons._event_device import EventDevice
 
 
@@ -9,6 +12,19 @@ def event_device(mocker):
     return EventDevice("00:00:00:00:00:00", "TEST")
 
 
+def syn_event(code=evdev.ecodes.SYN_REPORT):
+    return type("syn", (object,), {
+        "type": evdev.ecodes.EV_SYN,
+        "code": code,
+    })
+
+
+def key_event():
+    return type("key", (object,), {
+        "type": evdev.ecodes.EV_KEY,
+    })
+
+
 def test_is_monitoring_0(mocker, event_device):
     event_device.device = mocker.Mock()
     assert event_device.is_monitoring()
@@ -20,12 +36,56 @@ def test_is_monitoring_1(mocker, event_device):
 
 def test_start_monitor_0(mocker, event_device):
     module = "bt_button.buttons._event_device"
-    module += ".EventDeviceManager.open_device"
-    open_device_mock = mocker.patch(module)
+    open_device_mock = mocker.patch(module + ".EventDeviceManager.open_device")
+    register_mock = mocker.patch(module + ".EventReactor.register")
 
     event_device.start_monitor()
 
     open_device_mock.assert_called_once()
+    register_mock.assert_called_once_with(
+        open_device_mock.return_value, event_device._run)
+
+
+def test_start_monitor_set_event_mask(mocker, event_device):
+    module = "bt_button.buttons._event_device"
+    open_device_mock = mocker.patch(module + ".EventDeviceManager.open_device")
+    mocker.patch(module + ".EventReactor.register")
+    set_mask_mock = mocker.patch(
+        module + ".EventDeviceManager.backend.set_event_mask")
+
+    event_device.button_enum = enum.Enum("Button", {"A": 28, "B": 115})
+    event_device.start_monitor()
+
+    set_mask_mock.assert_called_once_with(
+        open_device_mock.return_value, [28, 115])
+
+
+def test_start_monitor_failed(mocker, event_device):
+    module = "bt_button.buttons._event_device"
+    open_device_mock = mocker.patch(module + ".EventDeviceManager.open_device")
+    close_device_mock = mocker.patch(
+        module + ".EventDeviceManager.close_device")
+    mocker.patch(module + ".EventReactor.register", side_effect=OSError)
+
+    with pytest.raises(OSError):
+        event_device.start_monitor()
+
+    close_device_mock.assert_called_once_with(open_device_mock.return_value)
+    assert not event_device.is_monitoring()
+    assert event_device.metrics.connects == 0
+
+
+def test_start_monitor_with_loop(mocker, event_device):
+    module = "bt_button.buttons._event_device"
+    open_device_mock = mocker.patch(module + ".EventDeviceManager.open_device")
+    register_mock = mocker.patch(module + ".EventReactor.register")
+    loop = mocker.Mock()
+
+    event_device.start_monitor(loop=loop)
+
+    register_mock.assert_not_called()
+    loop.add_reader.assert_called_once_with(
+        open_device_mock.return_value.fd, event_device._run)
 
 
 # def test_connect_1(mocker, bt_selfie):
@@ -44,13 +104,71 @@ def test_finish_monitor(mocker, event_device):
     event_device.device = mocker.Mock()
     event_device.device.path = mocker.Mock()
 
+    device = event_device.device
+
+    module = "bt_button.buttons._event_device"
+    close_device_mock = mocker.patch(
+        module + ".EventDeviceManager.close_device")
+    unregister_mock = mocker.patch(module + ".EventReactor.unregister")
+
+    event_device._finish_monitor()
+
+    close_device_mock.assert_called_once_with(device)
+    unregister_mock.assert_called_once_with(device)
+    assert not event_device.is_monitoring()
+
+
+def test_finish_monitor_call_disconnected_func(mocker, event_device):
+    event_device.device = mocker.Mock()
+    func = mocker.Mock()
+    event_device.attach_disconnected_listener(func)
+
     module = "bt_button.buttons._event_device"
-    module += ".EventDeviceManager.remove_device"
-    remove_device_mock = mocker.patch(module)
+    mocker.patch(module + ".EventDeviceManager.close_device")
+    mocker.patch(module + ".EventReactor.unregister")
 
     event_device._finish_monitor()
+    func.assert_called_once_with()
+
+    event_device.detach_disconnected_listener()
+    assert event_device.disconnected_func is None
+
+
+def test_finish_monitor_with_loop(mocker, event_device):
+    loop = mocker.Mock()
+    event_device.loop = loop
+    event_device.device = mocker.Mock()
+    fd = event_device.device.fd
+
+    module = "bt_button.buttons._event_device"
+    mocker.patch(module + ".EventDeviceManager.close_device")
+    unregister_mock = mocker.patch(module + ".EventReactor.unregister")
+
+    event_device._finish_monitor()
+
+    unregister_mock.assert_not_called()
+    loop.remove_reader.assert_called_once_with(fd)
+    assert event_device.loop is None
+
+
+def test_stop_monitor(mocker, event_device):
+    device = mocker.Mock()
+    event_device.device = device
+    func = mocker.Mock()
+    event_device.attach_disconnected_listener(func)
+
+    module = "bt_button.buttons._event_device"
+    close_device_mock = mocker.patch(
+        module + ".EventDeviceManager.close_device")
+    unregister_mock = mocker.patch(module + ".EventReactor.unregister")
 
-    remove_device_mock.assert_called_once()
+    event_device.stop_monitor()
+    event_device.stop_monitor()
+
+    close_device_mock.assert_called_once_with(device)
+    unregister_mock.assert_called_once_with(device)
+    func.assert_not_called()
+    assert not event_device.is_monitoring()
 
 
 def test_run_0(mocker, event_device):
@@ -62,11 +180,11 @@ def test_run_0(mocker, event_device):
     })
     event_device.device = mocker.Mock()
     mocker.patch.object(
-        event_device.device, 'read_loop', return_value=[event_mock, ])
+        event_device.device, 'read', return_value=[event_mock, syn_event()])
 
     event_device._run()
 
-    target_func.assert_called_once_with(event_mock)
+    target_func.assert_called_once_with(event_mock, mocker.ANY)
 
 
 def test_run_1(mocker, event_device):
@@ -78,31 +196,117 @@ def test_run_1(mocker, event_device):
     })
     event_device.device = mocker.Mock()
     mocker.patch.object(
-        event_device.device, 'read_loop', return_value=[event_mock, ])
+        event_device.device, 'read', return_value=[event_mock, syn_event()])
 
     event_device._run()
 
     target_func.assert_not_called()
 
 
+def test_run_split_frame(mocker, event_device):
+    target_func = mocker.Mock()
+    event_device._key_event = target_func
+
+    first = key_event()
+    second = key_event()
+    event_device.device = mocker.Mock()
+    event_device.device.read.side_effect = [
+        [first], [second, syn_event()]]
+
+    event_device._run()
+    target_func.assert_not_called()
+
+    event_device._run()
+    assert target_func.call_args_list == [
+        mocker.call(first, mocker.ANY), mocker.call(second, mocker.ANY)]
+
+
+def test_run_syn_dropped(mocker, event_device):
+    target_func = mocker.Mock()
+    event_device._key_event = target_func
+
+    valid = key_event()
+    event_device.device = mocker.Mock()
+    event_device.device.read.return_value = [
+        key_event(), syn_event(evdev.ecodes.SYN_DROPPED),
+        key_event(), syn_event(),
+        valid, syn_event(),
+    ]
+
+    event_device._run()
+
+    target_func.assert_called_once_with(valid, mocker.ANY)
+
+
+def test_run_failed_frame_not_dispatched_again(mocker, event_device):
+    target_func = mocker.Mock(side_effect=[RuntimeError, None])
+    event_device._key_event = target_func
+
+    first = key_event()
+    second = key_event()
+    event_device.device = mocker.Mock()
+    event_device.device.read.side_effect = [
+        [first, syn_event()], [second, syn_event()]]
+
+    with pytest.raises(RuntimeError):
+        event_device._run()
+    event_device._run()
+
+    assert target_func.call_args_list == [
+        mocker.call(first, mocker.ANY), mocker.call(second, mocker.ANY)]
+
+
 def test_run_throw_OSError(mocker, event_device):
     finish_monitor = mocker.Mock()
     event_device._finish_monitor = finish_monitor
 
     event_device.device = mocker.Mock()
-    mocker.patch.object(event_device.device, 'read_loop', side_effect=OSError)
+    mocker.patch.object(event_device.device, 'read', side_effect=OSError)
 
     event_device._run()
 
     finish_monitor.assert_called_once()
 
 
+def test_run_no_pending_event(mocker, event_device):
+    finish_monitor = mocker.Mock()
+    event_device._finish_monitor = finish_monitor
+
+    event_device.device = mocker.Mock()
+    mocker.patch.object(
+        event_device.device, 'read', side_effect=BlockingIOError)
+
+    event_device._run()
+
+    finish_monitor.assert_not_called()
+
+
 def test_coverage_0(mocker, event_device):
     module = "bt_button.buttons._event_device"
-    module += ".EventDeviceManager.open_device"
-    open_device_mock = mocker.patch(module)
+    open_device_mock = mocker.patch(module + ".EventDeviceManager.open_device")
+    mocker.patch(module + ".EventReactor.register")
 
     event_device.connect()
     event_device.is_connected()
 
     open_device_mock.assert_called_once()
+
+
+def test_wait_for(mocker, event_device):
+    Button = enum.Enum("Button", {"A": 28})
+    Event = enum.Enum("Event", {"PUSHED": 1, "RELEASED": 0})
+
+    async def main():
+        waiter = asyncio.ensure_future(
+            event_device.wait_for(Button.A, Event.RELEASED))
+        await asyncio.sleep(0)
+
+        event_device.event_stream.publish(
+            ButtonEvent(event_device, Button.A, Event.PUSHED, 1.0))
+        event_device.event_stream.publish(
+            ButtonEvent(event_device, Button.A, Event.RELEASED, 2.0))
+
+        return await waiter
+
+    ret = asyncio.run(main())
+    assert ret == ButtonEvent(event_device, Button.A, Event.RELEASED, 2.0)
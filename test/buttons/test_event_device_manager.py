@@ -1,12 +1,24 @@
 import pytest
 
 from bt_button.buttons._event_device_manager import EventDeviceManager
+from bt_button.buttons._input_backend import EvdevBackend
 from bt_button import DeviceNotFoundError
 
 
 @pytest.fixture(scope="function", autouse=True)
-def setup():
-    EventDeviceManager.reset()
+def setup(mocker):
+    backend = EvdevBackend()
+    backend.use_sysfs = False
+    # Paths are mocks in most tests
+    mocker.patch.object(backend, "node_id", return_value=None)
+    EventDeviceManager.set_backend(backend)
+
+
+def make_sysfs(root, node, name, uniq):
+    dev_dir = root / node / "device"
+    dev_dir.mkdir(parents=True)
+    (dev_dir / "name").write_text(name + "\n")
+    (dev_dir / "uniq").write_text(uniq + "\n")
 
 
 def test_search_device_found(mocker):
@@ -87,6 +99,163 @@ def test_search_device_duplicate(mocker):
     assert ret is None
 
 
+def test_search_device_use_index(mocker):
+    list_device_mock = mocker.patch(
+        "evdev.util.list_devices",
+        return_value=["/dev/input/event0", "/dev/input/event1"]
+    )
+
+    other = mocker.Mock()
+    other.name = "other"
+    other.uniq = ""
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+
+    input_device_mock = mocker.patch(
+        "evdev.InputDevice", side_effect=[other, target])
+
+    ret = EventDeviceManager._search_device("hoge", "00:00:00:00:00:00")
+    assert ret is None
+    assert input_device_mock.call_count == 2
+    other.close.assert_called_once()
+    target.close.assert_called_once()
+
+    input_device_mock.reset_mock(side_effect=True)
+    input_device_mock.return_value = target
+
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+    assert ret == target
+    assert list_device_mock.call_count == 2
+    input_device_mock.assert_called_once_with("/dev/input/event1")
+
+
+def test_search_device_removed_node(mocker):
+    list_device_mock = mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+    mocker.patch("evdev.InputDevice", return_value=target)
+
+    EventDeviceManager._update_index()
+    assert "/dev/input/event0" in EventDeviceManager.device_index
+
+    list_device_mock.return_value = []
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret is None
+    assert len(EventDeviceManager.device_index) == 0
+    assert len(EventDeviceManager.device_paths) == 0
+
+
+def test_search_device_reused_node(mocker):
+    mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    old = mocker.Mock()
+    old.name = "target"
+    old.uniq = "00:00:00:00:00:00"
+    new = mocker.Mock()
+    new.name = "other"
+    new.uniq = ""
+    mocker.patch("evdev.InputDevice", side_effect=[old, new])
+
+    EventDeviceManager._update_index()
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret is None
+    new.close.assert_called_once()
+    assert EventDeviceManager.device_index["/dev/input/event0"] == \
+        ("other", "")
+
+
+def test_search_device_node_reused_between_scans(mocker):
+    mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    keyboard = mocker.Mock()
+    keyboard.name = "Keyboard"
+    keyboard.uniq = ""
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+    mocker.patch("evdev.InputDevice", side_effect=[keyboard, target])
+    mocker.patch.object(
+        EventDeviceManager.backend, "node_id", side_effect=[1, 2])
+
+    EventDeviceManager._update_index()
+    # event0 was removed and created again by target before next scan
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret == target
+    target.close.assert_not_called()
+    assert EventDeviceManager.device_index["/dev/input/event0"] == \
+        ("target", "00:00:00:00:00:00")
+
+
+def test_search_device_missing_does_not_reprobe(mocker):
+    mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    keyboard = mocker.Mock()
+    keyboard.name = "Keyboard"
+    keyboard.uniq = ""
+    input_device_mock = mocker.patch(
+        "evdev.InputDevice", return_value=keyboard)
+    mocker.patch.object(
+        EventDeviceManager.backend, "node_id", return_value=1)
+
+    EventDeviceManager._update_index()
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret is None
+    input_device_mock.assert_called_once_with("/dev/input/event0")
+
+
+def test_search_device_sysfs(mocker, tmp_path):
+    EventDeviceManager.backend.use_sysfs = True
+    EventDeviceManager.backend.sysfs_root = str(tmp_path)
+    make_sysfs(tmp_path, "event0", "other", "")
+    make_sysfs(tmp_path, "event1", "target", "00:00:00:00:00:00")
+
+    mocker.patch(
+        "evdev.util.list_devices",
+        return_value=["/dev/input/event0", "/dev/input/event1"]
+    )
+
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+    input_device_mock = mocker.patch(
+        "evdev.InputDevice", return_value=target)
+
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret == target
+    input_device_mock.assert_called_once_with("/dev/input/event1")
+
+
+def test_search_device_sysfs_unavailable(mocker, tmp_path):
+    EventDeviceManager.backend.use_sysfs = True
+    EventDeviceManager.backend.sysfs_root = str(tmp_path)
+
+    mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+    input_device_mock = mocker.patch(
+        "evdev.InputDevice", return_value=target)
+
+    ret = EventDeviceManager._search_device("target", "00:00:00:00:00:00")
+
+    assert ret == target
+    input_device_mock.assert_called_once_with("/dev/input/event0")
+
+
 def test_open_device_correct(mocker):
     target_object = mocker.Mock()
     module = "bt_button.buttons._event_device_manager"
@@ -103,6 +272,35 @@ def test_open_device_correct(mocker):
     assert ret == target_object
 
 
+def test_open_devices(mocker):
+    mocker.patch(
+        "evdev.util.list_devices",
+        return_value=["/dev/input/event0", "/dev/input/event1",
+                      "/dev/input/event2"]
+    )
+
+    devices = [mocker.Mock(), mocker.Mock(), mocker.Mock()]
+    for i, dev in enumerate(devices):
+        dev.name = "TEST"
+        dev.uniq = "00:00:00:00:00:0{}".format(i)
+        dev.path = "/dev/input/event{}".format(i)
+    input_device_mock = mocker.patch("evdev.InputDevice", side_effect=devices)
+
+    ret = EventDeviceManager.open_devices([
+        ("TEST", "00:00:00:00:00:02"),
+        ("TEST", "00:00:00:00:00:0A"),
+        ("HOGE", "00:00:00:00:00:00"),
+    ])
+
+    assert ret == {("TEST", "00:00:00:00:00:02"): devices[2]}
+    assert input_device_mock.call_count == 3
+    devices[0].close.assert_called_once()
+    devices[1].close.assert_called_once()
+    devices[2].close.assert_not_called()
+    assert EventDeviceManager.connected_paths == ["/dev/input/event2"]
+    assert EventDeviceManager.open_fds == 1
+
+
 def test_open_device_not_found(mocker):
     module = "bt_button.buttons._event_device_manager"
     module += ".EventDeviceManager._search_device"
@@ -118,6 +316,38 @@ def test_open_device_not_found(mocker):
     assert len(EventDeviceManager.connected_paths) == 0
 
 
+def test_close_device(mocker):
+    mocker.patch(
+        "evdev.util.list_devices", return_value=["/dev/input/event0"])
+
+    target = mocker.Mock()
+    target.name = "target"
+    target.uniq = "00:00:00:00:00:00"
+    target.path = "/dev/input/event0"
+    mocker.patch("evdev.InputDevice", return_value=target)
+
+    device = EventDeviceManager.open_device("target", "00:00:00:00:00:00")
+    assert EventDeviceManager.open_fds == 1
+
+    EventDeviceManager.close_device(device)
+
+    target.close.assert_called_once()
+    assert EventDeviceManager.open_fds == 0
+    assert len(EventDeviceManager.connected_paths) == 0
+
+
+def test_search_device_not_found_close_all(mocker):
+    mocker.patch(
+        "evdev.util.list_devices",
+        return_value=["/dev/input/event{}".format(i) for i in range(10)])
+    mocker.patch("evdev.InputDevice")
+
+    for _ in range(3):
+        ret = EventDeviceManager._search_device("hoge", "00:00:00:00:00:00")
+        assert ret is None
+        assert EventDeviceManager.open_fds == 0
+
+
 def test_remove_device(mocker):
     path = mocker.Mock()
     EventDeviceManager.connected_paths.append(path)
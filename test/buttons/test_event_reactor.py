@@ -0,0 +1,76 @@
+import os
+import pytest
+
+from bt_button.buttons._event_reactor import EventReactor
+
+
+@pytest.fixture(scope="function", autouse=True)
+def setup(mocker):
+    # Don't start reactor thread, tests call _poll() directly
+    mocker.patch.object(EventReactor, "thread", mocker.Mock())
+
+
+@pytest.fixture
+def pipe():
+    r, w = os.pipe()
+    yield r, w
+    EventReactor.unregister(r)
+    os.close(r)
+    os.close(w)
+
+
+def test_register(mocker, pipe):
+    r, _ = pipe
+    callback = mocker.Mock()
+
+    EventReactor.register(r, callback)
+
+    assert EventReactor.is_registered(r)
+
+
+def test_unregister(mocker, pipe):
+    r, _ = pipe
+
+    EventReactor.register(r, mocker.Mock())
+    EventReactor.unregister(r)
+
+    assert not EventReactor.is_registered(r)
+
+
+def test_unregister_unknown(pipe):
+    r, _ = pipe
+    EventReactor.unregister(r)
+
+    assert not EventReactor.is_registered(r)
+
+
+def test_poll_call_readable(mocker, pipe):
+    r, w = pipe
+    readable = mocker.Mock()
+    EventReactor.register(r, readable)
+
+    os.write(w, b"\x00")
+    EventReactor._poll(timeout=0)
+
+    readable.assert_called_once_with()
+
+
+def test_poll_skip_not_readable(mocker, pipe):
+    r, _ = pipe
+    callback = mocker.Mock()
+    EventReactor.register(r, callback)
+
+    EventReactor._poll(timeout=0)
+
+    callback.assert_not_called()
+
+
+def test_poll_callback_raise(mocker, pipe):
+    r, w = pipe
+    callback = mocker.Mock(side_effect=RuntimeError)
+    EventReactor.register(r, callback)
+
+    os.write(w, b"\x00")
+    EventReactor._poll(timeout=0)
+
+    callback.assert_called_once_with()
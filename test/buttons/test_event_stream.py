@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from bt_button.buttons._event_stream import EventStream
+
+
+def test_events_same_thread():
+    stream = EventStream()
+
+    async def main():
+        events = stream.events()
+        waiter = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+
+        stream.publish(1)
+        ret = await waiter
+        await events.aclose()
+        return ret
+
+    assert asyncio.run(main()) == 1
+    assert len(stream.subscribers) == 0
+
+
+def test_events_other_thread():
+    stream = EventStream()
+
+    async def main():
+        events = stream.events()
+        waiter = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+
+        thread = threading.Thread(target=stream.publish, args=(2, ))
+        thread.start()
+        thread.join()
+
+        ret = await waiter
+        await events.aclose()
+        return ret
+
+    assert asyncio.run(main()) == 2
+
+
+def test_wait_for():
+    stream = EventStream()
+
+    async def main():
+        waiter = asyncio.ensure_future(stream.wait_for(lambda i: i == 3))
+        await asyncio.sleep(0)
+
+        for i in range(5):
+            stream.publish(i)
+
+        return await waiter
+
+    assert asyncio.run(main()) == 3
+    assert len(stream.subscribers) == 0
+
+
+def test_publish_closed_loop(mocker):
+    stream = EventStream()
+    loop = mocker.Mock()
+    loop.call_soon_threadsafe.side_effect = RuntimeError
+    stream.subscribers = ((None, loop, mocker.Mock()), )
+
+    stream.publish(1)
+
+    assert len(stream.subscribers) == 0
@@ -0,0 +1,81 @@
+import errno
+import os
+import struct
+import evdev
+
+from bt_button.buttons._input_backend import EvdevBackend, \
+    _set_event_mask, EVIOCSMASK
+
+
+def make_sysfs(root, node, name, uniq):
+    dev_dir = root / node / "device"
+    dev_dir.mkdir(parents=True)
+    (dev_dir / "name").write_text(name + "\n")
+    (dev_dir / "uniq").write_text(uniq + "\n")
+
+
+def test_identify_sysfs(tmp_path):
+    backend = EvdevBackend()
+    backend.sysfs_root = str(tmp_path)
+    make_sysfs(tmp_path, "event0", "target", "00:00:00:00:00:00")
+
+    assert backend.identify("/dev/input/event0") == \
+        ("target", "00:00:00:00:00:00")
+    assert backend.identify("/dev/input/event1") is None
+
+    backend.use_sysfs = False
+    assert backend.identify("/dev/input/event0") is None
+
+
+def test_set_event_mask(mocker):
+    ioctl_mock = mocker.patch("fcntl.ioctl")
+    device = mocker.Mock()
+    device.capabilities.return_value = {
+        evdev.ecodes.EV_SYN: [], evdev.ecodes.EV_KEY: [28, 115],
+        evdev.ecodes.EV_MSC: [4]}
+
+    assert _set_event_mask(device, [28, 115])
+
+    requests = {}
+    for call in ioctl_mock.call_args_list:
+        fd, request, arg = call[0]
+        assert fd == device.fd
+        assert request == EVIOCSMASK
+        event_type, size, ptr = struct.unpack("IIQ", arg)
+        requests[event_type] = size
+
+    assert requests == {evdev.ecodes.EV_KEY: 15, evdev.ecodes.EV_MSC: 0}
+
+
+def test_set_event_mask_not_supported(mocker):
+    r, w = os.pipe()
+    device = mocker.Mock()
+    device.fd = r
+    device.capabilities.return_value = {evdev.ecodes.EV_KEY: [28]}
+
+    try:
+        assert not _set_event_mask(device, [28])
+    finally:
+        os.close(r)
+        os.close(w)
+
+
+def test_set_event_mask_device_gone(mocker):
+    ioctl_mock = mocker.patch("fcntl.ioctl")
+    device = mocker.Mock()
+    device.capabilities.side_effect = OSError(errno.ENODEV, "No such device")
+
+    assert not _set_event_mask(device, [28])
+    ioctl_mock.assert_not_called()
+
+
+def test_node_id(tmp_path):
+    backend = EvdevBackend()
+    node = tmp_path / "event0"
+    node.write_text("")
+
+    node_id = backend.node_id(str(node))
+    assert node_id == backend.node_id(str(node))
+
+    node.unlink()
+    assert backend.node_id(str(node)) is None
@@ -0,0 +1,37 @@
+import os
+import pytest
+
+from bt_button.buttons._input_node_watcher import InputNodeWatcher, \
+    IN_CREATE, IN_ATTRIB, IN_DELETE
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    watcher = InputNodeWatcher(str(tmp_path))
+    yield watcher
+    watcher.close()
+
+
+def test_read_event_node(tmp_path, watcher):
+    node = tmp_path / "event0"
+    node.touch()
+    os.chmod(str(node), 0o600)
+    node.unlink()
+
+    assert watcher.read() == [
+        (IN_CREATE, "event0"), (IN_ATTRIB, "event0"), (IN_DELETE, "event0")]
+
+
+def test_read_ignore_other_node(tmp_path, watcher):
+    (tmp_path / "js0").touch()
+
+    assert watcher.read() == []
+
+
+def test_read_nothing(watcher):
+    assert watcher.read() == []
+
+
+def test_watch_not_exist(tmp_path):
+    with pytest.raises(OSError):
+        InputNodeWatcher(str(tmp_path / "hoge"))
@@ -1,12 +1,18 @@
+import asyncio
+import threading
+import time
 import pytest
-from bt_button import SmartPalette, SmartPaletteButton, DeviceNotFoundError
-from bt_button.buttons.smart_palette import _button_to_data
+from bt_button import SmartPalette, SmartPaletteButton, DeviceNotFoundError, \
+    SmartPaletteButtonEvent, connect_all
+from bt_button.buttons.smart_palette import _button_to_data, _data_to_button
+from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
 
 import pygatt
 
 
 @pytest.fixture
 def smart_palette(mocker):
+    GattAdapterPool.reset()
     mocker.patch('pygatt.GATTToolBackend')
     return SmartPalette("00:00:00:00:00:00")
 
@@ -21,18 +27,23 @@ def test_is_connected_1(mocker, smart_palette):
     assert not smart_palette.is_connected()
 
 
+def test_init_not_start_adapter(mocker, smart_palette):
+    pygatt.GATTToolBackend.assert_not_called()
+    assert smart_palette.adapter is None
+
+
 def test_connect_0(mocker, smart_palette):
-    adapter_mock = mocker.patch.object(smart_palette.adapter, 'connect')
+    adapter_mock = pygatt.GATTToolBackend.return_value.connect
 
     smart_palette.connect()
 
     adapter_mock.assert_called_once()
+    pygatt.GATTToolBackend.return_value.start.assert_called_once()
 
 
 def test_connect_1(mocker, smart_palette):
-    adapter_mock = mocker.patch.object(
-        smart_palette.adapter, 'connect',
-        side_effect=pygatt.exceptions.NotConnectedError)
+    adapter_mock = pygatt.GATTToolBackend.return_value.connect
+    adapter_mock.side_effect = pygatt.exceptions.NotConnectedError
 
     with pytest.raises(DeviceNotFoundError):
         smart_palette.connect()
@@ -40,6 +51,164 @@ def test_connect_1(mocker, smart_palette):
     adapter_mock.assert_called_once()
 
 
+def test_connect_limit_attempts(mocker, smart_palette):
+    GattAdapterPool.set_max_connecting(1, "hci0")
+    other = SmartPalette("00:00:00:00:00:01")
+    running = []
+    overlapped = []
+
+    def connect(*args, **kwargs):
+        running.append(1)
+        overlapped.append(len(running) > 1)
+        time.sleep(0.02)
+        running.pop()
+        return mocker.Mock()
+
+    pygatt.GATTToolBackend.return_value.connect.side_effect = connect
+    threads = [threading.Thread(target=p.connect)
+               for p in [smart_palette, other]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert overlapped == [False, False]
+
+
+def test_connect_attempts_concurrently(mocker, smart_palette):
+    barrier = threading.Barrier(2, timeout=1)
+    other = SmartPalette("00:00:00:00:00:01")
+
+    def connect(*args, **kwargs):
+        barrier.wait()
+        return mocker.Mock()
+
+    pygatt.GATTToolBackend.return_value.connect.side_effect = connect
+
+    threads = [threading.Thread(target=p.connect)
+               for p in [smart_palette, other]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not barrier.broken
+
+
+def test_connect_slot_wait_counts_against_timeout(mocker, smart_palette):
+    GattAdapterPool.set_max_connecting(1)
+    slot = GattAdapterPool.connect_slot("hci0")
+    slot.acquire()
+    try:
+        start = time.monotonic()
+        with pytest.raises(DeviceNotFoundError):
+            smart_palette.connect(timeout=0.05)
+        assert time.monotonic() - start < 1
+    finally:
+        slot.release()
+
+    pygatt.GATTToolBackend.return_value.connect.assert_not_called()
+
+    smart_palette.connect(timeout=1)
+    timeout = pygatt.GATTToolBackend.return_value.connect.call_args[1][
+        "timeout"]
+    assert 0 < timeout <= 1
+
+
+def test_slow_backend_start_not_serialized(mocker, smart_palette):
+    timeouts = []
+
+    def factory(hci_device):
+        adapter = mocker.Mock()
+        adapter.start.side_effect = lambda: time.sleep(0.3)
+        adapter.connect.side_effect = \
+            lambda *args, **kwargs: timeouts.append(kwargs["timeout"]) or \
+            mocker.Mock()
+        return adapter
+
+    GattAdapterPool.set_backend_factory(factory)
+    palettes = [SmartPalette("00:00:00:00:00:0{}".format(i))
+                for i in range(3)]
+
+    start = time.monotonic()
+    results = connect_all(palettes, max_concurrency=3, timeout=1.0)
+
+    assert [e for _, e in results] == [None, None, None]
+    assert time.monotonic() - start < 0.8
+    assert all(t > 0.5 for t in timeouts)
+    GattAdapterPool.set_backend_factory(None)
+
+
+def test_set_max_connecting(smart_palette):
+    GattAdapterPool.set_max_connecting(2, "hci1")
+    GattAdapterPool.set_max_connecting(3)
+
+    def slots(hci_device):
+        slot = GattAdapterPool.connect_slot(hci_device)
+        count = 0
+        while slot.acquire(blocking=False):
+            count += 1
+        return count
+
+    assert slots("hci1") == 2
+    assert slots("hci0") == 3
+
+
+def test_connect_all(mocker):
+    palettes = [mocker.Mock() for _ in range(3)]
+    for p in palettes:
+        p.is_connected.return_value = False
+    palettes[1].connect.side_effect = DeviceNotFoundError(
+        "hoge", "SmartPalette", "00:00:00:00:00:01")
+    palettes[2].is_connected.return_value = True
+
+    results = connect_all(palettes, max_concurrency=2, timeout=1)
+    assert isinstance(results, list)
+    results = dict(results)
+
+    assert set(results) == {palettes[0], palettes[1]}
+    assert results[palettes[0]] is None
+    assert isinstance(results[palettes[1]], DeviceNotFoundError)
+    palettes[0].connect.assert_called_once_with(timeout=1)
+    palettes[2].connect.assert_not_called()
+
+
+def test_connect_all_on_result(mocker):
+    fast = mocker.Mock()
+    slow = mocker.Mock()
+    slow_started = threading.Event()
+    reported = []
+    for p in [fast, slow]:
+        p.is_connected.return_value = False
+    woke = []
+    slow.connect.side_effect = \
+        lambda timeout: woke.append(slow_started.wait(1))
+
+    def on_result(palette, exception):
+        reported.append((palette, exception))
+        # Reported while slow attempt is still running
+        if palette is fast:
+            slow_started.set()
+
+    results = connect_all([fast, slow], on_result=on_result)
+
+    assert woke == [True]
+    assert reported == [(fast, None), (slow, None)]
+    assert results == reported
+
+
+def test_connect_all_concurrently(mocker):
+    barrier = threading.Barrier(3, timeout=1)
+    palettes = [mocker.Mock() for _ in range(3)]
+    for p in palettes:
+        p.is_connected.return_value = False
+        p.connect.side_effect = lambda timeout: barrier.wait()
+
+    results = list(connect_all(palettes, max_concurrency=3))
+
+    assert [e for _, e in results] == [None, None, None]
+
+
 def test_disconnect_0(mocker, smart_palette):
     smart_palette.device = mocker.Mock()
     device_mock = mocker.patch.object(smart_palette.device, 'disconnect')
@@ -49,6 +218,93 @@ def test_disconnect_0(mocker, smart_palette):
     device_mock.assert_called_once()
 
 
+def test_connection_lost(mocker, smart_palette):
+    func = mocker.Mock()
+    smart_palette.attach_disconnected_listener(func)
+    smart_palette.device = mocker.Mock()
+
+    smart_palette._disconnected()
+    smart_palette._disconnected()
+
+    assert not smart_palette.is_connected()
+    func.assert_called_once_with()
+
+    smart_palette.detach_disconnected_listener()
+    assert smart_palette.disconnected_func is None
+
+
+def test_disconnect_keep_adapter(mocker, smart_palette):
+    smart_palette.connect()
+
+    smart_palette.disconnect()
+
+    smart_palette.adapter.stop.assert_not_called()
+
+
+def test_adapter_per_palette(mocker, smart_palette):
+    # gatttool holds one connection, so backend is not shared
+    first = mocker.Mock()
+    second = mocker.Mock()
+    pygatt.GATTToolBackend.side_effect = [first, second]
+    other = SmartPalette("00:00:00:00:00:01")
+
+    smart_palette.connect()
+    other.connect()
+    assert smart_palette.adapter is first
+    assert other.adapter is second
+    first.start.assert_called_once()
+    second.start.assert_called_once()
+
+    # Only first backend of the interface resets it
+    first.start.assert_called_once_with(reset_on_start=True)
+    second.start.assert_called_once_with(reset_on_start=False)
+
+    # Backend is kept across reconnects
+    smart_palette._disconnected()
+    smart_palette.connect()
+    assert pygatt.GATTToolBackend.call_count == 2
+
+    smart_palette.close()
+    first.stop.assert_called_once()
+    second.stop.assert_not_called()
+    assert smart_palette.adapter is None
+
+    other.close()
+    other.close()
+    second.stop.assert_called_once()
+
+
+def test_share_adapter(mocker, smart_palette):
+    adapter = mocker.Mock()
+    adapter.multiple_connections = True
+    factory = mocker.Mock(return_value=adapter)
+    GattAdapterPool.set_backend_factory(factory)
+    other = SmartPalette("00:00:00:00:00:01")
+
+    smart_palette.connect()
+    other.connect()
+    assert smart_palette.adapter is adapter
+    assert other.adapter is adapter
+    factory.assert_called_once_with(hci_device="hci0")
+    adapter.start.assert_called_once()
+
+    smart_palette.close()
+    adapter.stop.assert_not_called()
+
+    other.close()
+    adapter.stop.assert_called_once()
+    GattAdapterPool.set_backend_factory(None)
+
+
+def test_separate_adapter_per_interface(mocker, smart_palette):
+    other = SmartPalette("00:00:00:00:00:01", hci_device="hci1")
+    smart_palette.connect()
+    other.connect()
+
+    assert pygatt.GATTToolBackend.call_count == 2
+    assert other.hci_device == "hci1"
+
+
 def test_disconnect_1(mocker, smart_palette):
     is_connected_mock = mocker.patch.object(smart_palette, 'is_connected')
     is_connected_mock.return_value = False
@@ -66,16 +322,16 @@ def test_attach_pushed_listener_0(mocker, smart_palette, target_button):
     func = mocker.Mock()
 
     smart_palette.attach_pushed_listener(target_button, func)
-    assert smart_palette.pushed_funcs[target_button] == func
+    assert smart_palette.pushed_funcs[target_button] == (func, )
 
     for other_button in list(SmartPaletteButton):
         if other_button != target_button:
-            assert smart_palette.pushed_funcs[other_button] is None
+            assert smart_palette.pushed_funcs[other_button] == ()
 
 
 def test_attach_pushed_listener_1(mocker, smart_palette):
     for button in list(SmartPaletteButton):
-        assert smart_palette.pushed_funcs[button] is None
+        assert smart_palette.pushed_funcs[button] == ()
 
 
 @pytest.mark.parametrize("target_button", list(SmartPaletteButton))
@@ -87,11 +343,11 @@ def test_detach_pushed_listener_0(mocker, smart_palette, target_button):
 
     smart_palette.detach_pushed_listener(target_button)
 
-    assert smart_palette.pushed_funcs[target_button] is None
+    assert smart_palette.pushed_funcs[target_button] == ()
 
     for other_button in list(SmartPaletteButton):
         if other_button != target_button:
-            assert smart_palette.pushed_funcs[other_button] == func
+            assert smart_palette.pushed_funcs[other_button] == (func, )
 
 
 @pytest.mark.parametrize("target_button", list(SmartPaletteButton))
@@ -116,3 +372,94 @@ def test_event_call_only_target_func(mocker, smart_palette, target_button):
 def test_event_with_any_func(mocker, smart_palette, target_button):
     data = _button_to_data(target_button)
     smart_palette._event(0xb, data)
+
+
+def test_multiple_pushed_listeners(mocker, smart_palette):
+    first = mocker.Mock()
+    second = mocker.Mock()
+    smart_palette.attach_pushed_listener(SmartPaletteButton.RED, first)
+    smart_palette.attach_pushed_listener(SmartPaletteButton.RED, second)
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    first.assert_called_once()
+    e = first.call_args[0][0]
+    assert e.device is smart_palette
+    assert e.button == SmartPaletteButton.RED
+    assert e.event == SmartPaletteButtonEvent.PUSHED
+    second.assert_called_once_with(e)
+
+    smart_palette.detach_pushed_listener(SmartPaletteButton.RED, second)
+    assert smart_palette.pushed_funcs[SmartPaletteButton.RED] == (first, )
+
+
+def test_event_with_executor(mocker, smart_palette):
+    func = mocker.Mock()
+    executor = mocker.Mock()
+    smart_palette.set_dispatch_executor(executor)
+    smart_palette.attach_pushed_listener(SmartPaletteButton.RED, func)
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+
+    func.assert_not_called()
+    executor.submit.assert_called_once()
+    assert executor.submit.call_args[0][0] == func
+    assert executor.submit.call_args[0][1].button == SmartPaletteButton.RED
+
+
+@pytest.mark.parametrize("button", list(SmartPaletteButton))
+def test_data_to_button(button):
+    data = "PIN{:02}".format(button.value).encode() + b"\x01"
+
+    assert _data_to_button(bytearray(data)) == button
+    assert _button_to_data(button) == data[:5] + b"\x00"
+
+
+@pytest.mark.parametrize("data", [
+    b"PIN99\x00", b"PIN01", b"PIN01\x00\x00", b"\xff" * 6, b""])
+def test_event_unknown_notification(mocker, smart_palette, data):
+    func = mocker.Mock()
+    for button in list(SmartPaletteButton):
+        smart_palette.attach_pushed_listener(button, func)
+
+    smart_palette._event(0xb, bytearray(data))
+
+    func.assert_not_called()
+    assert smart_palette.unknown_notifications == 1
+
+
+def test_event_publish(mocker, smart_palette):
+    func = mocker.Mock()
+    smart_palette.attach_pushed_listener(SmartPaletteButton.RED, func)
+
+    async def main():
+        events = smart_palette.events()
+        receiver = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0)
+
+        smart_palette._event(0xb, b"hoge")
+        smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+        e = await receiver
+        await events.aclose()
+        return e
+
+    e = asyncio.run(main())
+    assert e.button == SmartPaletteButton.RED
+    assert e.event == SmartPaletteButtonEvent.PUSHED
+    func.assert_called_once_with(e)
+
+
+def test_wait_for(mocker, smart_palette):
+    async def main():
+        waiter = asyncio.ensure_future(
+            smart_palette.wait_for(SmartPaletteButton.RED))
+        await asyncio.sleep(0)
+
+        smart_palette._event(0xb, _button_to_data(SmartPaletteButton.BLUE))
+        assert not waiter.done()
+        smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+
+        return await waiter
+
+    e = asyncio.run(main())
+    assert e.device is smart_palette
+    assert e.button == SmartPaletteButton.RED
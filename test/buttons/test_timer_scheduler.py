@@ -0,0 +1,57 @@
+import threading
+
+from bt_button.buttons._timer_scheduler import TimerScheduler
+
+
+def test_schedule_order():
+    scheduler = TimerScheduler()
+    called = []
+    done = threading.Event()
+
+    def last():
+        called.append("last")
+        done.set()
+
+    scheduler.schedule(0.06, last)
+    scheduler.schedule(0.02, called.append, "first")
+    scheduler.schedule(0.04, called.append, "second")
+
+    assert done.wait(1.0)
+    assert called == ["first", "second", "last"]
+
+
+def test_cancel(mocker):
+    scheduler = TimerScheduler()
+    func = mocker.Mock()
+    done = threading.Event()
+
+    timer = scheduler.schedule(0.01, func)
+    timer.cancel()
+    scheduler.schedule(0.03, done.set)
+
+    assert done.wait(1.0)
+    func.assert_not_called()
+
+
+def test_timer_raise(mocker):
+    scheduler = TimerScheduler()
+    done = threading.Event()
+
+    scheduler.schedule(0.0, mocker.Mock(side_effect=RuntimeError))
+    scheduler.schedule(0.01, done.set)
+
+    assert done.wait(1.0)
+
+
+def test_pop_expired(mocker):
+    scheduler = TimerScheduler()
+    mocker.patch.object(scheduler, "thread", mocker.Mock())
+    mocker.patch("time.monotonic", return_value=100.0)
+
+    first = scheduler.schedule(1.0, mocker.Mock())
+    second = scheduler.schedule(2.0, mocker.Mock())
+    second.cancel()
+
+    assert scheduler._pop_expired(100.5) == []
+    assert scheduler._pop_expired(103.0) == [first]
+    assert len(scheduler.heap) == 0
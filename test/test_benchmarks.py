@@ -0,0 +1,23 @@
+from benchmarks.dispatch import run, main
+
+
+def test_run():
+    results = run(["ab_shutter", "bt_selfie", "smart_palette"],
+                  [1000], [2], 0.02)
+
+    assert [r["device"] for r in results] == \
+        ["ab_shutter", "bt_selfie", "smart_palette"]
+    for r in results:
+        assert r["sent"] == 20
+        assert r["received"] == 20
+        assert r["latency_p50_us"] <= r["latency_p99_us"] \
+            <= r["latency_max_us"]
+
+
+def test_main_output(tmp_path):
+    output = tmp_path / "result.json"
+
+    main(["--devices-kind", "ab_shutter", "--rates", "1000",
+          "--devices", "1", "--duration", "0.01", "--output", str(output)])
+
+    assert '"events_per_sec"' in output.read_text()
@@ -0,0 +1,101 @@
+import pytest
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    ButtonEvent, set_free_list_size
+from bt_button import event as event_module
+
+
+@pytest.fixture(autouse=True)
+def free_list():
+    yield
+    set_free_list_size(0)
+
+
+def key_event(button, event):
+    return type("hoge", (object,), {
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": 250000,
+    })
+
+
+def test_read_only():
+    e = ButtonEvent(None, AbShutterButton.LARGE,
+                    AbShutterButtonEvent.PUSHED, 1.0)
+
+    with pytest.raises(AttributeError):
+        e.button = AbShutterButton.SMALL
+    with pytest.raises(AttributeError):
+        e.other = 1
+    with pytest.raises(AttributeError):
+        del e.timestamp
+    assert not hasattr(e, "__dict__")
+
+
+def test_equal():
+    device = object()
+    e = ButtonEvent(device, AbShutterButton.LARGE,
+                    AbShutterButtonEvent.PUSHED, 1.0)
+
+    assert e == ButtonEvent(device, AbShutterButton.LARGE,
+                            AbShutterButtonEvent.PUSHED, 1.0)
+    assert e != ButtonEvent(object(), AbShutterButton.LARGE,
+                            AbShutterButtonEvent.PUSHED, 1.0)
+    assert len({e, e}) == 1
+
+
+def test_free_list_disabled():
+    shutter = AbShutter("00:00:00:00:00:00")
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, lambda e: None)
+
+    shutter._key_event(
+        key_event(AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED))
+
+    assert event_module._free_list == []
+
+
+def test_free_list_recycle():
+    set_free_list_size(1)
+    shutter = AbShutter("00:00:00:00:00:00")
+    seen = []
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED,
+        lambda e: seen.append((id(e), e.button, e.timestamp)))
+
+    for _ in range(3):
+        shutter._key_event(
+            key_event(AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED))
+
+    # Same object is reused for every event
+    assert len(set(s[0] for s in seen)) == 1
+    assert seen[-1][1:] == (AbShutterButton.LARGE, 1.25)
+    assert len(event_module._free_list) == 1
+    assert event_module._free_list[0].device is None
+
+
+def test_free_list_keep_referred_event():
+    set_free_list_size(4)
+    shutter = AbShutter("00:00:00:00:00:00")
+    kept = []
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, kept.append)
+
+    for _ in range(2):
+        shutter._key_event(
+            key_event(AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED))
+
+    assert kept[0] is not kept[1]
+    assert kept[0].device is shutter
+    assert event_module._free_list == []
+
+
+def test_no_event_without_listener(mocker):
+    make = mocker.patch("bt_button.buttons._event_device._make_event")
+    shutter = AbShutter("00:00:00:00:00:00")
+
+    shutter._key_event(
+        key_event(AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED))
+
+    make.assert_not_called()
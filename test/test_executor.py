@@ -0,0 +1,168 @@
+import threading
+import pytest
+
+from bt_button import ButtonEvent, DispatchExecutor, OverflowPolicy
+
+
+@pytest.fixture
+def blocker():
+    # Keep the single worker busy until set
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def start_blocked(executor, blocker):
+    started = threading.Event()
+
+    def block():
+        started.set()
+        blocker.wait()
+
+    executor.submit(block)
+    started.wait()
+
+
+def test_submit_run(mocker):
+    executor = DispatchExecutor()
+    func = mocker.Mock()
+
+    assert executor.submit(func, 1, 2)
+    executor.shutdown()
+
+    func.assert_called_once_with(1, 2)
+    assert executor.stats()["submitted"] == 1
+
+
+def test_listener_raise(mocker):
+    executor = DispatchExecutor()
+    fail = mocker.Mock(side_effect=RuntimeError)
+    func = mocker.Mock()
+
+    executor.submit(fail)
+    executor.submit(func)
+    executor.shutdown()
+
+    func.assert_called_once_with()
+
+
+def test_drop_newest(mocker, blocker):
+    executor = DispatchExecutor(
+        max_queue=2, overflow=OverflowPolicy.DROP_NEWEST)
+    func = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    for i in range(4):
+        executor.submit(func, i)
+    assert executor.depth == 2
+
+    blocker.set()
+    executor.shutdown()
+
+    assert func.call_args_list == [mocker.call(0), mocker.call(1)]
+    assert executor.stats()["dropped"] == 2
+
+
+def test_drop_oldest(mocker, blocker):
+    executor = DispatchExecutor(
+        max_queue=2, overflow=OverflowPolicy.DROP_OLDEST)
+    func = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    for i in range(4):
+        executor.submit(func, i)
+
+    blocker.set()
+    executor.shutdown()
+
+    assert func.call_args_list == [mocker.call(2), mocker.call(3)]
+    assert executor.stats()["dropped"] == 2
+
+
+def test_coalesce(mocker, blocker):
+    executor = DispatchExecutor(
+        max_queue=2, overflow=OverflowPolicy.COALESCE)
+    func = mocker.Mock()
+    other = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    executor.submit(other, 0)
+    executor.submit(func, 1)
+    executor.submit(func, 2)
+    executor.submit(func, 3)
+
+    blocker.set()
+    executor.shutdown()
+
+    other.assert_called_once_with(0)
+    func.assert_called_once_with(3)
+    assert executor.stats()["coalesced"] == 2
+    assert executor.stats()["dropped"] == 0
+
+
+def test_coalesce_button_event(mocker, blocker):
+    executor = DispatchExecutor(
+        max_queue=2, overflow=OverflowPolicy.COALESCE)
+    func = mocker.Mock()
+    device = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    pushed = ButtonEvent(device, "A", "PUSHED", 1.0)
+    released = ButtonEvent(device, "A", "RELEASED", 2.0)
+    other_button = ButtonEvent(device, "B", "RELEASED", 3.0)
+    released_again = ButtonEvent(device, "A", "RELEASED", 4.0)
+
+    executor.submit(func, pushed)
+    executor.submit(func, released)
+    # No queued call of same button event, oldest is dropped
+    executor.submit(func, other_button)
+    executor.submit(func, released_again)
+
+    blocker.set()
+    executor.shutdown()
+
+    assert func.call_args_list == [
+        mocker.call(released_again), mocker.call(other_button)]
+    assert executor.stats()["coalesced"] == 1
+    assert executor.stats()["dropped"] == 1
+
+
+def test_default_drops_oldest(mocker, blocker):
+    executor = DispatchExecutor(max_queue=1)
+    func = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    # Doesn't block
+    executor.submit(func, 0)
+    executor.submit(func, 1)
+
+    blocker.set()
+    executor.shutdown()
+
+    func.assert_called_once_with(1)
+
+
+def test_block(mocker, blocker):
+    executor = DispatchExecutor(max_queue=1, overflow=OverflowPolicy.BLOCK)
+    func = mocker.Mock()
+    start_blocked(executor, blocker)
+
+    executor.submit(func, 0)
+    thread = threading.Thread(target=executor.submit, args=(func, 1))
+    thread.start()
+    thread.join(0.05)
+    assert thread.is_alive()
+
+    blocker.set()
+    thread.join()
+    executor.shutdown()
+
+    assert func.call_args_list == [mocker.call(0), mocker.call(1)]
+    assert executor.stats()["max_depth"] == 1
+
+
+def test_submit_after_shutdown(mocker):
+    executor = DispatchExecutor()
+    executor.shutdown()
+
+    assert not executor.submit(mocker.Mock())
@@ -0,0 +1,232 @@
+import pytest
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    SmartPalette, SmartPaletteButton, Gesture, GestureRecognizer
+
+
+@pytest.fixture
+def scheduler(mocker):
+    return mocker.Mock()
+
+
+@pytest.fixture
+def recognizer(scheduler):
+    return GestureRecognizer(
+        double_press_interval=0.4, long_press_time=1.0, chord_window=0.1,
+        scheduler=scheduler)
+
+
+@pytest.fixture
+def ab_shutter():
+    return AbShutter("00:00:00:00:00:00")
+
+
+@pytest.fixture
+def palette(mocker):
+    palette = mocker.Mock(spec=SmartPalette)
+    palette.button_enum = SmartPaletteButton
+    return palette
+
+
+def key_event(button, event, usec=0):
+    return type("hoge", (object,), {
+        "code": button.value,
+        "value": event.value,
+        "sec": 1,
+        "usec": usec,
+    })
+
+
+def test_watch_event_device(mocker, recognizer, ab_shutter):
+    pressed = mocker.patch.object(recognizer, "_pressed")
+    released = mocker.patch.object(recognizer, "_released")
+    recognizer.watch(ab_shutter)
+
+    ab_shutter._key_event(
+        key_event(AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED))
+    pressed.assert_called_once_with((ab_shutter, AbShutterButton.LARGE), 1.0)
+
+    ab_shutter._key_event(
+        key_event(AbShutterButton.LARGE, AbShutterButtonEvent.RELEASED))
+    released.assert_called_once_with((ab_shutter, AbShutterButton.LARGE))
+
+
+def test_unwatch_event_device(recognizer, ab_shutter):
+    recognizer.watch(ab_shutter)
+    recognizer.unwatch(ab_shutter)
+
+    for funcs in ab_shutter.key_funcs.values():
+        assert funcs == ()
+    assert len(recognizer.states) == 0
+
+
+def test_watch_palette(mocker, recognizer, palette):
+    pressed = mocker.patch.object(recognizer, "_pressed")
+    recognizer.watch(palette)
+
+    button, func = palette.attach_pushed_listener.call_args_list[0][0]
+    e = mocker.Mock()
+    func(e)
+    pressed.assert_called_once_with((palette, button), e.timestamp)
+
+    recognizer.unwatch(palette)
+
+    count = len(list(SmartPaletteButton))
+    assert palette.attach_pushed_listener.call_count == count
+    assert palette.detach_pushed_listener.call_count == count
+
+
+def test_double_press(mocker, recognizer, palette):
+    func = mocker.Mock()
+    recognizer.watch(palette)
+    recognizer.attach_gesture_listener(
+        palette, SmartPaletteButton.RED, Gesture.DOUBLE_PRESS, func)
+    key = (palette, SmartPaletteButton.RED)
+
+    recognizer._pressed(key, 10.0)
+    recognizer._pressed(key, 10.5)
+    func.assert_not_called()
+
+    recognizer._pressed(key, 10.8)
+    func.assert_called_once()
+    e = func.call_args[0][0]
+    assert e.gesture == Gesture.DOUBLE_PRESS
+    assert e.buttons == (key, )
+    assert e.duration == pytest.approx(0.3)
+
+    # Third press starts new double press
+    recognizer._pressed(key, 11.0)
+    func.assert_called_once()
+
+
+def test_double_press_event_timestamp(mocker, recognizer, ab_shutter):
+    func = mocker.Mock()
+    recognizer.watch(ab_shutter)
+    recognizer.attach_gesture_listener(
+        ab_shutter, AbShutterButton.LARGE, Gesture.DOUBLE_PRESS, func)
+
+    # Delivered together, but pressed 0.6 s and 0.3 s apart
+    for usec in [0, 600000, 900000]:
+        ab_shutter._key_event(key_event(
+            AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, usec))
+        ab_shutter._key_event(key_event(
+            AbShutterButton.LARGE, AbShutterButtonEvent.RELEASED, usec))
+
+    func.assert_called_once()
+    assert func.call_args[0][0].duration == pytest.approx(0.3)
+
+
+def test_double_press_configure(mocker, recognizer, palette):
+    func = mocker.Mock()
+    recognizer.watch(palette)
+    recognizer.configure(
+        palette, SmartPaletteButton.RED, double_press_interval=1.0)
+    recognizer.attach_gesture_listener(
+        palette, SmartPaletteButton.RED, Gesture.DOUBLE_PRESS, func)
+    key = (palette, SmartPaletteButton.RED)
+
+    recognizer._pressed(key, 10.0)
+    recognizer._pressed(key, 10.9)
+
+    func.assert_called_once()
+
+
+def test_long_press(mocker, recognizer, scheduler, ab_shutter):
+    func = mocker.Mock()
+    recognizer.watch(ab_shutter)
+    recognizer.attach_gesture_listener(
+        ab_shutter, AbShutterButton.LARGE, Gesture.LONG_PRESS, func)
+    key = (ab_shutter, AbShutterButton.LARGE)
+
+    recognizer._pressed(key, 1.0, now=10.0)
+    delay, callback, *args = scheduler.schedule.call_args[0]
+    assert delay == 1.0
+
+    callback(*args, now=11.0)
+
+    func.assert_called_once()
+    e = func.call_args[0][0]
+    assert e.gesture == Gesture.LONG_PRESS
+    assert e.duration == pytest.approx(1.0)
+
+
+def test_long_press_released(mocker, recognizer, scheduler, ab_shutter):
+    func = mocker.Mock()
+    recognizer.watch(ab_shutter)
+    recognizer.attach_gesture_listener(
+        ab_shutter, AbShutterButton.LARGE, Gesture.LONG_PRESS, func)
+    key = (ab_shutter, AbShutterButton.LARGE)
+
+    recognizer._pressed(key, 1.0, now=10.0)
+    recognizer._released(key)
+    scheduler.schedule.return_value.cancel.assert_called_once()
+    _, callback, *args = scheduler.schedule.call_args[0]
+    callback(*args, now=11.0)
+
+    func.assert_not_called()
+
+
+def test_palette_no_long_press(recognizer, scheduler, palette):
+    recognizer.watch(palette)
+
+    recognizer._pressed((palette, SmartPaletteButton.RED), 10.0)
+
+    scheduler.schedule.assert_not_called()
+
+
+def test_chord(mocker, recognizer, palette, ab_shutter):
+    func = mocker.Mock()
+    recognizer.watch(palette)
+    recognizer.watch(ab_shutter)
+    red = (palette, SmartPaletteButton.RED)
+    large = (ab_shutter, AbShutterButton.LARGE)
+    recognizer.attach_chord_listener([red, large], func)
+
+    recognizer._pressed(red, 10.0)
+    recognizer._pressed(large, 10.2)
+    func.assert_not_called()
+
+    recognizer._pressed(red, 10.25)
+    func.assert_called_once()
+    e = func.call_args[0][0]
+    assert e.gesture == Gesture.CHORD
+    assert set(e.buttons) == {red, large}
+
+    recognizer.detach_chord_listener([red, large], func)
+    assert len(recognizer.chord_funcs) == 0
+
+
+def test_attach_chord_as_gesture(mocker, recognizer, palette):
+    with pytest.raises(ValueError):
+        recognizer.attach_gesture_listener(
+            palette, SmartPaletteButton.RED, Gesture.CHORD, mocker.Mock())
+
+
+def test_detach_gesture_listener(mocker, recognizer, palette):
+    func = mocker.Mock()
+    recognizer.watch(palette)
+    recognizer.attach_gesture_listener(
+        palette, SmartPaletteButton.RED, Gesture.DOUBLE_PRESS, func)
+    recognizer.detach_gesture_listener(
+        palette, SmartPaletteButton.RED, Gesture.DOUBLE_PRESS, func)
+    key = (palette, SmartPaletteButton.RED)
+
+    recognizer._pressed(key, 10.0)
+    recognizer._pressed(key, 10.1)
+
+    func.assert_not_called()
+
+
+def test_listener_raise(mocker, recognizer, palette):
+    fail = mocker.Mock(side_effect=RuntimeError)
+    func = mocker.Mock()
+    recognizer.watch(palette)
+    for f in [fail, func]:
+        recognizer.attach_gesture_listener(
+            palette, SmartPaletteButton.RED, Gesture.DOUBLE_PRESS, f)
+    key = (palette, SmartPaletteButton.RED)
+
+    recognizer._pressed(key, 10.0)
+    recognizer._pressed(key, 10.1)
+
+    func.assert_called_once()
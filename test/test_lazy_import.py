@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code):
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
+
+
+def test_import_without_backends():
+    run("import sys, bt_button\n"
+        "assert 'evdev' not in sys.modules\n"
+        "assert 'pygatt' not in sys.modules\n")
+
+
+def test_event_device_without_pygatt():
+    run("import sys, bt_button\n"
+        "bt_button.AbShutter, bt_button.BTselfie\n"
+        "bt_button.DeviceSupervisor, bt_button.GestureRecognizer\n"
+        "assert 'evdev' in sys.modules\n"
+        "assert 'pygatt' not in sys.modules\n")
+
+
+def test_smart_palette_without_evdev():
+    run("import sys, bt_button\n"
+        "bt_button.SmartPalette('00:00:00:00:00:00')\n"
+        "bt_button.DeviceSupervisor, bt_button.GestureRecognizer\n"
+        "assert 'evdev' not in sys.modules\n")
+
+
+def test_unknown_name():
+    run("import bt_button\n"
+        "try:\n"
+        "    bt_button.Hoge\n"
+        "except AttributeError:\n"
+        "    pass\n"
+        "else:\n"
+        "    raise AssertionError\n")
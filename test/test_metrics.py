@@ -0,0 +1,277 @@
+import gc
+import socket
+import urllib.request
+import pytest
+from evdev import ecodes
+from evdev.events import InputEvent
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    SmartPalette, SmartPaletteButton, MetricsRegistry, MetricsExporter, \
+    DispatchExecutor
+from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
+from bt_button.buttons.smart_palette import _button_to_data
+from bt_button.metrics import Histogram, LatencyWindow
+
+MAC = "00:00:00:00:00:00"
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    MetricsRegistry.reset()
+    yield MetricsRegistry
+    MetricsRegistry.reset()
+
+
+@pytest.fixture
+def smart_palette(mocker):
+    GattAdapterPool.reset()
+    mocker.patch('pygatt.GATTToolBackend')
+    return SmartPalette(MAC)
+
+
+def test_histogram():
+    h = Histogram((0.1, 1.0))
+
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        h.observe(value)
+
+    assert h.snapshot() == {
+        "buckets": {0.1: 2, 1.0: 3, float("inf"): 4},
+        "sum": 2.65, "count": 4}
+
+
+def test_event_device_metrics(mocker):
+    shutter = AbShutter(MAC)
+    shutter.device = mocker.Mock()
+    func = mocker.Mock()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, func)
+
+    shutter.device.read.return_value = [
+        InputEvent(1, 0, ecodes.EV_KEY, AbShutterButton.LARGE.value, 1),
+        InputEvent(1, 0, ecodes.EV_KEY, 1, 1),
+        InputEvent(1, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0),
+        InputEvent(1, 0, ecodes.EV_SYN, ecodes.SYN_DROPPED, 0),
+    ]
+    shutter._run()
+
+    m = shutter.metrics
+    assert m.events_received == 4
+    assert m.events_dispatched == 1
+    assert m.unknown_codes == 1
+    assert m.syn_dropped == 1
+    assert m.listener_seconds.count == 1
+
+
+def test_latency_window():
+    window = LatencyWindow(window=100)
+    assert window.snapshot() == {
+        "count": 0, "p50": None, "p99": None, "max": None,
+        "sum": 0.0, "observed": 0}
+
+    # First 50 values are pushed out of window
+    for value in range(150):
+        window.observe(value)
+
+    assert window.snapshot() == {
+        "count": 100, "p50": 100, "p99": 149, "max": 149,
+        "sum": sum(range(150)), "observed": 150}
+
+
+def test_event_device_latency(mocker):
+    shutter = AbShutter(MAC)
+    shutter.device = mocker.Mock()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, mocker.Mock())
+    shutter.device.read.return_value = [
+        InputEvent(1, 0, ecodes.EV_KEY, AbShutterButton.LARGE.value, 1),
+        InputEvent(1, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0),
+    ]
+    # read, then dispatch
+    mocker.patch("time.time", side_effect=[1.25, 1.5])
+
+    shutter._run()
+
+    latency = shutter.metrics.latency.snapshot()
+    assert latency["read"] == {
+        "count": 1, "p50": 0.25, "p99": 0.25, "max": 0.25,
+        "sum": 0.25, "observed": 1}
+    assert latency["decode"]["max"] == 0.25
+    assert latency["total"]["max"] == 0.5
+    assert latency["queue"]["count"] == 0
+
+
+def test_smart_palette_latency(mocker, smart_palette):
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock())
+    # arrival, then dispatch
+    mocker.patch("time.time", side_effect=[1.0, 1.125])
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+
+    latency = smart_palette.metrics.latency.snapshot()
+    assert latency["total"]["max"] == 0.125
+    assert latency["read"]["count"] == 0
+    assert latency["decode"]["count"] == 0
+
+
+def test_executor_latency(mocker, smart_palette):
+    executor = DispatchExecutor()
+    smart_palette.set_dispatch_executor(executor)
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock())
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock())
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    executor.shutdown()
+
+    latency = smart_palette.metrics.latency.snapshot()
+    # Each listener call on executor is measured
+    assert latency["queue"]["count"] == 2
+    assert latency["total"]["count"] == 2
+    assert latency["total"]["max"] >= latency["queue"]["max"] >= 0
+
+
+def test_event_device_connects(mocker):
+    module = "bt_button.buttons._event_device"
+    mocker.patch(module + ".EventDeviceManager.open_device")
+    mocker.patch(module + ".EventDeviceManager.close_device")
+    mocker.patch(module + ".EventDeviceManager.backend.set_event_mask")
+    mocker.patch(module + ".EventReactor")
+    shutter = AbShutter(MAC)
+
+    shutter.start_monitor()
+    shutter._finish_monitor()
+    shutter.start_monitor()
+
+    m = shutter.metrics
+    assert (m.connects, m.reconnects, m.disconnects) == (2, 1, 1)
+    assert m.connect_seconds.count == 2
+
+
+def test_smart_palette_metrics(mocker, smart_palette):
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock())
+
+    smart_palette.connect()
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.BLUE))
+    smart_palette._event(0xb, bytearray(b"hoge"))
+    smart_palette._disconnected()
+    smart_palette.connect()
+
+    m = smart_palette.metrics
+    assert m.events_received == 3
+    assert m.events_dispatched == 2
+    assert m.unknown_codes == 1
+    assert smart_palette.unknown_notifications == 1
+    assert m.listener_seconds.count == 1
+    assert (m.connects, m.reconnects, m.disconnects) == (2, 1, 1)
+    assert m.connect_seconds.count == 2
+
+
+def test_listener_time_measured_on_executor(mocker, smart_palette):
+    executor = DispatchExecutor()
+    smart_palette.set_dispatch_executor(executor)
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock())
+    smart_palette.attach_pushed_listener(
+        SmartPaletteButton.RED, mocker.Mock(side_effect=RuntimeError))
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    executor.shutdown()
+
+    assert smart_palette.metrics.listener_seconds.count == 2
+
+
+def test_snapshot(registry, smart_palette):
+    shutter = AbShutter(MAC)
+    shutter.metrics.events_received = 5
+
+    snapshots = {s["name"]: s for s in registry.snapshot()}
+
+    assert set(snapshots) == {"AB Shutter3", "SmartPalette"}
+    assert snapshots["AB Shutter3"]["mac_addr"] == MAC
+    assert snapshots["AB Shutter3"]["events_received"] == 5
+    assert snapshots["AB Shutter3"]["listener_seconds"]["count"] == 0
+    assert snapshots["AB Shutter3"]["latency"]["total"]["count"] == 0
+
+
+def test_forget_collected_device(registry):
+    AbShutter(MAC)
+    gc.collect()
+
+    assert registry.snapshot() == []
+
+
+def test_render(registry):
+    shutter = AbShutter(MAC)
+    shutter.metrics.syn_dropped = 3
+    shutter.metrics.listener_seconds.observe(0.002)
+    shutter.metrics.latency.total.observe(0.004)
+
+    text = registry.render()
+
+    labels = '{device="AB Shutter3",mac_addr="00:00:00:00:00:00"'
+    assert "# TYPE bt_button_syn_dropped_total counter" in text
+    assert "bt_button_syn_dropped_total" + labels + "} 3" in text
+    assert "# TYPE bt_button_listener_seconds histogram" in text
+    assert "bt_button_listener_seconds_bucket" + labels + \
+        ',le="0.001"} 0' in text
+    assert "bt_button_listener_seconds_bucket" + labels + \
+        ',le="+Inf"} 1' in text
+    assert "bt_button_listener_seconds_count" + labels + "} 1" in text
+    assert "# TYPE bt_button_latency_seconds summary" in text
+    assert 'bt_button_latency_seconds' + labels + \
+        ',stage="total",quantile="0.5"} 0.004' in text
+    assert 'bt_button_latency_seconds' + labels + \
+        ',stage="total",quantile="0.99"} 0.004' in text
+    assert 'bt_button_latency_seconds_sum' + labels + \
+        ',stage="total"} 0.004' in text
+    assert 'bt_button_latency_seconds_count' + labels + \
+        ',stage="total"} 1' in text
+    assert 'quantile="1"' not in text
+    assert "# TYPE bt_button_latency_max_seconds gauge" in text
+    assert 'bt_button_latency_max_seconds' + labels + \
+        ',stage="total"} 0.004' in text
+    assert 'stage="read"' not in text
+
+
+def test_exporter_tcp(registry):
+    shutter = AbShutter(MAC)
+    exporter = MetricsExporter(port=0)
+    exporter.start()
+    try:
+        host, port = exporter.address
+        with urllib.request.urlopen(
+                "http://{}:{}/metrics".format(host, port)) as res:
+            body = res.read().decode()
+    finally:
+        exporter.stop()
+
+    assert exporter.address is None
+    assert "bt_button_events_received_total" in body
+    assert shutter.mac_addr in body
+
+
+def test_exporter_unix(registry, tmp_path):
+    AbShutter(MAC)
+    path = str(tmp_path / "metrics.sock")
+    exporter = MetricsExporter(unix_path=path)
+    exporter.start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+            s.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = b""
+            while True:
+                data = s.recv(4096)
+                if len(data) == 0:
+                    break
+                response += data
+    finally:
+        exporter.stop()
+
+    assert response.startswith(b"HTTP/1.0 200")
+    assert b"bt_button_connects_total" in response
@@ -0,0 +1,135 @@
+import logging
+import pytest
+from evdev import ecodes
+from evdev.events import InputEvent
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    ButtonEvent, DispatchExecutor, ListenerProfiler
+from bt_button import profiler as _profiler
+
+MAC = "00:00:00:00:00:00"
+
+
+@pytest.fixture(autouse=True)
+def no_profiler():
+    yield
+    _profiler.active = None
+
+
+def push(shutter, count=1):
+    shutter.device.read.return_value = [
+        InputEvent(1, 0, ecodes.EV_KEY, AbShutterButton.LARGE.value, 1),
+        InputEvent(1, 0, ecodes.EV_SYN, ecodes.SYN_REPORT, 0),
+    ] * count
+    shutter._run()
+
+
+def fake_time(mocker, seconds):
+    # perf_counter() is called before and after each listener
+    values = []
+    for s in seconds:
+        values += [0.0, s]
+    mocker.patch("time.perf_counter", side_effect=values)
+
+
+@pytest.fixture
+def shutter(mocker):
+    shutter = AbShutter(MAC)
+    shutter.device = mocker.Mock()
+    return shutter
+
+
+def slow(e):
+    pass
+
+
+def test_inactive(mocker, shutter):
+    record = mocker.spy(ListenerProfiler, "_record")
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, slow)
+
+    push(shutter)
+
+    record.assert_not_called()
+
+
+def test_slowest(mocker, shutter):
+    profiler = ListenerProfiler(budget=1.0, slowest=2)
+    profiler.start()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, slow)
+
+    fake_time(mocker, [0.3, 0.1, 0.5])
+    push(shutter, 3)
+
+    calls = profiler.slowest()
+    assert [c.seconds for c in calls] == [0.5, 0.3]
+    assert calls[0].listener == "test.test_profiler.slow"
+    assert calls[0].device == "AB Shutter3 " + MAC
+    assert calls[0].button == AbShutterButton.LARGE
+    assert calls[0].event == AbShutterButtonEvent.PUSHED
+    assert profiler.sampled == 3
+    assert profiler.over_budget == 0
+
+    profiler.reset()
+    assert profiler.slowest() == []
+    assert profiler.sampled == 0
+
+
+def test_budget_warning(mocker, shutter, caplog):
+    profiler = ListenerProfiler(budget=0.05)
+    profiler.start()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, slow)
+
+    fake_time(mocker, [0.01, 0.2])
+    with caplog.at_level(logging.WARNING, logger="bt_button.profiler"):
+        push(shutter, 2)
+
+    assert profiler.over_budget == 1
+    assert len(caplog.records) == 1
+    assert "test.test_profiler.slow took 200.0 ms" in caplog.text
+
+
+def test_sample_rate(shutter):
+    profiler = ListenerProfiler(sample_rate=0.25)
+    profiler.start()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, slow)
+
+    push(shutter, 10)
+
+    assert profiler.sampled == 2
+
+
+def test_invalid_sample_rate():
+    with pytest.raises(ValueError):
+        ListenerProfiler(sample_rate=0)
+
+
+def test_stop(shutter):
+    profiler = ListenerProfiler()
+    profiler.start()
+    profiler.stop()
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, slow)
+
+    push(shutter)
+
+    assert profiler.sampled == 0
+
+
+def test_executor(shutter):
+    profiler = ListenerProfiler()
+    profiler.start()
+    executor = DispatchExecutor()
+    e = ButtonEvent(shutter, AbShutterButton.SMALL,
+                    AbShutterButtonEvent.PUSHED, 1.0)
+
+    executor.submit(slow, e)
+    executor.shutdown()
+
+    calls = profiler.slowest()
+    assert len(calls) == 1
+    assert calls[0].listener == "test.test_profiler.slow"
+    assert calls[0].button == AbShutterButton.SMALL
@@ -0,0 +1,194 @@
+import pytest
+from evdev import ecodes
+from evdev.events import InputEvent
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    SmartPalette, SmartPaletteButton, Recorder, LogReader, replay
+from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
+from bt_button.buttons.smart_palette import _button_to_data
+from bt_button.recorder import rotated_paths
+
+MAC = "00:00:00:00:00:00"
+
+
+def key_frame(sec, code, value):
+    return [InputEvent(sec, 500, ecodes.EV_KEY, code, value),
+            InputEvent(sec, 500, ecodes.EV_SYN, ecodes.SYN_REPORT, 0)]
+
+
+@pytest.fixture
+def smart_palette(mocker):
+    GattAdapterPool.reset()
+    mocker.patch('pygatt.GATTToolBackend')
+    return SmartPalette(MAC)
+
+
+def test_record_and_replay_event_device(mocker, tmp_path):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    shutter.device = mocker.Mock()
+    recorder = Recorder(path)
+    recorder.attach(shutter)
+
+    shutter.device.read.return_value = \
+        key_frame(100, AbShutterButton.LARGE.value, 1) + \
+        key_frame(101, AbShutterButton.LARGE.value, 0)
+    shutter._run()
+    recorder.detach(shutter)
+    shutter._run()
+    recorder.close()
+
+    assert shutter.recorder is None
+    assert recorder.records == 4
+    with LogReader(path) as reader:
+        assert reader.count == 4
+        assert reader.devices == [
+            {"kind": "AbShutter", "name": "AB Shutter3", "mac_addr": MAC}]
+        assert list(reader)[0] == (
+            100000500, 0, ecodes.EV_KEY, AbShutterButton.LARGE.value, 1)
+
+    target = AbShutter(MAC.upper())
+    pushed = mocker.Mock()
+    released = mocker.Mock()
+    target.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, pushed)
+    target.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.RELEASED, released)
+
+    assert replay(path, [target], speed=None) == 4
+
+    pushed.assert_called_once()
+    e = pushed.call_args[0][0]
+    assert e.timestamp == 100.0005
+    released.assert_called_once()
+
+
+def test_record_and_replay_smart_palette(mocker, tmp_path, smart_palette):
+    path = str(tmp_path / "events.log")
+    recorder = Recorder(path)
+    recorder.attach(smart_palette)
+
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    smart_palette._event(0xb, bytearray(b"PIN"))
+    smart_palette._event(0xb, bytearray(b"\xff" * 8))
+    recorder.close()
+
+    target = SmartPalette(MAC)
+    pushed = mocker.Mock()
+    target.attach_pushed_listener(SmartPaletteButton.RED, pushed)
+
+    assert replay([path], [target], speed=None) == 3
+
+    pushed.assert_called_once()
+    assert target.unknown_notifications == 2
+
+
+def test_replay_skip_other_devices(mocker, tmp_path):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path)
+    recorder.attach(shutter)
+    recorder.record_events(shutter, key_frame(1, 28, 1))
+    recorder.close()
+
+    assert replay(path, [AbShutter("00:00:00:00:00:01")]) == 0
+
+
+def test_replay_speed(mocker, tmp_path):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path)
+    recorder.attach(shutter)
+    recorder.record_events(shutter, key_frame(1, 28, 1))
+    recorder.record_events(shutter, key_frame(3, 28, 0))
+    recorder.close()
+
+    sleep_mock = mocker.patch("bt_button.recorder.time.sleep")
+    replay(path, [shutter], speed=10)
+
+    delays = [c[0][0] for c in sleep_mock.call_args_list]
+    # Two events of the frame 2 seconds later
+    assert len(delays) == 2
+    assert all(0.1 < d <= 0.2 for d in delays)
+
+
+def test_rotation(tmp_path):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path, max_bytes=200, backup_count=2, table_reserve=0)
+    recorder.attach(shutter)
+
+    for sec in range(20):
+        recorder.record_events(shutter, key_frame(sec, 28, 1))
+    recorder.close()
+
+    paths = rotated_paths(path)
+    assert paths == [path + ".2", path + ".1", path]
+
+    seconds = []
+    for p in paths:
+        with LogReader(p) as reader:
+            assert reader.devices[0]["name"] == "AB Shutter3"
+            seconds.extend(r[0] // 1000000 for r in reader)
+    assert seconds == sorted(seconds)
+    assert seconds[-1] == 19
+
+
+def test_attach_after_start(tmp_path, smart_palette):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path)
+    recorder.attach(shutter)
+    recorder.record_events(shutter, key_frame(1, 28, 1))
+
+    recorder.attach(smart_palette)
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    recorder.close()
+
+    assert rotated_paths(path) == [path]
+    with LogReader(path) as reader:
+        assert [d["kind"] for d in reader.devices] == \
+            ["AbShutter", "SmartPalette"]
+        assert [r[1] for r in reader] == [0, 0, 1]
+
+
+def test_attach_after_start_table_full(tmp_path, smart_palette):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path, table_reserve=0)
+    recorder.attach(shutter)
+    recorder.record_events(shutter, key_frame(1, 28, 1))
+
+    recorder.attach(smart_palette)
+    smart_palette._event(0xb, _button_to_data(SmartPaletteButton.RED))
+    recorder.close()
+
+    with LogReader(path) as reader:
+        assert len(reader.devices) == 2
+        assert reader.count == 1
+    with LogReader(path + ".1") as reader:
+        assert len(reader.devices) == 1
+        assert reader.count == 2
+
+
+def test_truncated_record(tmp_path):
+    path = str(tmp_path / "events.log")
+    shutter = AbShutter(MAC)
+    recorder = Recorder(path)
+    recorder.attach(shutter)
+    recorder.record_events(shutter, key_frame(1, 28, 1))
+    recorder.close()
+
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 5)
+
+    with LogReader(path) as reader:
+        assert reader.count == 2
+
+
+def test_not_log(tmp_path):
+    path = tmp_path / "events.log"
+    path.write_bytes(b"\x00" * 64)
+
+    with pytest.raises(ValueError):
+        LogReader(str(path))
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    SmartPalette, SmartPaletteButton, ShardCoordinator
+from bt_button.sharding import EventRing, _publisher
+
+MACS = ["00:00:00:00:00:00", "00:00:00:00:00:01", "00:00:00:00:00:02"]
+
+
+def fake_devices(shutters, palettes):
+    """
+    Worker initializer which installs fake backends
+    and keeps pushing buttons of devices.
+    """
+    from bt_button.buttons._event_device_manager import EventDeviceManager
+    from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
+    from bt_button.buttons.smart_palette import _button_to_data
+    from bt_button.testing import FakeInputBackend, FakeGattBackend
+
+    input_backend = FakeInputBackend()
+    EventDeviceManager.set_backend(input_backend)
+    paths = [input_backend.add_device("AB Shutter3", mac) for mac in shutters]
+
+    gatt_backend = FakeGattBackend()
+    GattAdapterPool.set_backend_factory(gatt_backend.adapter)
+    fakes = [gatt_backend.add_device(mac) for mac in palettes]
+
+    def push():
+        data = _button_to_data(SmartPaletteButton.RED)
+        while True:
+            time.sleep(0.02)
+            for path in paths:
+                input_backend.key(path, AbShutterButton.LARGE.value, 1)
+            for fake in fakes:
+                if fake.connected:
+                    fake.notify(data)
+
+    threading.Thread(target=push, daemon=True).start()
+
+
+def test_ring():
+    ring = EventRing(4)
+
+    assert ring.get_all() == []
+    for i in range(6):
+        assert ring.put(i, 28, 1, 100 + i) == (i < 4)
+    assert ring.dropped == 2
+
+    assert ring.get_all() == [(100 + i, i, 28, 1) for i in range(4)]
+    assert ring.get_all() == []
+
+    # Wrap around
+    for i in range(3):
+        ring.put(i, 115, 0, i)
+    assert [r[1] for r in ring.get_all()] == [0, 1, 2]
+
+
+def test_ring_shared_buffer():
+    ring = EventRing(8)
+    other = EventRing(8, ring.buffer)
+
+    other.put(3, 28, 1, 5)
+
+    assert ring.get_all() == [(5, 3, 28, 1)]
+
+
+def test_publisher_threads():
+    count = 20000
+    ring = EventRing(count * 2)
+    r, w = os.pipe()
+    os.set_blocking(w, False)
+    publish = _publisher(ring, w)
+
+    def run(index):
+        for i in range(count):
+            publish(index, 28, 1, i)
+
+    try:
+        threads = [threading.Thread(target=run, args=(i, ))
+                   for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        os.close(r)
+        os.close(w)
+
+    records = ring.get_all()
+    assert len(records) == count * 2
+    assert ring.dropped == 0
+    for index in range(2):
+        assert [r[0] for r in records if r[1] == index] == list(range(count))
+
+
+def test_coordinator():
+    shutters = [AbShutter(mac) for mac in MACS[:2]]
+    palette = SmartPalette(MACS[2])
+    received = {}
+    done = threading.Event()
+
+    def listener(device):
+        def func(*args):
+            received.setdefault(device, args)
+            if len(received) == 3:
+                done.set()
+        return func
+
+    for shutter in shutters:
+        shutter.attach_button_event_listener(
+            AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED,
+            listener(shutter))
+    palette.attach_pushed_listener(SmartPaletteButton.RED, listener(palette))
+
+    coordinator = ShardCoordinator(
+        shutters + [palette], workers=2,
+        initializer=fake_devices, initargs=(MACS[:2], MACS[2:]))
+    coordinator.start()
+    try:
+        assert done.wait(20)
+    finally:
+        coordinator.stop()
+
+    e = received[shutters[0]][0]
+    assert e.device is shutters[0]
+    assert (e.button, e.event) == \
+        (AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED)
+    assert received[palette][0].button == SmartPaletteButton.RED
+    assert coordinator.thread is None
+    assert palette.adapter is None
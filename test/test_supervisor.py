@@ -0,0 +1,198 @@
+import time
+import pytest
+
+from bt_button import DeviceSupervisor, DeviceNotFoundError, SmartPalette
+from bt_button.buttons._event_device import EventDevice
+from bt_button.buttons._input_node_watcher import IN_CREATE, IN_DELETE
+
+
+@pytest.fixture
+def event_device(mocker):
+    device = mocker.Mock(spec=EventDevice)
+    device.name = "TEST"
+    device.mac_addr = "00:00:00:00:00:00"
+    device.is_monitoring.return_value = False
+    return device
+
+
+@pytest.fixture
+def open_devices(mocker):
+    module = "bt_button.buttons._event_device_manager"
+    module += ".EventDeviceManager.open_devices"
+    return mocker.patch(module, return_value={})
+
+
+@pytest.fixture
+def palette(mocker):
+    palette = mocker.Mock(spec=SmartPalette)
+    palette.name = "SmartPalette"
+    palette.is_connected.return_value = False
+    return palette
+
+
+def test_attach_event_devices(mocker, event_device, open_devices):
+    other = mocker.Mock(spec=EventDevice)
+    other.name = "OTHER"
+    other.mac_addr = "00:00:00:00:00:01"
+    other.is_monitoring.return_value = False
+
+    input_device = mocker.Mock()
+    open_devices.return_value = {("TEST", "00:00:00:00:00:00"): input_device}
+    on_connected = mocker.Mock()
+    supervisor = DeviceSupervisor(
+        [event_device, other], on_connected=on_connected)
+
+    supervisor._attach_event_devices()
+
+    open_devices.assert_called_once_with([
+        ("TEST", "00:00:00:00:00:00"), ("OTHER", "00:00:00:00:00:01")])
+    event_device._start_monitor.assert_called_once_with(input_device)
+    other._start_monitor.assert_not_called()
+    on_connected.assert_called_once_with(event_device)
+
+
+def test_attach_event_devices_start_failed(
+        mocker, event_device, open_devices):
+    other = mocker.Mock(spec=EventDevice)
+    other.name = "OTHER"
+    other.mac_addr = "00:00:00:00:00:01"
+    other.is_monitoring.return_value = False
+    event_device._start_monitor.side_effect = OSError
+
+    open_devices.return_value = {
+        ("TEST", "00:00:00:00:00:00"): mocker.Mock(),
+        ("OTHER", "00:00:00:00:00:01"): mocker.Mock()}
+    on_connected = mocker.Mock()
+    supervisor = DeviceSupervisor(
+        [event_device, other], on_connected=on_connected)
+
+    supervisor._attach_event_devices()
+
+    other._start_monitor.assert_called_once()
+    on_connected.assert_called_once_with(other)
+
+
+def test_attach_event_devices_monitoring(mocker, event_device, open_devices):
+    event_device.is_monitoring.return_value = True
+    supervisor = DeviceSupervisor([event_device])
+
+    supervisor._attach_event_devices()
+
+    open_devices.assert_not_called()
+
+
+def test_event_device_disconnected(mocker, event_device):
+    on_disconnected = mocker.Mock()
+    DeviceSupervisor([event_device], on_disconnected=on_disconnected)
+
+    func = event_device.attach_disconnected_listener.call_args[0][0]
+    func()
+
+    on_disconnected.assert_called_once_with(event_device)
+
+
+@pytest.mark.parametrize("mask,called", [(IN_CREATE, True),
+                                         (IN_DELETE, False)])
+def test_node_changed(mocker, event_device, open_devices, mask, called):
+    supervisor = DeviceSupervisor([event_device])
+    supervisor.watcher = mocker.Mock()
+    supervisor.watcher.read.return_value = [(mask, "event0")]
+
+    supervisor._node_changed()
+
+    assert open_devices.called == called
+
+
+def test_connect_palettes(mocker, palette):
+    on_connected = mocker.Mock()
+    supervisor = DeviceSupervisor([palette], on_connected=on_connected)
+
+    assert supervisor._connect_palettes() is None
+
+    palette.connect.assert_called_once_with(timeout=5.0)
+    on_connected.assert_called_once_with(palette)
+
+
+def test_connect_palettes_backoff(mocker, palette):
+    palette.connect.side_effect = DeviceNotFoundError(
+        "hoge", "SmartPalette", "00:00:00:00:00:00")
+    supervisor = DeviceSupervisor([palette], min_backoff=1.0, max_backoff=3.0)
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+
+    assert supervisor._connect_palettes() == 1.0
+    assert supervisor._connect_palettes() == 1.0
+    palette.connect.assert_called_once()
+
+    monotonic.return_value = 101.0
+    assert supervisor._connect_palettes() == 2.0
+
+    monotonic.return_value = 103.0
+    assert supervisor._connect_palettes() == 3.0
+
+    monotonic.return_value = 106.0
+    assert supervisor._connect_palettes() == 3.0
+    assert palette.connect.call_count == 4
+
+
+def test_palette_disconnected(mocker, palette):
+    on_disconnected = mocker.Mock()
+    supervisor = DeviceSupervisor(
+        [palette], on_disconnected=on_disconnected, min_backoff=1.0)
+    supervisor.palettes[palette].backoff = 8.0
+    supervisor.palettes[palette].next_attempt = 200.0
+
+    func = palette.attach_disconnected_listener.call_args[0][0]
+    func()
+
+    on_disconnected.assert_called_once_with(palette)
+    assert supervisor.palettes[palette].backoff == 1.0
+    assert supervisor.palettes[palette].next_attempt == 0.0
+    assert supervisor.wakeup.is_set()
+
+
+def test_start_stop(mocker, event_device, open_devices):
+    module = "bt_button.supervisor"
+    mocker.patch(module + ".InputNodeWatcher")
+    register_mock = mocker.patch(module + ".EventReactor.register")
+    unregister_mock = mocker.patch(module + ".EventReactor.unregister")
+    supervisor = DeviceSupervisor([event_device])
+
+    supervisor.start()
+    open_devices.assert_called_once()
+    register_mock.assert_called_once()
+
+    supervisor.stop()
+    unregister_mock.assert_called_once()
+    assert supervisor.thread is None
+
+
+def test_start_without_inotify(mocker, event_device, open_devices):
+    module = "bt_button.supervisor"
+    mocker.patch(module + ".InputNodeWatcher", side_effect=OSError)
+    supervisor = DeviceSupervisor([event_device], rescan_interval=0.01)
+
+    supervisor.start()
+    time.sleep(0.05)
+    supervisor.stop()
+
+    assert supervisor.watcher is None
+    assert open_devices.call_count >= 2
+
+
+def test_remove_device(mocker, event_device, palette, open_devices):
+    supervisor = DeviceSupervisor([event_device, palette])
+
+    supervisor.remove_device(event_device)
+    supervisor.remove_device(palette)
+    # Not supervised
+    supervisor.remove_device(palette)
+
+    assert supervisor.event_devices == []
+    assert supervisor.palettes == {}
+    event_device.detach_disconnected_listener.assert_called_once()
+    palette.detach_disconnected_listener.assert_called_once()
+
+    supervisor._attach_event_devices()
+    assert supervisor._connect_palettes() is None
+    open_devices.assert_not_called()
+    palette.connect.assert_not_called()
@@ -0,0 +1,205 @@
+import threading
+import pytest
+import pygatt
+
+from bt_button import AbShutter, AbShutterButton, AbShutterButtonEvent, \
+    SmartPalette, SmartPaletteButton, DeviceNotFoundError
+from bt_button.buttons._event_device_manager import EventDeviceManager
+from bt_button.buttons._gatt_adapter_pool import GattAdapterPool
+from bt_button.buttons._input_backend import EvdevBackend
+from bt_button.buttons.smart_palette import _button_to_data
+from bt_button.testing import FakeInputBackend, FakeGattBackend, \
+    EventInjector, inject_at_rate
+
+MAC = "00:00:00:00:00:00"
+
+
+@pytest.fixture
+def input_backend():
+    backend = FakeInputBackend()
+    EventDeviceManager.set_backend(backend)
+    yield backend
+    EventDeviceManager.set_backend(EvdevBackend())
+
+
+@pytest.fixture
+def gatt_backend():
+    backend = FakeGattBackend()
+    GattAdapterPool.set_backend_factory(backend.adapter)
+    yield backend
+    GattAdapterPool.set_backend_factory(None)
+
+
+def test_fake_input_dispatch(input_backend):
+    path = input_backend.add_device("AB Shutter3", MAC)
+    shutter = AbShutter(MAC)
+    received = []
+    done = threading.Event()
+
+    def pushed(e):
+        received.append(e.button)
+        done.set()
+
+    shutter.attach_button_event_listener(
+        AbShutterButton.LARGE, AbShutterButtonEvent.PUSHED, pushed)
+    shutter.start_monitor()
+    try:
+        # Masked out by set_event_mask()
+        input_backend.key(path, 1, 1)
+        input_backend.key(path, AbShutterButton.LARGE.value, 1)
+
+        assert done.wait(1)
+        assert received == [AbShutterButton.LARGE]
+    finally:
+        shutter.stop_monitor()
+
+    assert EventDeviceManager.open_fds == 0
+    assert input_backend.clients[path] == []
+
+
+def test_fake_input_listener_raise(input_backend):
+    path = input_backend.add_device("AB Shutter3", MAC)
+    shutter = AbShutter(MAC)
+    received = []
+    done = threading.Event()
+
+    def listener(e):
+        received.append(e.event)
+        if e.event == AbShutterButtonEvent.RELEASED:
+            done.set()
+        elif len(received) == 1:
+            raise RuntimeError
+
+    for event in [AbShutterButtonEvent.PUSHED, AbShutterButtonEvent.RELEASED]:
+        shutter.attach_button_event_listener(
+            AbShutterButton.LARGE, event, listener)
+    shutter.start_monitor()
+    try:
+        input_backend.key(path, AbShutterButton.LARGE.value, 1)
+        input_backend.key(path, AbShutterButton.LARGE.value, 0)
+
+        assert done.wait(1)
+        assert received == [
+            AbShutterButtonEvent.PUSHED, AbShutterButtonEvent.RELEASED]
+    finally:
+        shutter.stop_monitor()
+
+
+def test_fake_input_remove(input_backend):
+    path = input_backend.add_device("AB Shutter3", MAC)
+    shutter = AbShutter(MAC)
+    disconnected = threading.Event()
+    shutter.attach_disconnected_listener(disconnected.set)
+    shutter.start_monitor()
+
+    input_backend.remove_device(path)
+
+    assert disconnected.wait(1)
+    assert not shutter.is_monitoring()
+    with pytest.raises(DeviceNotFoundError):
+        shutter.start_monitor()
+
+
+def test_fake_input_at_rate(input_backend):
+    path = input_backend.add_device("AB Shutter3", MAC)
+    shutter = AbShutter(MAC)
+    count = 200
+    received = []
+    done = threading.Event()
+
+    def pushed(e):
+        received.append(e)
+        if len(received) == count:
+            done.set()
+
+    shutter.attach_button_event_listener(
+        AbShutterButton.SMALL, AbShutterButtonEvent.PUSHED, pushed)
+    shutter.start_monitor()
+    try:
+        injector = inject_at_rate(
+            lambda: input_backend.key(path, AbShutterButton.SMALL.value, 1),
+            rate=10000, count=count)
+        injector.join(1)
+
+        assert injector.sent == count
+        assert done.wait(1)
+    finally:
+        shutter.stop_monitor()
+
+
+def test_injector_stop():
+    calls = []
+    injector = EventInjector(lambda: calls.append(1), rate=1000).start()
+    while len(calls) < 5:
+        pass
+
+    injector.stop()
+    sent = injector.sent
+
+    assert sent >= 5
+    assert len(calls) == sent
+
+
+def test_fake_gatt(gatt_backend):
+    device = gatt_backend.add_device(MAC)
+    palette = SmartPalette(MAC)
+    pushed = []
+    lost = []
+    palette.attach_pushed_listener(
+        SmartPaletteButton.RED, lambda e: pushed.append(1))
+    palette.attach_disconnected_listener(lambda: lost.append(1))
+
+    palette.connect()
+    device.notify(_button_to_data(SmartPaletteButton.RED))
+    device.notify(b"hoge")
+    assert pushed == [1]
+    assert palette.unknown_notifications == 1
+
+    device.drop()
+    assert lost == [1]
+    assert not palette.is_connected()
+
+    palette.close()
+
+
+def test_fake_gatt_many_palettes(gatt_backend):
+    devices = [gatt_backend.add_device("00:00:00:00:00:0{}".format(i))
+               for i in range(3)]
+    palettes = [SmartPalette(d.mac_addr) for d in devices]
+    pushed = []
+    for palette in palettes:
+        palette.attach_pushed_listener(
+            SmartPaletteButton.RED, lambda e: pushed.append(e.device))
+        palette.connect()
+
+    for device in devices:
+        device.notify(_button_to_data(SmartPaletteButton.RED))
+
+    assert pushed == palettes
+    assert len({p.adapter for p in palettes}) == 3
+
+    for palette in palettes:
+        palette.close()
+
+
+def test_fake_gatt_one_connection(gatt_backend):
+    first = gatt_backend.add_device(MAC)
+    gatt_backend.add_device("00:00:00:00:00:01")
+    adapter = gatt_backend.adapter("hci0")
+    adapter.start()
+
+    adapter.connect(MAC)
+    with pytest.raises(pygatt.exceptions.BLEError):
+        adapter.connect("00:00:00:00:00:01")
+
+    first.drop()
+    adapter.connect("00:00:00:00:00:01")
+
+
+def test_fake_gatt_not_found(gatt_backend):
+    palette = SmartPalette(MAC)
+
+    with pytest.raises(DeviceNotFoundError):
+        palette.connect()
+
+    palette.close()